@@ -0,0 +1,96 @@
+import os
+import tempfile
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+DEFAULT_DATABASE_URL = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+DATABASE_URL = os.environ.get('DATABASE_URL', DEFAULT_DATABASE_URL)
+
+# Database profiles
+#
+# Each profile lists the PRAGMAs applied to every new SQLite connection.
+# 'production' trades a little durability on power loss (synchronous=NORMAL
+# is still crash-safe under WAL) for concurrent readers and fewer fsyncs;
+# 'default' leaves SQLite's own settings alone.
+SQLITE_PROFILES = {
+    'default': {},
+    'production': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,          # ms to wait on a locked database
+        'mmap_size': 268435456,        # 256 MiB memory-mapped reads
+        'cache_size': -65536,          # negative means KiB: 64 MiB page cache
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON'           # enforce the models' foreign keys
+    }
+}
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'production')
+
+# Every Nth estimate version is stored as a full snapshot, the rest as deltas
+SNAPSHOT_KEYFRAME_INTERVAL = int(os.environ.get('SNAPSHOT_KEYFRAME_INTERVAL', 10))
+
+# Working hours in one full-time week, used for schedules and FTE figures
+HOURS_PER_WEEK = float(os.environ.get('HOURS_PER_WEEK', 40))
+
+# PDF exports are rendered by a small thread pool and cached on disk
+PDF_CACHE_DIR = os.environ.get('PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'project-estimator-pdf'))
+PDF_RENDER_WORKERS = int(os.environ.get('PDF_RENDER_WORKERS', 2))
+PDF_RENDER_QUEUE = int(os.environ.get('PDF_RENDER_QUEUE', 8))        # renders waiting or running before 503
+PDF_RENDER_TIMEOUT = int(os.environ.get('PDF_RENDER_TIMEOUT', 60))    # seconds
+
+# Resource leveling runs as background jobs polled by the client
+LEVELING_WORKERS = int(os.environ.get('LEVELING_WORKERS', 1))
+LEVELING_QUEUE = int(os.environ.get('LEVELING_QUEUE', 8))            # unfinished jobs before 503
+LEVELING_JOBS_KEPT = int(os.environ.get('LEVELING_JOBS_KEPT', 64))   # finished jobs kept for polling
+
+# JSON responses are encoded with orjson when it is installed ('auto'), or with
+# an explicitly named encoder ('orjson' or 'json')
+JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+
+# Responses of at least COMPRESSION_MIN_SIZE bytes are gzip or brotli encoded
+# when the client accepts it; immutable payloads keep their encoded bytes
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+PAYLOAD_CACHE_BYTES = int(os.environ.get('PAYLOAD_CACHE_BYTES', 64 * 1024 * 1024))
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+def _env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for a database URL.
+
+    Server databases get a sized QueuePool (DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_RECYCLE seconds, DB_POOL_PRE_PING). A SQLite file keeps
+    SQLAlchemy's QueuePool, with connections shareable between threads:
+    each worker process has its own pool, and the busy timeout from the
+    profile makes writers queue instead of failing. An in-memory SQLite
+    database needs one shared connection, so it uses a StaticPool.
+    """
+    url = make_url(url)
+    if url.get_backend_name() == 'sqlite':
+        if url.database in (None, '', ':memory:'):
+            return {
+                'poolclass': StaticPool,
+                'connect_args': {'check_same_thread': False}
+            }
+        return {
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+            'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', False),
+            'connect_args': {'check_same_thread': False}
+        }
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 10),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 20),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True)
+    }
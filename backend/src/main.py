@@ -5,24 +5,38 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory
 from src.models.user import db as user_db
-from src.models.estimator import db as estimator_db
+from src.models.estimator import db as estimator_db, upgrade_schema, configure_sqlite
+from src.config import SQLITE_PROFILES, DATABASE_PROFILE, DATABASE_URL, engine_options
+from src.services.rollups import rebuild_rollups
+from src.services.serialization import EstimatorJSONProvider
 from src.routes.user import user_bp
 from src.routes.estimator import estimator_bp
 
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
+app.json = EstimatorJSONProvider(app)
 
 app.register_blueprint(user_bp, url_prefix='/api')
 app.register_blueprint(estimator_bp, url_prefix='/api')
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(DATABASE_URL)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # Initialize both databases (they use the same SQLAlchemy instance)
 estimator_db.init_app(app)
 with app.app_context():
+    configure_sqlite(estimator_db.engine, SQLITE_PROFILES[DATABASE_PROFILE])
     estimator_db.create_all()
+    added_columns = upgrade_schema()
+    if any(column.endswith('.rollup_hours') for column in added_columns):
+        # Databases created before rollups existed need them backfilled once
+        rebuild_rollups()
+        estimator_db.session.commit()
+    # Do not hand pooled connections to workers forked after a preloaded import
+    estimator_db.session.remove()
+    estimator_db.engine.dispose()
 
 @app.route('/', defaults={'path': ''})
 @app.route('/<path:path>')
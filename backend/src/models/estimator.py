@@ -1,10 +1,40 @@
+import json
+import logging
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text, event, select, update, func
+from sqlalchemy.orm import selectinload, joinedload
 from datetime import datetime
-import json
 
 db = SQLAlchemy()
 
-class ProjectEstimate(db.Model):
+class RollupMixin:
+    """Stored hours/cost/revenue totals of every task below this node.
+
+    Values exclude contingency and are kept current by src.services.rollups.
+    """
+    rollup_hours = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    rollup_cost = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+    rollup_revenue = db.Column(db.Float, nullable=False, default=0.0, server_default='0')
+
+    def rollup_dict(self):
+        return {
+            'id': self.id,
+            'hours': self.rollup_hours,
+            'cost': self.rollup_cost,
+            'revenue': self.rollup_revenue
+        }
+
+class ScheduleMixin:
+    """Stored early start and finish, in working days from the project start.
+
+    NULL until the estimate is first scheduled; kept current by
+    src.services.scheduler. Phases and activities store the days of their
+    start and finish milestones.
+    """
+    schedule_start = db.Column(db.Integer)
+    schedule_finish = db.Column(db.Integer)
+
+class ProjectEstimate(RollupMixin, db.Model):
     __tablename__ = 'project_estimates'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -13,15 +43,39 @@ class ProjectEstimate(db.Model):
     currency = db.Column(db.String(3), default='USD')
     contingency_percentage = db.Column(db.Float, default=0.0)
     status = db.Column(db.String(50), default='draft')
+    start_date = db.Column(db.Date)  # First day of the schedule; defaults to the creation date
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Bumped in the same transaction by every change to the estimate or its tree (src.services.rollups)
+    revision = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    
+    __table_args__ = (
+        db.Index('ix_project_estimates_status_updated_at', 'status', 'updated_at'),
+    )
     
     # Relationships
     phases = db.relationship('Phase', backref='project_estimate', lazy=True, cascade='all, delete-orphan')
     rate_overrides = db.relationship('RateOverride', backref='project_estimate', lazy=True, cascade='all, delete-orphan')
     estimate_versions = db.relationship('EstimateVersion', backref='project_estimate', lazy=True, cascade='all, delete-orphan')
     
-    def to_dict(self):
+    def to_dict(self, include_phases=True):
+        result = {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'currency': self.currency,
+            'contingency_percentage': self.contingency_percentage,
+            'status': self.status,
+            'start_date': self.start_date.isoformat() if self.start_date else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'revision': self.revision
+        }
+        if include_phases:
+            result['phases'] = [phase.to_dict() for phase in self.phases]
+        return result
+
+    def to_summary_dict(self, task_count=0, total_hours=0.0):
         return {
             'id': self.id,
             'name': self.name,
@@ -31,17 +85,33 @@ class ProjectEstimate(db.Model):
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'phases': [phase.to_dict() for phase in self.phases]
+            'task_count': task_count,
+            'total_hours': total_hours
         }
 
-class Phase(db.Model):
+    @classmethod
+    def tree_query(cls):
+        """Query that eager-loads the full phase/activity/task/assignment tree.
+
+        Each level is fetched with one SELECT ... WHERE parent_id IN (...), so
+        serializing any number of estimates costs a fixed number of queries.
+        """
+        return cls.query.options(
+            selectinload(cls.phases)
+            .selectinload(Phase.activities)
+            .selectinload(Activity.tasks)
+            .selectinload(Task.assignments)
+            .joinedload(Assignment.role_level)
+        )
+
+class Phase(RollupMixin, ScheduleMixin, db.Model):
     __tablename__ = 'phases'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     order_index = db.Column(db.Integer, nullable=False)
-    project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), nullable=False)
+    project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), nullable=False, index=True)
     
     # Relationships
     activities = db.relationship('Activity', backref='phase', lazy=True, cascade='all, delete-orphan')
@@ -56,14 +126,14 @@ class Phase(db.Model):
             'activities': [activity.to_dict() for activity in self.activities]
         }
 
-class Activity(db.Model):
+class Activity(RollupMixin, ScheduleMixin, db.Model):
     __tablename__ = 'activities'
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text)
     order_index = db.Column(db.Integer, nullable=False)
-    phase_id = db.Column(db.Integer, db.ForeignKey('phases.id'), nullable=False)
+    phase_id = db.Column(db.Integer, db.ForeignKey('phases.id'), nullable=False, index=True)
     
     # Relationships
     tasks = db.relationship('Task', backref='activity', lazy=True, cascade='all, delete-orphan')
@@ -78,7 +148,7 @@ class Activity(db.Model):
             'tasks': [task.to_dict() for task in self.tasks]
         }
 
-class Task(db.Model):
+class Task(ScheduleMixin, db.Model):
     __tablename__ = 'tasks'
     
     id = db.Column(db.Integer, primary_key=True)
@@ -88,7 +158,11 @@ class Task(db.Model):
     complexity = db.Column(db.String(20))  # Low, Medium, High
     story_points = db.Column(db.Integer, default=0)
     estimated_hours = db.Column(db.Float, default=0.0)
-    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False)
+    # Optional three-point estimate for simulations; unset points come from complexity
+    low_hours = db.Column(db.Float)
+    likely_hours = db.Column(db.Float)
+    high_hours = db.Column(db.Float)
+    activity_id = db.Column(db.Integer, db.ForeignKey('activities.id'), nullable=False, index=True)
     
     # Relationships
     assignments = db.relationship('Assignment', backref='task', lazy=True, cascade='all, delete-orphan')
@@ -102,6 +176,9 @@ class Task(db.Model):
             'complexity': self.complexity,
             'story_points': self.story_points,
             'estimated_hours': self.estimated_hours,
+            'low_hours': self.low_hours,
+            'likely_hours': self.likely_hours,
+            'high_hours': self.high_hours,
             'activity_id': self.activity_id,
             'assignments': [assignment.to_dict() for assignment in self.assignments]
         }
@@ -134,8 +211,8 @@ class Assignment(db.Model):
     __tablename__ = 'assignments'
     
     id = db.Column(db.Integer, primary_key=True)
-    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False)
-    role_level_id = db.Column(db.Integer, db.ForeignKey('role_levels.id'), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False, index=True)
+    role_level_id = db.Column(db.Integer, db.ForeignKey('role_levels.id'), nullable=False, index=True)
     hours = db.Column(db.Float, nullable=False)
     bill_rate_override = db.Column(db.Float)  # Optional override
     cost_rate_override = db.Column(db.Float)  # Optional override
@@ -159,6 +236,10 @@ class ComplexityMatrix(db.Model):
     complexity = db.Column(db.String(20), nullable=False)  # Low, Medium, High
     hours_per_story_point = db.Column(db.Float, nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_complexity_matrix_role_level_complexity', 'role_level_id', 'complexity'),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -168,23 +249,38 @@ class ComplexityMatrix(db.Model):
             'role_level': self.role_level.to_dict() if self.role_level else None
         }
 
+class ReferenceDataVersion(db.Model):
+    __tablename__ = 'reference_data_versions'
+    
+    id = db.Column(db.Integer, primary_key=True)  # A single row, id 1
+    generation = db.Column(db.Integer, nullable=False, default=0)  # Bumped by every write to role levels or the matrix
+
 class EstimateVersion(db.Model):
     __tablename__ = 'estimate_versions'
     
     id = db.Column(db.Integer, primary_key=True)
     project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), nullable=False)
     version_number = db.Column(db.Integer, nullable=False)
-    snapshot_data = db.Column(db.Text, nullable=False)  # JSON snapshot
+    snapshot_data = db.Column(db.Text, nullable=False, default='')  # Legacy uncompressed JSON snapshot
+    snapshot_format = db.Column(db.String(10), nullable=False, default='json', server_default='json')  # json, full or delta
+    snapshot_blob = db.Column(db.LargeBinary)  # zlib-compressed keyframe or delta (see src.services.snapshots)
+    snapshot_size = db.Column(db.Integer)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_by = db.Column(db.String(255))
     notes = db.Column(db.Text)
     
+    __table_args__ = (
+        # Unique, so two saves that read the same last version cannot both commit
+        db.Index('uq_estimate_versions_estimate_version', 'project_estimate_id', 'version_number', unique=True),
+    )
+    
     def to_dict(self):
         return {
             'id': self.id,
             'project_estimate_id': self.project_estimate_id,
             'version_number': self.version_number,
-            'snapshot_data': json.loads(self.snapshot_data) if self.snapshot_data else None,
+            'snapshot_format': self.snapshot_format,
+            'snapshot_size': self.snapshot_size,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'created_by': self.created_by,
             'notes': self.notes
@@ -199,6 +295,10 @@ class RateOverride(db.Model):
     bill_rate = db.Column(db.Float, nullable=False)
     cost_rate = db.Column(db.Float, nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_rate_overrides_estimate_role_level', 'project_estimate_id', 'role_level_id'),
+    )
+    
     # Relationships
     role_level = db.relationship('RoleLevel', backref='rate_overrides')
     
@@ -212,3 +312,188 @@ class RateOverride(db.Model):
             'role_level': self.role_level.to_dict() if self.role_level else None
         }
 
+class ActualEntry(db.Model):
+    __tablename__ = 'actual_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id'), nullable=False, index=True)
+    role_level_id = db.Column(db.Integer, db.ForeignKey('role_levels.id'))
+    entry_date = db.Column(db.Date, nullable=False)
+    hours = db.Column(db.Float, nullable=False)
+    cost = db.Column(db.Float, nullable=False)
+    external_id = db.Column(db.String(255))  # Timesheet line id; re-uploads update instead of duplicating
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('project_estimate_id', 'external_id', name='uq_actual_entries_estimate_external_id'),
+        db.Index('ix_actual_entries_estimate_date', 'project_estimate_id', 'entry_date'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_estimate_id': self.project_estimate_id,
+            'task_id': self.task_id,
+            'role_level_id': self.role_level_id,
+            'entry_date': self.entry_date.isoformat() if self.entry_date else None,
+            'hours': self.hours,
+            'cost': self.cost,
+            'external_id': self.external_id,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class LevelingJob(db.Model):
+    __tablename__ = 'leveling_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), nullable=False, index=True)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, running, done or failed
+    result = db.Column(db.Text)  # JSON proposal of src.services.leveling.solve_leveling
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'estimate_id': self.project_estimate_id,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+        if self.status == 'done':
+            data['result'] = json.loads(self.result)
+        elif self.status == 'failed':
+            data['error'] = self.error
+        return data
+
+class Dependency(db.Model):
+    __tablename__ = 'dependencies'
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), nullable=False, index=True)
+    predecessor_type = db.Column(db.String(10), nullable=False)  # task or activity
+    predecessor_id = db.Column(db.Integer, nullable=False)
+    successor_type = db.Column(db.String(10), nullable=False)  # task or activity
+    successor_id = db.Column(db.Integer, nullable=False)
+    dependency_type = db.Column(db.String(2), nullable=False, default='FS', server_default='FS')  # FS or SS
+    lag_days = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Working days, may be negative
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint(
+            'project_estimate_id', 'predecessor_type', 'predecessor_id', 'successor_type', 'successor_id',
+            name='uq_dependencies_link'
+        ),
+        db.Index('ix_dependencies_estimate_successor', 'project_estimate_id', 'successor_type', 'successor_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_estimate_id': self.project_estimate_id,
+            'predecessor_type': self.predecessor_type,
+            'predecessor_id': self.predecessor_id,
+            'successor_type': self.successor_type,
+            'successor_id': self.successor_id,
+            'dependency_type': self.dependency_type,
+            'lag_days': self.lag_days
+        }
+
+class Holiday(db.Model):
+    __tablename__ = 'holidays'
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_estimate_id = db.Column(db.Integer, db.ForeignKey('project_estimates.id'), index=True)  # None applies to every estimate
+    holiday_date = db.Column(db.Date, nullable=False)
+    name = db.Column(db.String(255))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'project_estimate_id': self.project_estimate_id,
+            'holiday_date': self.holiday_date.isoformat() if self.holiday_date else None,
+            'name': self.name
+        }
+
+
+def configure_sqlite(engine, pragmas):
+    """Run the given PRAGMAs on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+# Indexes superseded by one of the model indexes, dropped by upgrade_schema()
+REPLACED_INDEXES = ('ix_estimate_versions_estimate_version',)
+
+logger = logging.getLogger(__name__)
+
+def renumber_duplicate_versions(connection):
+    """Renumber the versions of estimates that hold duplicate version numbers.
+
+    Saves used to read max(version_number) and insert without a lock, so
+    concurrent saves could store the same number twice, which the unique
+    index would reject. The versions of each affected estimate are numbered
+    1..n again in (version_number, id) order. Returns the estimate ids.
+    """
+    table = EstimateVersion.__table__
+    duplicated = connection.execute(
+        select(table.c.project_estimate_id)
+        .group_by(table.c.project_estimate_id, table.c.version_number)
+        .having(func.count() > 1)
+        .distinct()
+    ).scalars().all()
+    for estimate_id in duplicated:
+        version_ids = connection.execute(
+            select(table.c.id).where(table.c.project_estimate_id == estimate_id)
+            .order_by(table.c.version_number, table.c.id)
+        ).scalars().all()
+        for number, version_id in enumerate(version_ids, start=1):
+            connection.execute(update(table).where(table.c.id == version_id).values(version_number=number))
+        logger.warning('Renumbered %d versions of estimate %d to remove duplicate version numbers',
+                       len(version_ids), estimate_id)
+    return duplicated
+
+def upgrade_schema():
+    """Add columns and indexes that exist on the models but not yet in the database.
+
+    create_all() only creates missing tables, so columns and indexes introduced
+    after a database was first created are added here, and the reference
+    generation row is seeded. Returns the list of 'table.column' names that
+    were added.
+    """
+    inspector = inspect(db.engine)
+    added = []
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(db.engine.dialect)}'
+                if column.server_default is not None:
+                    ddl += f" DEFAULT '{column.server_default.arg}'"
+                connection.execute(text(ddl))
+                added.append(f'{table.name}.{column.name}')
+            if table is EstimateVersion.__table__:
+                renumber_duplicate_versions(connection)
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+        for name in REPLACED_INDEXES:
+            connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
+        # The single reference generation row is only ever updated after this
+        if connection.dialect.name in ('sqlite', 'postgresql'):
+            seed = 'INSERT INTO reference_data_versions (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING'
+        else:
+            seed = ('INSERT INTO reference_data_versions (id, generation) SELECT 1, 0 '
+                    'WHERE NOT EXISTS (SELECT 1 FROM reference_data_versions WHERE id = 1)')
+        connection.execute(text(seed))
+    return added
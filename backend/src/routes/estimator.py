@@ -1,31 +1,163 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g, has_app_context, Response, stream_with_context
+from sqlalchemy import event, select, func, or_, and_, update
+from sqlalchemy.orm import defer
+from sqlalchemy.engine import Engine
 from src.models.estimator import (
     db, ProjectEstimate, Phase, Activity, Task, RoleLevel, 
-    Assignment, ComplexityMatrix, EstimateVersion, RateOverride
+    Assignment, ComplexityMatrix, EstimateVersion, RateOverride, Dependency, Holiday
+)
+from src.services.kpis import estimate_kpis
+from src.services.staffing import estimate_staffing, staffing_heatmap, heatmap_csv, HEATMAP_LEVELS
+from src.services.scheduler import (
+    estimate_schedule, check_dependency, reschedule, refresh_schedule,
+    DEPENDENCY_TYPES, DEPENDENCY_NODE_TYPES
+)
+from src.services.estimation import re_estimate, re_estimate_task
+from src.services.reference import reference_data, estimate_generation
+from src.services.serialization import dumps, compress_response, payload_response, not_modified
+from src.services.normalized import normalized_estimate, ESTIMATE_SHAPES
+from src.services.simulation import simulate_estimate, SIMULATION_DISTRIBUTIONS, SIMULATION_MAX_ITERATIONS
+from src.services.leveling import start_leveling, leveling_job, LevelingQueueFull
+from src.services.rollups import ancestor_rollups, apply_rollup_deltas, bump_revisions
+from src.services.cloning import clone_estimate_tree, insert_estimate_tree
+from src.services.snapshots import save_version, load_snapshot
+from src.services.version_diff import diff_versions
+from src.services.exports import (
+    excel_sheets, flat_wbs_rows, stream_ndjson, stream_csv, FLAT_WBS_COLUMNS
+)
+from src.services.xlsx import stream_workbook
+from src.services.pdf_export import export_estimate_pdf, RenderQueueFull
+from src.services.actuals import (
+    ingest_actuals, parse_csv, actuals_variance, ACTUALS_MAX_ROWS, VARIANCE_PERIODS
 )
 import json
-from datetime import datetime
+import base64
+from datetime import datetime, timezone, date
 
 estimator_bp = Blueprint('estimator', __name__)
 
+# Count SQL statements per request so query regressions show up in X-Query-Count
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    if has_app_context():
+        g.query_count = g.get('query_count', 0) + 1
+
 # CORS headers for all routes
 @estimator_bp.after_request
 def after_request(response):
+    response.headers['X-Query-Count'] = str(g.get('query_count', 0))
     response.headers.add('Access-Control-Allow-Origin', '*')
     response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
     response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,PATCH,OPTIONS')
-    return response
+    return compress_response(response, request.accept_encodings)
 
 @estimator_bp.route('/options', methods=['OPTIONS'])
 def handle_options():
     return '', 200
 
+# Summary listing (?view=summary) shared by estimates and templates
+SUMMARY_SORT_COLUMNS = {
+    'name': ProjectEstimate.name,
+    'created_at': ProjectEstimate.created_at,
+    'updated_at': ProjectEstimate.updated_at,
+    'id': ProjectEstimate.id,
+}
+SUMMARY_DEFAULT_LIMIT = 50
+SUMMARY_MAX_LIMIT = 500
+
+def encode_cursor(value, estimate_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, estimate_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor, column):
+    value, estimate_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if column.type.python_type is datetime and value is not None:
+        value = datetime.fromisoformat(value)
+    return value, int(estimate_id)
+
+def list_estimate_summaries(query):
+    """Keyset-paginated summary rows with task counts and hours aggregated in SQL.
+
+    Query parameters: q (name/description search), status (comma-separated),
+    sort (name, created_at, updated_at or id; prefix with '-' for descending),
+    limit and cursor (the next_cursor of the previous page).
+    """
+    search = request.args.get('q', '').strip()
+    if search:
+        pattern = f'%{search}%'
+        query = query.filter(or_(
+            ProjectEstimate.name.ilike(pattern),
+            ProjectEstimate.description.ilike(pattern)
+        ))
+
+    statuses = [s for s in request.args.get('status', '').split(',') if s]
+    if statuses:
+        query = query.filter(ProjectEstimate.status.in_(statuses))
+
+    sort = request.args.get('sort', '-updated_at')
+    descending = sort.startswith('-')
+    column = SUMMARY_SORT_COLUMNS.get(sort.lstrip('-'))
+    if column is None:
+        return jsonify({'error': f'Unsupported sort: {sort}'}), 400
+
+    try:
+        limit = min(max(int(request.args.get('limit', SUMMARY_DEFAULT_LIMIT)), 1), SUMMARY_MAX_LIMIT)
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            value, last_id = decode_cursor(cursor, column)
+        except (ValueError, TypeError):
+            return jsonify({'error': 'Invalid cursor'}), 400
+        if descending:
+            query = query.filter(or_(column < value, and_(column == value, ProjectEstimate.id < last_id)))
+        else:
+            query = query.filter(or_(column > value, and_(column == value, ProjectEstimate.id > last_id)))
+
+    if descending:
+        query = query.order_by(column.desc(), ProjectEstimate.id.desc())
+    else:
+        query = query.order_by(column.asc(), ProjectEstimate.id.asc())
+
+    # Fetch one extra row to know whether another page exists
+    estimates = query.limit(limit + 1).all()
+    has_more = len(estimates) > limit
+    estimates = estimates[:limit]
+
+    totals = {}
+    if estimates:
+        rows = db.session.query(
+            Phase.project_estimate_id,
+            func.count(Task.id),
+            func.coalesce(func.sum(Task.estimated_hours), 0.0)
+        ).join(Activity, Activity.phase_id == Phase.id) \
+         .join(Task, Task.activity_id == Activity.id) \
+         .filter(Phase.project_estimate_id.in_([e.id for e in estimates])) \
+         .group_by(Phase.project_estimate_id).all()
+        totals = {estimate_id: (count, hours) for estimate_id, count, hours in rows}
+
+    next_cursor = None
+    if has_more:
+        last = estimates[-1]
+        next_cursor = encode_cursor(getattr(last, column.key), last.id)
+
+    return jsonify({
+        'items': [e.to_summary_dict(*totals.get(e.id, (0, 0.0))) for e in estimates],
+        'next_cursor': next_cursor
+    })
+
 # Templates endpoints
 @estimator_bp.route('/templates', methods=['GET'])
 def get_templates():
     """Get all project templates"""
     try:
-        estimates = ProjectEstimate.query.filter_by(status='template').all()
+        if request.args.get('view') == 'summary':
+            return list_estimate_summaries(ProjectEstimate.query.filter_by(status='template'))
+        estimates = ProjectEstimate.tree_query().filter_by(status='template').all()
         return jsonify([estimate.to_dict() for estimate in estimates])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -46,40 +178,11 @@ def create_template():
         db.session.add(template)
         db.session.flush()  # Get the ID
         
-        # Create phases, activities, and tasks
-        for phase_data in data.get('phases', []):
-            phase = Phase(
-                name=phase_data.get('name'),
-                description=phase_data.get('description'),
-                order_index=phase_data.get('order_index'),
-                project_estimate_id=template.id
-            )
-            db.session.add(phase)
-            db.session.flush()
-            
-            for activity_data in phase_data.get('activities', []):
-                activity = Activity(
-                    name=activity_data.get('name'),
-                    description=activity_data.get('description'),
-                    order_index=activity_data.get('order_index'),
-                    phase_id=phase.id
-                )
-                db.session.add(activity)
-                db.session.flush()
-                
-                for task_data in activity_data.get('tasks', []):
-                    task = Task(
-                        name=task_data.get('name'),
-                        description=task_data.get('description'),
-                        order_index=task_data.get('order_index'),
-                        complexity=task_data.get('complexity'),
-                        story_points=task_data.get('story_points', 0),
-                        estimated_hours=task_data.get('estimated_hours', 0.0),
-                        activity_id=activity.id
-                    )
-                    db.session.add(task)
+        # Create phases, activities, tasks and assignments with bulk inserts
+        insert_estimate_tree(template.id, data)
         
         db.session.commit()
+        template = ProjectEstimate.tree_query().filter_by(id=template.id).first()
         return jsonify(template.to_dict()), 201
         
     except Exception as e:
@@ -91,7 +194,9 @@ def create_template():
 def get_estimates():
     """Get all project estimates"""
     try:
-        estimates = ProjectEstimate.query.filter(ProjectEstimate.status != 'template').all()
+        if request.args.get('view') == 'summary':
+            return list_estimate_summaries(ProjectEstimate.query.filter(ProjectEstimate.status != 'template'))
+        estimates = ProjectEstimate.tree_query().filter(ProjectEstimate.status != 'template').all()
         return jsonify([estimate.to_dict() for estimate in estimates])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -120,38 +225,8 @@ def create_estimate():
             db.session.add(estimate)
             db.session.flush()
             
-            # Clone phases, activities, and tasks
-            for template_phase in template.phases:
-                phase = Phase(
-                    name=template_phase.name,
-                    description=template_phase.description,
-                    order_index=template_phase.order_index,
-                    project_estimate_id=estimate.id
-                )
-                db.session.add(phase)
-                db.session.flush()
-                
-                for template_activity in template_phase.activities:
-                    activity = Activity(
-                        name=template_activity.name,
-                        description=template_activity.description,
-                        order_index=template_activity.order_index,
-                        phase_id=phase.id
-                    )
-                    db.session.add(activity)
-                    db.session.flush()
-                    
-                    for template_task in template_activity.tasks:
-                        task = Task(
-                            name=template_task.name,
-                            description=template_task.description,
-                            order_index=template_task.order_index,
-                            complexity=template_task.complexity,
-                            story_points=template_task.story_points,
-                            estimated_hours=template_task.estimated_hours,
-                            activity_id=activity.id
-                        )
-                        db.session.add(task)
+            # Clone phases, activities, tasks, assignments and rate overrides set-based
+            clone_estimate_tree(template.id, estimate.id)
         else:
             # Create blank estimate
             estimate = ProjectEstimate(
@@ -164,20 +239,49 @@ def create_estimate():
             db.session.add(estimate)
         
         db.session.commit()
+        estimate = ProjectEstimate.tree_query().filter_by(id=estimate.id).first()
         return jsonify(estimate.to_dict()), 201
         
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# The estimate tree embeds role levels, so its ETag covers their generation too
+ESTIMATE_CACHE_CONTROL = 'no-cache'
+
+def estimate_etag(revision, generation, shape='nested'):
+    etag = f'{revision}.{generation}'
+    return etag if shape == 'nested' else f'{etag}.{shape}'
+
 @estimator_bp.route('/estimates/<int:estimate_id>', methods=['GET'])
 def get_estimate(estimate_id):
-    """Get a specific project estimate"""
+    """Get a specific project estimate (revalidate with If-None-Match)
+
+    ?shape=normalized returns flat arrays and a role_levels lookup instead
+    of the nested tree.
+    """
     try:
-        estimate = ProjectEstimate.query.get(estimate_id)
-        if not estimate:
+        shape = request.args.get('shape', 'nested')
+        if shape not in ESTIMATE_SHAPES:
+            return jsonify({'error': f"shape must be one of {', '.join(ESTIMATE_SHAPES)}"}), 400
+        connection = db.session.connection()
+        revision, generation = estimate_generation(connection, estimate_id)
+        if revision is None:
             return jsonify({'error': 'Estimate not found'}), 404
-        return jsonify(estimate.to_dict())
+        etag = estimate_etag(revision, generation, shape)
+        response = not_modified(request.if_none_match, etag)
+        if response is None:
+            # The tree is only loaded and encoded once per revision, shape and encoding
+            def build():
+                if shape == 'normalized':
+                    return dumps(normalized_estimate(ProjectEstimate.query.get(estimate_id)))
+                return dumps(ProjectEstimate.tree_query().filter_by(id=estimate_id).one().to_dict())
+            # The tree is read by later SELECTs, so a write may commit before it is loaded
+            response = payload_response(('estimate', estimate_id, revision, generation, shape), build,
+                                        request.accept_encodings, etag,
+                                        current=lambda: estimate_generation(connection, estimate_id) == (revision, generation))
+        response.headers['Cache-Control'] = ESTIMATE_CACHE_CONTROL
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -199,10 +303,19 @@ def update_estimate(estimate_id):
             estimate.currency = data['currency']
         if 'contingency_percentage' in data:
             estimate.contingency_percentage = data['contingency_percentage']
+            # Every task duration scales with contingency
+            refresh_schedule(estimate)
         if 'status' in data:
             estimate.status = data['status']
+        if 'start_date' in data:
+            try:
+                estimate.start_date = date.fromisoformat(data['start_date']) if data['start_date'] else None
+            except (TypeError, ValueError):
+                return jsonify({'error': 'start_date must be an ISO date'}), 400
         
-        estimate.updated_at = datetime.utcnow()
+        # A no-op update leaves the row, and so its revision, alone
+        if db.session.is_modified(estimate):
+            estimate.updated_at = datetime.utcnow()
         db.session.commit()
         
         return jsonify(estimate.to_dict())
@@ -210,6 +323,330 @@ def update_estimate(estimate_id):
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@estimator_bp.route('/estimates/<int:estimate_id>/kpis', methods=['GET'])
+def get_estimate_kpis(estimate_id):
+    """Get hours, cost, revenue and AGM per task, activity, phase and estimate"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        return jsonify(estimate_kpis(estimate))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/re-estimate', methods=['POST'])
+def re_estimate_drafts():
+    """Derive task and assignment hours from story points for every draft estimate"""
+    try:
+        # Never correlated, so it can also filter the UPDATE of project_estimates itself
+        drafts = select(ProjectEstimate.id).where(ProjectEstimate.status == 'draft').correlate(None)
+        estimate_count = db.session.scalar(select(func.count()).select_from(drafts.subquery()))
+        assignments, tasks = re_estimate(drafts)
+        db.session.commit()
+        return jsonify({'estimates': estimate_count, 'assignments': assignments, 'tasks': tasks})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/re-estimate', methods=['POST'])
+def re_estimate_estimate(estimate_id):
+    """Derive task and assignment hours of one estimate from story points and the complexity matrix"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        assignments, tasks = re_estimate([estimate.id])
+        db.session.commit()
+        return jsonify({
+            'estimates': 1,
+            'assignments': assignments,
+            'tasks': tasks,
+            'rollups': [estimate.rollup_dict()]
+        })
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/staffing', methods=['GET'])
+def get_estimate_staffing(estimate_id):
+    """Get the role x week FTE matrix and the weeks where a role is overloaded"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        try:
+            capacity = float(request.args.get('capacity', 1.0))
+        except ValueError:
+            capacity = 0
+        if capacity <= 0:
+            return jsonify({'error': 'capacity must be a positive number of FTE'}), 400
+        return jsonify(estimate_staffing(estimate, capacity))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/staffing/heatmap', methods=['GET'])
+def get_staffing_heatmap(estimate_id):
+    """Get weekly FTE per role or role level as compact JSON arrays or streamed CSV"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        
+        group = request.args.get('group', 'role_level')
+        if group not in ('role', 'role_level'):
+            return jsonify({'error': f'Unsupported group: {group}'}), 400
+        export_format = request.args.get('format', 'json')
+        if export_format not in ('json', 'csv'):
+            return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+        try:
+            start_week = int(request.args.get('start_week', 0))
+            end_week = request.args.get('end_week')
+            end_week = int(end_week) if end_week else None
+            thresholds = [float(value) for value in request.args.get('thresholds', '0.5,1,1.5').split(',')]
+        except ValueError:
+            return jsonify({'error': 'start_week, end_week and thresholds must be numbers'}), 400
+        if start_week < 0 or (end_week is not None and end_week < start_week):
+            return jsonify({'error': 'Invalid week range'}), 400
+        if len(thresholds) != len(HEATMAP_LEVELS) - 1 or thresholds != sorted(thresholds):
+            return jsonify({'error': f'thresholds must be {len(HEATMAP_LEVELS) - 1} ascending FTE values'}), 400
+        
+        heatmap = staffing_heatmap(estimate, group, start_week, end_week, thresholds)
+        if export_format == 'csv':
+            return Response(
+                heatmap_csv(heatmap),
+                mimetype='text/csv',
+                headers={'Content-Disposition': f'attachment; filename="staffing-{estimate.id}.csv"'}
+            )
+        return jsonify(heatmap)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/schedule', methods=['GET'])
+def get_estimate_schedule(estimate_id):
+    """Get early/late dates, slack and the critical path of every task, activity and phase"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        schedule = estimate_schedule(estimate)
+        # Early dates are stored for incremental rescheduling of later edits
+        db.session.commit()
+        return jsonify(schedule)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/leveling', methods=['POST'])
+def create_leveling_job(estimate_id):
+    """Start a resource leveling job that keeps role levels under an FTE cap"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        try:
+            capacity = float(data.get('capacity', 1.0))
+            capacities = {
+                int(role_level_id): float(value)
+                for role_level_id, value in (data.get('capacities') or {}).items()
+            }
+        except (TypeError, ValueError, AttributeError):
+            return jsonify({'error': 'capacity must be a number and capacities a map of role level id to FTE'}), 400
+        if capacity <= 0 or any(value <= 0 for value in capacities.values()):
+            return jsonify({'error': 'Capacities must be positive numbers of FTE'}), 400
+        
+        job = start_leveling(estimate, capacity, capacities)
+        return jsonify(job.to_dict()), 202, {'Location': f'/api/leveling/{job.id}'}
+    except LevelingQueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/simulate', methods=['POST'])
+def simulate_estimate_contingency(estimate_id):
+    """Run a Monte Carlo simulation of task hours and suggest a contingency"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        
+        data = request.get_json(silent=True) or {}
+        iterations = data.get('iterations', 10000)
+        seed = data.get('seed')
+        distribution = data.get('distribution', 'pert')
+        confidence = data.get('confidence', 80)
+        if not isinstance(iterations, int) or isinstance(iterations, bool) \
+                or not 1 <= iterations <= SIMULATION_MAX_ITERATIONS:
+            return jsonify({'error': f'iterations must be an integer from 1 to {SIMULATION_MAX_ITERATIONS}'}), 400
+        if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool) or seed < 0):
+            return jsonify({'error': 'seed must be a non-negative integer'}), 400
+        if distribution not in SIMULATION_DISTRIBUTIONS:
+            return jsonify({'error': f'Unsupported distribution: {distribution}'}), 400
+        if not isinstance(confidence, (int, float)) or isinstance(confidence, bool) or not 0 < confidence < 100:
+            return jsonify({'error': 'confidence must be a percentage between 0 and 100'}), 400
+        
+        return jsonify(simulate_estimate(estimate, iterations, seed, distribution, confidence))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/leveling/<job_id>', methods=['GET'])
+def get_leveling_job(job_id):
+    """Get the status of a leveling job, with the proposed schedule once done"""
+    try:
+        job = leveling_job(job_id)
+        if not job:
+            return jsonify({'error': 'Leveling job not found'}), 404
+        return jsonify(job.to_dict())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/dependencies', methods=['GET'])
+def get_dependencies(estimate_id):
+    """Get the task and activity dependencies of an estimate"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        dependencies = Dependency.query.filter_by(project_estimate_id=estimate_id).order_by(Dependency.id).all()
+        return jsonify([dependency.to_dict() for dependency in dependencies])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/estimates/<int:estimate_id>/dependencies', methods=['POST'])
+def create_dependency(estimate_id):
+    """Add a finish-to-start or start-to-start dependency between tasks and/or activities"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        
+        data = request.get_json()
+        if data.get('predecessor_type') not in DEPENDENCY_NODE_TYPES or \
+                data.get('successor_type') not in DEPENDENCY_NODE_TYPES:
+            return jsonify({'error': 'predecessor_type and successor_type must be task or activity'}), 400
+        dependency_type = data.get('dependency_type', 'FS')
+        if dependency_type not in DEPENDENCY_TYPES:
+            return jsonify({'error': f'Unsupported dependency_type: {dependency_type}'}), 400
+        try:
+            predecessor_id = int(data['predecessor_id'])
+            successor_id = int(data['successor_id'])
+            lag_days = int(data.get('lag_days') or 0)
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'predecessor_id, successor_id and lag_days must be integers'}), 400
+        
+        link = (data['predecessor_type'], predecessor_id, data['successor_type'], successor_id)
+        if Dependency.query.filter_by(
+            project_estimate_id=estimate_id, predecessor_type=link[0], predecessor_id=link[1],
+            successor_type=link[2], successor_id=link[3]
+        ).first():
+            return jsonify({'error': 'Dependency already exists'}), 409
+        error = check_dependency(estimate, link + (dependency_type, lag_days))
+        if error:
+            return jsonify({'error': error}), 400
+        
+        dependency = Dependency(
+            project_estimate_id=estimate_id,
+            predecessor_type=link[0],
+            predecessor_id=link[1],
+            successor_type=link[2],
+            successor_id=link[3],
+            dependency_type=dependency_type,
+            lag_days=lag_days
+        )
+        db.session.add(dependency)
+        estimate.updated_at = datetime.utcnow()
+        db.session.flush()
+        schedule = reschedule(estimate, successors=[(link[2], link[3])])
+        db.session.commit()
+        
+        result = dependency.to_dict()
+        result['schedule'] = schedule
+        return jsonify(result), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/dependencies/<int:dependency_id>', methods=['DELETE'])
+def delete_dependency(dependency_id):
+    """Remove a dependency"""
+    try:
+        dependency = Dependency.query.get(dependency_id)
+        if not dependency:
+            return jsonify({'error': 'Dependency not found'}), 404
+        estimate = ProjectEstimate.query.get(dependency.project_estimate_id)
+        successor = (dependency.successor_type, dependency.successor_id)
+        estimate.updated_at = datetime.utcnow()
+        db.session.delete(dependency)
+        db.session.flush()
+        schedule = reschedule(estimate, successors=[successor])
+        db.session.commit()
+        return jsonify({'message': 'Dependency deleted', 'schedule': schedule})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Holidays endpoints
+@estimator_bp.route('/holidays', methods=['GET'])
+def get_holidays():
+    """Get global holidays, plus those of one estimate with ?estimate_id"""
+    try:
+        query = Holiday.query.filter(Holiday.project_estimate_id.is_(None))
+        estimate_id = request.args.get('estimate_id', type=int)
+        if estimate_id:
+            query = Holiday.query.filter(or_(
+                Holiday.project_estimate_id.is_(None), Holiday.project_estimate_id == estimate_id
+            ))
+        holidays = query.order_by(Holiday.holiday_date).all()
+        return jsonify([holiday.to_dict() for holiday in holidays])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/holidays', methods=['POST'])
+def create_holiday():
+    """Add a non-working day for every estimate, or for one with project_estimate_id"""
+    try:
+        data = request.get_json()
+        try:
+            holiday_date = date.fromisoformat(data['holiday_date'])
+        except (KeyError, TypeError, ValueError):
+            return jsonify({'error': 'holiday_date must be an ISO date'}), 400
+        estimate_id = data.get('project_estimate_id')
+        if estimate_id is not None and not ProjectEstimate.query.get(estimate_id):
+            return jsonify({'error': 'Estimate not found'}), 404
+        
+        holiday = Holiday(project_estimate_id=estimate_id, holiday_date=holiday_date, name=data.get('name'))
+        db.session.add(holiday)
+        db.session.commit()
+        
+        return jsonify(holiday.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/holidays/<int:holiday_id>', methods=['DELETE'])
+def delete_holiday(holiday_id):
+    """Remove a holiday"""
+    try:
+        holiday = Holiday.query.get(holiday_id)
+        if not holiday:
+            return jsonify({'error': 'Holiday not found'}), 404
+        db.session.delete(holiday)
+        db.session.commit()
+        return jsonify({'message': 'Holiday deleted'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 # Tasks endpoints
 @estimator_bp.route('/tasks/<int:task_id>', methods=['PATCH'])
 def update_task(task_id):
@@ -231,20 +668,171 @@ def update_task(task_id):
             task.story_points = data['story_points']
         if 'estimated_hours' in data:
             task.estimated_hours = data['estimated_hours']
+        for key in ('low_hours', 'likely_hours', 'high_hours'):
+            if key in data:
+                setattr(task, key, data[key])
         
+        # Activity/phase/estimate rollups are adjusted by the flush in this transaction
+        db.session.flush()
+        schedule = None
+        if 'estimated_hours' in data:
+            schedule = reschedule(task.activity.phase.project_estimate, [task.id])
         db.session.commit()
-        return jsonify(task.to_dict())
+        result = task.to_dict()
+        result['rollups'] = ancestor_rollups(task)
+        result['schedule'] = schedule
+        return jsonify(result)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/tasks/<int:task_id>/re-estimate', methods=['POST'])
+def re_estimate_single_task(task_id):
+    """Derive a task's assignment hours and estimated hours from its story points"""
+    try:
+        task = Task.query.get(task_id)
+        if not task:
+            return jsonify({'error': 'Task not found'}), 404
+        if not re_estimate_task(task):
+            return jsonify({'error': 'Task has no assignments to estimate'}), 400
+        
+        db.session.flush()
+        schedule = reschedule(task.activity.phase.project_estimate, [task.id])
+        db.session.commit()
+        result = task.to_dict()
+        result['rollups'] = ancestor_rollups(task)
+        result['schedule'] = schedule
+        return jsonify(result)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Fields accepted by the batch task endpoint and their validators
+TASK_BATCH_FIELDS = {
+    'name': lambda v: isinstance(v, str) and v.strip() != '',
+    'description': lambda v: v is None or isinstance(v, str),
+    'complexity': lambda v: v is None or v in ('Low', 'Medium', 'High'),
+    'story_points': lambda v: isinstance(v, int) and not isinstance(v, bool) and v >= 0,
+    'estimated_hours': lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0,
+    'low_hours': lambda v: v is None or (isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0),
+    'likely_hours': lambda v: v is None or (isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0),
+    'high_hours': lambda v: v is None or (isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0),
+}
+TASK_BATCH_MAX_ITEMS = 5000
+
+def validate_task_batch_item(item):
+    """Return an error message for an invalid batch item, or None."""
+    if not isinstance(item, dict):
+        return 'Item must be an object'
+    task_id = item.get('id')
+    if not isinstance(task_id, int) or isinstance(task_id, bool):
+        return 'id must be an integer'
+    fields = [key for key in item if key != 'id']
+    if not fields:
+        return 'No fields to update'
+    for key in fields:
+        validator = TASK_BATCH_FIELDS.get(key)
+        if validator is None:
+            return f'Unknown field: {key}'
+        if not validator(item[key]):
+            return f'Invalid value for {key}'
+    return None
+
+@estimator_bp.route('/tasks', methods=['PATCH'])
+def update_tasks():
+    """Update many tasks in one transaction (grid edits and spreadsheet pastes)"""
+    try:
+        items = request.get_json()
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a list of task updates'}), 400
+        if len(items) > TASK_BATCH_MAX_ITEMS:
+            return jsonify({'error': f'At most {TASK_BATCH_MAX_ITEMS} updates per request'}), 400
+
+        results = [{'id': item.get('id') if isinstance(item, dict) else None, 'status': 'updated'} for item in items]
+        for result, item in zip(results, items):
+            error = validate_task_batch_item(item)
+            if error:
+                result.update(status='error', error=error)
+
+        # Current hours and parent of every referenced task, in one query
+        task_ids = {item['id'] for item, result in zip(items, results) if result['status'] == 'updated'}
+        existing = {
+            task_id: (activity_id, hours or 0.0)
+            for task_id, activity_id, hours in db.session.query(
+                Task.id, Task.activity_id, Task.estimated_hours
+            ).filter(Task.id.in_(task_ids))
+        } if task_ids else {}
+
+        # Later items for the same task win, as if the PATCHes were sent in order
+        updates = {}
+        for item, result in zip(items, results):
+            if result['status'] != 'updated':
+                continue
+            if item['id'] not in existing:
+                result.update(status='error', error='Task not found')
+                continue
+            updates.setdefault(item['id'], {'id': item['id']}).update(item)
+
+        deltas = {}
+        for task_id, values in updates.items():
+            if 'estimated_hours' in values:
+                activity_id, old_hours = existing[task_id]
+                delta = deltas.setdefault(activity_id, [0.0, 0.0, 0.0])
+                delta[0] += values['estimated_hours'] - old_hours
+
+        schedules = []
+        if updates:
+            # ORM bulk UPDATE by primary key: rows with the same keys share one executemany
+            db.session.execute(update(Task), list(updates.values()))
+            estimate_ids = apply_rollup_deltas(db.session.connection(), deltas)
+            # The bulk UPDATE bypasses the flush, so bump revisions here and
+            # move the stored schedule of every estimate whose task hours changed
+            edited = set()
+            tasks_by_estimate = {}
+            for task_id, estimate_id in db.session.query(Task.id, Phase.project_estimate_id) \
+                    .join(Activity, Activity.id == Task.activity_id) \
+                    .join(Phase, Phase.id == Activity.phase_id) \
+                    .filter(Task.id.in_(list(updates))):
+                edited.add(estimate_id)
+                if 'estimated_hours' in updates[task_id]:
+                    tasks_by_estimate.setdefault(estimate_id, []).append(task_id)
+            bump_revisions(db.session.connection(), sorted(edited))
+            for estimate_id, task_ids in tasks_by_estimate.items():
+                schedule = reschedule(ProjectEstimate.query.get(estimate_id), task_ids)
+                if schedule is not None:
+                    schedules.append(dict(schedule, estimate_id=estimate_id))
+            db.session.commit()
+        else:
+            estimate_ids = set()
+
+        estimates = ProjectEstimate.query.filter(ProjectEstimate.id.in_(estimate_ids)).all() if estimate_ids else []
+        return jsonify({
+            'results': results,
+            'updated': len(updates),
+            'rollups': [estimate.rollup_dict() for estimate in estimates],
+            'schedules': schedules
+        })
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+# Reference data is served from the process cache; clients revalidate with If-None-Match
+REFERENCE_CACHE_CONTROL = 'no-cache'
+
+def reference_response(payload):
+    body, etag = payload
+    response = not_modified(request.if_none_match, etag)
+    if response is None:
+        response = payload_response(('reference', etag), lambda: body, request.accept_encodings, etag)
+    response.headers['Cache-Control'] = REFERENCE_CACHE_CONTROL
+    return response
+
 # Role Levels endpoints
 @estimator_bp.route('/role-levels', methods=['GET'])
 def get_role_levels():
     """Get all role levels"""
     try:
-        role_levels = RoleLevel.query.all()
-        return jsonify([role_level.to_dict() for role_level in role_levels])
+        return reference_response(reference_data().role_levels_payload)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -272,10 +860,15 @@ def create_role_level():
 # Complexity Matrix endpoints
 @estimator_bp.route('/complexity-matrix', methods=['GET'])
 def get_complexity_matrix():
-    """Get complexity matrix entries"""
+    """Get complexity matrix entries (?shape=normalized for a role_levels lookup)"""
     try:
-        entries = ComplexityMatrix.query.all()
-        return jsonify([entry.to_dict() for entry in entries])
+        shape = request.args.get('shape', 'nested')
+        if shape not in ESTIMATE_SHAPES:
+            return jsonify({'error': f"shape must be one of {', '.join(ESTIMATE_SHAPES)}"}), 400
+        data = reference_data()
+        if shape == 'normalized':
+            return reference_response(data.normalized_complexity_matrix_payload)
+        return reference_response(data.complexity_matrix_payload)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -304,35 +897,87 @@ def create_complexity_matrix_entry():
 def create_version(estimate_id):
     """Create a version snapshot"""
     try:
-        estimate = ProjectEstimate.query.get(estimate_id)
+        estimate = ProjectEstimate.tree_query().filter_by(id=estimate_id).first()
         if not estimate:
             return jsonify({'error': 'Estimate not found'}), 404
         
         data = request.get_json()
         
-        # Get the next version number
-        last_version = EstimateVersion.query.filter_by(
-            project_estimate_id=estimate_id
-        ).order_by(EstimateVersion.version_number.desc()).first()
-        
-        next_version = (last_version.version_number + 1) if last_version else 1
+        # Rate overrides are captured so version diffs can price assignments
+        tree = estimate.to_dict()
+        tree['rate_overrides'] = [
+            {'role_level_id': o.role_level_id, 'bill_rate': o.bill_rate, 'cost_rate': o.cost_rate}
+            for o in estimate.rate_overrides
+        ]
         
-        version = EstimateVersion(
-            project_estimate_id=estimate_id,
-            version_number=next_version,
-            snapshot_data=json.dumps(estimate.to_dict()),
+        # Stored as a compressed keyframe or a delta against the previous version
+        version, snapshot = save_version(
+            estimate,
+            tree,
             created_by=data.get('created_by'),
             notes=data.get('notes')
         )
         
-        db.session.add(version)
-        db.session.commit()
-        
-        return jsonify(version.to_dict()), 201
+        result = version.to_dict()
+        result['snapshot_data'] = snapshot
+        return jsonify(result), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@estimator_bp.route('/versions/<int:estimate_id>', methods=['GET'])
+def get_versions(estimate_id):
+    """List versions of an estimate without loading their snapshots"""
+    try:
+        versions = EstimateVersion.query.options(
+            defer(EstimateVersion.snapshot_data), defer(EstimateVersion.snapshot_blob)
+        ).filter_by(project_estimate_id=estimate_id).order_by(EstimateVersion.version_number).all()
+        return jsonify([version.to_dict() for version in versions])
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@estimator_bp.route('/versions/<int:estimate_id>/diff', methods=['GET'])
+def get_version_diff(estimate_id):
+    """Compare two versions: added/removed/changed nodes with KPI deltas"""
+    try:
+        from_version = request.args.get('from', type=int)
+        to_version = request.args.get('to', type=int)
+        if from_version is None or to_version is None:
+            return jsonify({'error': 'from and to version numbers are required'}), 400
+        try:
+            return jsonify(diff_versions(estimate_id, from_version, to_version))
+        except LookupError:
+            return jsonify({'error': 'Version not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+VERSION_CACHE_CONTROL = 'no-cache'
+
+@estimator_bp.route('/versions/<int:estimate_id>/<int:version_number>', methods=['GET'])
+def get_version(estimate_id, version_number):
+    """Get one version with its reconstructed snapshot"""
+    try:
+        version = EstimateVersion.query.options(
+            defer(EstimateVersion.snapshot_data), defer(EstimateVersion.snapshot_blob)
+        ).filter_by(project_estimate_id=estimate_id, version_number=version_number).first()
+        if not version:
+            return jsonify({'error': 'Version not found'}), 404
+
+        # Versions never change, so the encoded snapshot is cached per encoding
+        def build():
+            result = version.to_dict()
+            result['snapshot_data'] = load_snapshot(version)
+            return dumps(result)
+        created_at = version.created_at.isoformat() if version.created_at else ''
+        etag = f'version-{version.id}-{created_at}'
+        response = not_modified(request.if_none_match, etag)
+        if response is None:
+            response = payload_response(('version', version.id, created_at), build, request.accept_encodings, etag)
+        response.headers['Cache-Control'] = VERSION_CACHE_CONTROL
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Export endpoints
 @estimator_bp.route('/export/pdf/<int:estimate_id>', methods=['GET'])
 def export_pdf(estimate_id):
@@ -342,8 +987,16 @@ def export_pdf(estimate_id):
         if not estimate:
             return jsonify({'error': 'Estimate not found'}), 404
         
-        # TODO: Implement PDF generation
-        return jsonify({'message': 'PDF export not yet implemented'}), 501
+        key, pdf, cached = export_estimate_pdf(estimate)
+        response = Response(pdf, mimetype='application/pdf', headers={
+            'Content-Disposition': f'attachment; filename="estimate-{estimate.id}.pdf"',
+            'X-Render-Cache': 'hit' if cached else 'miss'
+        })
+        if key:
+            response.set_etag(key)
+        return response.make_conditional(request)
+    except RenderQueueFull as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -355,24 +1008,91 @@ def export_excel(estimate_id):
         if not estimate:
             return jsonify({'error': 'Estimate not found'}), 404
         
-        # TODO: Implement Excel generation
-        return jsonify({'message': 'Excel export not yet implemented'}), 501
+        # Rows are read and written while the response streams
+        return Response(
+            stream_with_context(stream_workbook(excel_sheets(estimate))),
+            mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={'Content-Disposition': f'attachment; filename="estimate-{estimate.id}.xlsx"'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+WBS_EXPORT_FORMATS = {
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv')
+}
+
+@estimator_bp.route('/export/wbs', methods=['GET'])
+def export_wbs():
+    """Stream one flat row per task across all estimates as NDJSON or CSV"""
+    try:
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in WBS_EXPORT_FORMATS:
+            return jsonify({'error': f'Unsupported format: {export_format}'}), 400
+        updated_since = request.args.get('updated_since')
+        if updated_since:
+            try:
+                updated_since = datetime.fromisoformat(updated_since)
+            except ValueError:
+                return jsonify({'error': 'updated_since must be an ISO 8601 datetime'}), 400
+            if updated_since.tzinfo is not None:
+                # updated_at is stored as naive UTC
+                updated_since = updated_since.astimezone(timezone.utc).replace(tzinfo=None)
+        
+        serialize, mimetype = WBS_EXPORT_FORMATS[export_format]
+        rows = flat_wbs_rows(updated_since or None)
+        return Response(
+            stream_with_context(serialize(FLAT_WBS_COLUMNS, rows)),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="wbs.{export_format}"'}
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Actuals endpoints
 @estimator_bp.route('/actuals/<int:estimate_id>', methods=['POST'])
 def post_actuals(estimate_id):
-    """Post actual hours/cost for variance analysis"""
+    """Load timesheet entries from a JSON list or a CSV upload"""
     try:
         estimate = ProjectEstimate.query.get(estimate_id)
         if not estimate:
             return jsonify({'error': 'Estimate not found'}), 404
         
-        data = request.get_json()
+        upload = request.files.get('file')
+        if upload is not None:
+            items = parse_csv(upload.read().decode('utf-8-sig'))
+        elif request.mimetype == 'text/csv':
+            items = parse_csv(request.get_data(as_text=True))
+        else:
+            data = request.get_json()
+            items = data.get('entries') if isinstance(data, dict) else data
+        if not isinstance(items, list):
+            return jsonify({'error': 'Expected a list of entries or a CSV file'}), 400
+        if len(items) > ACTUALS_MAX_ROWS:
+            return jsonify({'error': f'At most {ACTUALS_MAX_ROWS} entries per request'}), 400
         
-        # TODO: Implement actuals tracking
-        return jsonify({'message': 'Actuals tracking not yet implemented'}), 501
+        result = ingest_actuals(estimate_id, items)
+        db.session.commit()
+        return jsonify(result)
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@estimator_bp.route('/actuals/<int:estimate_id>/variance', methods=['GET'])
+def get_actuals_variance(estimate_id):
+    """Actual vs estimated hours and cost per task, activity or phase"""
+    try:
+        estimate = ProjectEstimate.query.get(estimate_id)
+        if not estimate:
+            return jsonify({'error': 'Estimate not found'}), 404
+        
+        level = request.args.get('level', 'phase')
+        if level not in ('task', 'activity', 'phase'):
+            return jsonify({'error': f'Unsupported level: {level}'}), 400
+        period = request.args.get('period')
+        if period and period not in VARIANCE_PERIODS:
+            return jsonify({'error': f'Unsupported period: {period}'}), 400
+        
+        return jsonify(actuals_variance(estimate_id, level, period or None))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
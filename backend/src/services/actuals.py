@@ -0,0 +1,270 @@
+import csv
+import io
+from datetime import date
+from sqlalchemy import select, insert, delete, func
+from src.models.estimator import (
+    db, Phase, Activity, Task, RoleLevel, ActualEntry
+)
+from src.services.kpis import resolve_role_rates
+from src.services.exports import task_amounts
+
+# Actuals: timesheet entries booked against an estimate's tasks
+#
+# Uploads are validated in Python against the estimate's task ids and the
+# role levels (two queries), then written with one executemany statement per
+# chunk. Entries carrying an external_id are upserted on
+# (project_estimate_id, external_id), so re-sending a timesheet export
+# updates the lines it already loaded instead of duplicating them.
+
+ACTUALS_MAX_ROWS = 100000
+ACTUALS_CHUNK_SIZE = 1000
+UPSERT_FIELDS = ('task_id', 'role_level_id', 'entry_date', 'hours', 'cost')
+
+def parse_csv(text):
+    """Rows of a CSV upload as dicts keyed by the header line."""
+    return list(csv.DictReader(io.StringIO(text)))
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+def normalize_entry(item, task_ids, role_ids, cost_rates):
+    """(row values, None) for a valid upload item, (None, error) otherwise.
+
+    Items may come from JSON or CSV, so numbers are accepted as strings.
+    A missing cost is priced at the role's resolved cost rate.
+    """
+    if not isinstance(item, dict):
+        return None, 'Expected an object'
+    try:
+        task_id = int(item.get('task_id'))
+    except (TypeError, ValueError):
+        return None, 'task_id is required'
+    if task_id not in task_ids:
+        return None, 'Task not found in estimate'
+
+    role_level_id = item.get('role_level_id')
+    if _blank(role_level_id):
+        role_level_id = None
+    else:
+        try:
+            role_level_id = int(role_level_id)
+        except (TypeError, ValueError):
+            return None, 'Invalid value for role_level_id'
+        if role_level_id not in role_ids:
+            return None, 'Role level not found'
+
+    try:
+        entry_date = date.fromisoformat(str(item.get('entry_date') or item.get('date')))
+    except ValueError:
+        return None, 'entry_date must be an ISO date'
+
+    try:
+        hours = float(item.get('hours'))
+    except (TypeError, ValueError):
+        return None, 'hours is required'
+    if hours < 0:
+        return None, 'hours must not be negative'
+
+    cost = item.get('cost')
+    if _blank(cost):
+        cost = hours * cost_rates.get(role_level_id, 0.0) if role_level_id else 0.0
+    else:
+        try:
+            cost = float(cost)
+        except (TypeError, ValueError):
+            return None, 'Invalid value for cost'
+
+    external_id = item.get('external_id')
+    external_id = None if _blank(external_id) else str(external_id).strip()
+
+    return {
+        'task_id': task_id,
+        'role_level_id': role_level_id,
+        'entry_date': entry_date,
+        'hours': hours,
+        'cost': cost,
+        'external_id': external_id
+    }, None
+
+def _chunks(rows):
+    for start in range(0, len(rows), ACTUALS_CHUNK_SIZE):
+        yield rows[start:start + ACTUALS_CHUNK_SIZE]
+
+def _upsert(connection, estimate_id, rows):
+    table = ActualEntry.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=['project_estimate_id', 'external_id'],
+            set_={field: statement.excluded[field] for field in UPSERT_FIELDS}
+        )
+        connection.execute(statement, rows)
+    else:
+        # No portable upsert: replace the lines that are already loaded
+        connection.execute(delete(table).where(
+            table.c.project_estimate_id == estimate_id,
+            table.c.external_id.in_([row['external_id'] for row in rows])
+        ))
+        connection.execute(insert(table), rows)
+
+def ingest_actuals(estimate_id, items):
+    """Validate and load upload items; returns counts and per-line errors.
+
+    Valid lines are written even when others fail. Lines sharing an
+    external_id are collapsed, the later one winning.
+    """
+    task_ids = set(db.session.execute(
+        select(Task.id).join(Activity, Activity.id == Task.activity_id)
+        .join(Phase, Phase.id == Activity.phase_id)
+        .where(Phase.project_estimate_id == estimate_id)
+    ).scalars())
+    role_ids = set(db.session.execute(select(RoleLevel.id)).scalars())
+    _, cost_rates = resolve_role_rates(estimate_id)
+
+    errors = []
+    keyed = {}
+    unkeyed = []
+    for index, item in enumerate(items):
+        values, error = normalize_entry(item, task_ids, role_ids, cost_rates)
+        if error:
+            errors.append({'index': index, 'error': error})
+            continue
+        values['project_estimate_id'] = estimate_id
+        if values['external_id'] is None:
+            unkeyed.append(values)
+        else:
+            keyed[values['external_id']] = values
+
+    connection = db.session.connection()
+    created = len(unkeyed)
+    updated = 0
+    for chunk in _chunks(list(keyed.values())):
+        existing = connection.execute(
+            select(func.count()).select_from(ActualEntry).where(
+                ActualEntry.project_estimate_id == estimate_id,
+                ActualEntry.external_id.in_([row['external_id'] for row in chunk])
+            )
+        ).scalar()
+        _upsert(connection, estimate_id, chunk)
+        updated += existing
+        created += len(chunk) - existing
+    for chunk in _chunks(unkeyed):
+        connection.execute(insert(ActualEntry.__table__), chunk)
+
+    return {
+        'received': len(items),
+        'created': created,
+        'updated': updated,
+        'errors': errors
+    }
+
+# Variance analysis
+
+VARIANCE_PERIODS = ('day', 'week', 'month')
+
+def period_bucket(column, period, dialect):
+    """SQL expression truncating a date column to the start of its period."""
+    if period == 'day':
+        return column
+    if dialect == 'sqlite':
+        if period == 'week':
+            # Monday of the ISO week: the next Sunday (or today), minus six days
+            return func.date(column, 'weekday 0', '-6 days')
+        return func.strftime('%Y-%m-01', column)
+    return func.date_trunc(period, column)
+
+def _estimate_rows(estimate_id, level):
+    """(id, name, estimated hours, estimated cost) of every node on a level."""
+    if level == 'phase':
+        statement = select(Phase.id, Phase.name, Phase.rollup_hours, Phase.rollup_cost) \
+            .where(Phase.project_estimate_id == estimate_id) \
+            .order_by(Phase.order_index, Phase.id)
+    elif level == 'activity':
+        statement = select(Activity.id, Activity.name, Activity.rollup_hours, Activity.rollup_cost) \
+            .join(Phase, Phase.id == Activity.phase_id) \
+            .where(Phase.project_estimate_id == estimate_id) \
+            .order_by(Phase.order_index, Phase.id, Activity.order_index, Activity.id)
+    else:
+        amounts = task_amounts(Phase.project_estimate_id == estimate_id)
+        statement = select(
+            Task.id, Task.name, func.coalesce(Task.estimated_hours, 0.0), func.coalesce(amounts.c.cost, 0.0)
+        ).join(Activity, Activity.id == Task.activity_id) \
+         .join(Phase, Phase.id == Activity.phase_id) \
+         .outerjoin(amounts, amounts.c.task_id == Task.id) \
+         .where(Phase.project_estimate_id == estimate_id) \
+         .order_by(Phase.order_index, Phase.id, Activity.order_index, Activity.id, Task.order_index, Task.id)
+    return db.session.execute(statement).all()
+
+def _actual_totals(estimate_id, level, period):
+    """{node id: [hours, cost, {period: (hours, cost)}]} aggregated in SQL."""
+    node_id = {'task': ActualEntry.task_id, 'activity': Task.activity_id, 'phase': Activity.phase_id}[level]
+    columns = [node_id]
+    if period:
+        dialect = db.session.get_bind().dialect.name
+        columns.append(period_bucket(ActualEntry.entry_date, period, dialect).label('period'))
+    statement = select(*columns, func.sum(ActualEntry.hours), func.sum(ActualEntry.cost)) \
+        .select_from(ActualEntry) \
+        .where(ActualEntry.project_estimate_id == estimate_id)
+    if level != 'task':
+        statement = statement.join(Task, Task.id == ActualEntry.task_id)
+    if level == 'phase':
+        statement = statement.join(Activity, Activity.id == Task.activity_id)
+    statement = statement.group_by(*columns).order_by(*columns)
+
+    totals = {}
+    for row in db.session.execute(statement):
+        total = totals.setdefault(row[0], [0.0, 0.0, {}])
+        hours, cost = row[-2] or 0.0, row[-1] or 0.0
+        total[0] += hours
+        total[1] += cost
+        if period:
+            total[2][str(row[1])[:10]] = (hours, cost)
+    return totals
+
+def _variance(estimated_hours, estimated_cost, actual_hours, actual_cost):
+    return {
+        'estimated_hours': estimated_hours,
+        'actual_hours': actual_hours,
+        'hours_variance': actual_hours - estimated_hours,
+        'hours_variance_percentage': round((actual_hours - estimated_hours) / estimated_hours * 100, 2)
+            if estimated_hours else None,
+        'estimated_cost': estimated_cost,
+        'actual_cost': actual_cost,
+        'cost_variance': actual_cost - estimated_cost,
+        'cost_variance_percentage': round((actual_cost - estimated_cost) / estimated_cost * 100, 2)
+            if estimated_cost else None
+    }
+
+def actuals_variance(estimate_id, level='phase', period=None):
+    """Actual vs estimated hours and cost per task, activity or phase.
+
+    Estimates are taken before contingency. With a period ('day', 'week'
+    or 'month') each row also lists its actuals per period bucket.
+    """
+    actuals = _actual_totals(estimate_id, level, period)
+    rows = []
+    totals = [0.0, 0.0, 0.0, 0.0]
+    for node_id, name, estimated_hours, estimated_cost in _estimate_rows(estimate_id, level):
+        actual_hours, actual_cost, buckets = actuals.get(node_id, (0.0, 0.0, {}))
+        row = {'id': node_id, 'name': name}
+        row.update(_variance(estimated_hours or 0.0, estimated_cost or 0.0, actual_hours, actual_cost))
+        if period:
+            row['periods'] = [
+                {'period': bucket, 'hours': hours, 'cost': cost} for bucket, (hours, cost) in buckets.items()
+            ]
+        rows.append(row)
+        for i, value in enumerate((estimated_hours or 0.0, estimated_cost or 0.0, actual_hours, actual_cost)):
+            totals[i] += value
+
+    return {
+        'estimate_id': estimate_id,
+        'level': level,
+        'period': period,
+        'totals': _variance(*totals),
+        'rows': rows
+    }
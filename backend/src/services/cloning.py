@@ -0,0 +1,186 @@
+from sqlalchemy import select, insert, update, func, literal, text, null, case
+from src.models.estimator import (
+    db, ProjectEstimate, Phase, Activity, Task, Assignment, RateOverride, Dependency
+)
+from src.services.rollups import rebuild_rollups
+
+# Set-based estimate copying
+#
+# Primary keys are allocated up front (max(id) + offset) instead of flushing
+# each parent to learn its id, so a whole hierarchy is written with one
+# statement per table. The estimate row is inserted first, which takes the
+# SQLite write lock before any max(id) is read. PostgreSQL locks each table
+# against other writers before reading its max(id), until the transaction
+# ends, so concurrent copies and inserts cannot take the same ids.
+
+# Stored schedule dates are not copied: the copy is scheduled on first view
+UNCOPIED_COLUMNS = ('schedule_start', 'schedule_finish')
+
+def _max_id(connection, table):
+    """Largest id in table, locking out other writers first on PostgreSQL."""
+    if connection.dialect.name == 'postgresql':
+        # SHARE ROW EXCLUSIVE conflicts with itself and with INSERT, but not with reads
+        connection.execute(text(f'LOCK TABLE {table.name} IN SHARE ROW EXCLUSIVE MODE'))
+    return connection.execute(select(func.coalesce(func.max(table.c.id), 0))).scalar()
+
+def _sync_sequence(connection, table):
+    """Move a PostgreSQL serial sequence past explicitly inserted ids."""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+        ))
+
+def _copy_rows(connection, model, source_ids, parent_key, parent_value):
+    """INSERT ... SELECT the rows whose id is in source_ids, shifting their ids.
+
+    parent_value maps the source parent column to its value in the copy.
+    Returns the id offset applied, so children can remap their foreign key.
+    """
+    table = model.__table__
+    low = connection.execute(select(func.min(table.c.id)).where(table.c.id.in_(source_ids))).scalar()
+    if low is None:
+        return 0
+    offset = _max_id(connection, table) - low + 1
+
+    values = []
+    for column in table.columns:
+        if column.name == 'id':
+            values.append(column + offset)
+        elif column.name == parent_key:
+            values.append(parent_value(column))
+        elif column.name in UNCOPIED_COLUMNS:
+            values.append(null())
+        else:
+            values.append(column)
+    connection.execute(insert(table).from_select(
+        [column.name for column in table.columns],
+        select(*values).where(table.c.id.in_(source_ids))
+    ))
+    _sync_sequence(connection, table)
+    return offset
+
+def clone_estimate_tree(source_id, target_id, connection=None):
+    """Copy phases, activities, tasks, assignments, rate overrides and
+    dependencies of one estimate into another with a single INSERT ... SELECT
+    per table.
+
+    Stored rollups are copied with the rows, which is exact because the rate
+    overrides they were computed with are copied too.
+    """
+    connection = connection if connection is not None else db.session.connection()
+
+    phase_ids = select(Phase.id).where(Phase.project_estimate_id == source_id)
+    activity_ids = select(Activity.id).where(Activity.phase_id.in_(phase_ids))
+    task_ids = select(Task.id).where(Task.activity_id.in_(activity_ids))
+    assignment_ids = select(Assignment.id).where(Assignment.task_id.in_(task_ids))
+    rate_override_ids = select(RateOverride.id).where(RateOverride.project_estimate_id == source_id)
+
+    phase_offset = _copy_rows(connection, Phase, phase_ids, 'project_estimate_id',
+                              lambda column: literal(target_id))
+    activity_offset = _copy_rows(connection, Activity, activity_ids, 'phase_id',
+                                 lambda column: column + phase_offset)
+    task_offset = _copy_rows(connection, Task, task_ids, 'activity_id',
+                             lambda column: column + activity_offset)
+    _copy_rows(connection, Assignment, assignment_ids, 'task_id',
+               lambda column: column + task_offset)
+    _copy_rows(connection, RateOverride, rate_override_ids, 'project_estimate_id',
+               lambda column: literal(target_id))
+
+    # Dependency ends are tasks or activities, so each moves by the offset of its type
+    def shifted(type_column, id_column):
+        return case((type_column == 'task', id_column + task_offset), else_=id_column + activity_offset)
+
+    dependencies = Dependency.__table__
+    columns = [
+        'project_estimate_id', 'predecessor_type', 'predecessor_id', 'successor_type',
+        'successor_id', 'dependency_type', 'lag_days', 'created_at'
+    ]
+    connection.execute(insert(dependencies).from_select(columns, select(
+        literal(target_id), dependencies.c.predecessor_type,
+        shifted(dependencies.c.predecessor_type, dependencies.c.predecessor_id),
+        dependencies.c.successor_type,
+        shifted(dependencies.c.successor_type, dependencies.c.successor_id),
+        dependencies.c.dependency_type, dependencies.c.lag_days, dependencies.c.created_at
+    ).where(dependencies.c.project_estimate_id == source_id)))
+
+    source = select(
+        ProjectEstimate.rollup_hours, ProjectEstimate.rollup_cost, ProjectEstimate.rollup_revenue
+    ).where(ProjectEstimate.id == source_id)
+    hours, cost, revenue = connection.execute(source).one()
+    connection.execute(
+        update(ProjectEstimate).where(ProjectEstimate.id == target_id).values(
+            rollup_hours=hours, rollup_cost=cost, rollup_revenue=revenue
+        )
+    )
+
+def insert_estimate_tree(estimate_id, data, connection=None):
+    """Bulk insert a nested JSON payload (phases/activities/tasks/assignments,
+    plus top-level rate_overrides) under an existing estimate.
+
+    Rows are collected per table with pre-assigned ids and written with one
+    executemany INSERT each; rollups are then rebuilt for the estimate.
+    """
+    connection = connection if connection is not None else db.session.connection()
+
+    tables = [Phase.__table__, Activity.__table__, Task.__table__, Assignment.__table__]
+    next_ids = {table.name: _max_id(connection, table) + 1 for table in tables}
+    rows = {table.name: [] for table in tables}
+
+    def add(table, values):
+        values['id'] = next_ids[table.name]
+        next_ids[table.name] += 1
+        rows[table.name].append(values)
+        return values['id']
+
+    for phase_data in data.get('phases', []):
+        phase_id = add(Phase.__table__, {
+            'name': phase_data.get('name'),
+            'description': phase_data.get('description'),
+            'order_index': phase_data.get('order_index'),
+            'project_estimate_id': estimate_id
+        })
+        for activity_data in phase_data.get('activities', []):
+            activity_id = add(Activity.__table__, {
+                'name': activity_data.get('name'),
+                'description': activity_data.get('description'),
+                'order_index': activity_data.get('order_index'),
+                'phase_id': phase_id
+            })
+            for task_data in activity_data.get('tasks', []):
+                task_id = add(Task.__table__, {
+                    'name': task_data.get('name'),
+                    'description': task_data.get('description'),
+                    'order_index': task_data.get('order_index'),
+                    'complexity': task_data.get('complexity'),
+                    'story_points': task_data.get('story_points', 0),
+                    'estimated_hours': task_data.get('estimated_hours', 0.0),
+                    'low_hours': task_data.get('low_hours'),
+                    'likely_hours': task_data.get('likely_hours'),
+                    'high_hours': task_data.get('high_hours'),
+                    'activity_id': activity_id
+                })
+                for assignment_data in task_data.get('assignments', []):
+                    add(Assignment.__table__, {
+                        'task_id': task_id,
+                        'role_level_id': assignment_data.get('role_level_id'),
+                        'hours': assignment_data.get('hours', 0.0),
+                        'bill_rate_override': assignment_data.get('bill_rate_override'),
+                        'cost_rate_override': assignment_data.get('cost_rate_override')
+                    })
+
+    for table in tables:
+        if rows[table.name]:
+            connection.execute(insert(table), rows[table.name])
+            _sync_sequence(connection, table)
+
+    rate_overrides = [{
+        'project_estimate_id': estimate_id,
+        'role_level_id': override.get('role_level_id'),
+        'bill_rate': override.get('bill_rate'),
+        'cost_rate': override.get('cost_rate')
+    } for override in data.get('rate_overrides', [])]
+    if rate_overrides:
+        connection.execute(insert(RateOverride.__table__), rate_overrides)
+
+    rebuild_rollups([estimate_id], connection)
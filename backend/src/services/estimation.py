@@ -0,0 +1,75 @@
+from datetime import datetime
+from sqlalchemy import select, update, func, exists
+from src.models.estimator import db, ProjectEstimate, Phase, Activity, Task, Assignment, ComplexityMatrix
+from src.services.reference import reference_data
+from src.services.rollups import rebuild_rollups
+from src.services.scheduler import clear_schedule
+
+# Story point estimation
+#
+# An assignment takes story_points x hours_per_story_point hours, from the
+# ComplexityMatrix row of its role level and the task's complexity (Medium
+# when unset); a task's estimated hours are the sum of its assignments.
+# Tasks without assignments, and assignments whose role level has no row
+# for the complexity, keep their hours. When a role level has several rows
+# for one complexity the oldest wins.
+#
+# Single tasks are re-estimated through the matrix index of the cached
+# reference data. Whole estimates are re-estimated with set-based UPDATEs
+# that read the matrix in SQL.
+
+DEFAULT_COMPLEXITY = 'Medium'
+
+def re_estimate_task(task):
+    """Set a task's assignment hours and estimated hours from its story points.
+
+    Returns False, leaving the task unchanged, when it has no assignments.
+    """
+    if not task.assignments:
+        return False
+    index = reference_data().matrix_index
+    complexity = task.complexity or DEFAULT_COMPLEXITY
+    for assignment in task.assignments:
+        rate = index.get((assignment.role_level_id, complexity))
+        if rate is not None:
+            assignment.hours = (task.story_points or 0) * rate
+    task.estimated_hours = sum(assignment.hours or 0.0 for assignment in task.assignments)
+    return True
+
+def re_estimate(estimate_ids, connection=None):
+    """Re-estimate every task of many estimates (ids or a SELECT of ids).
+
+    One UPDATE derives the assignment hours and one sums them into the
+    tasks; rollups are rebuilt and stored schedules dropped. Returns the
+    number of assignments and tasks updated.
+    """
+    connection = connection if connection is not None else db.session.connection()
+    phase_ids = select(Phase.id).where(Phase.project_estimate_id.in_(estimate_ids))
+    activity_ids = select(Activity.id).where(Activity.phase_id.in_(phase_ids))
+    task_ids = select(Task.id).where(Task.activity_id.in_(activity_ids))
+
+    derived = select(func.coalesce(Task.story_points, 0) * ComplexityMatrix.hours_per_story_point) \
+        .where(
+            Task.id == Assignment.task_id,
+            ComplexityMatrix.role_level_id == Assignment.role_level_id,
+            ComplexityMatrix.complexity == func.coalesce(Task.complexity, DEFAULT_COMPLEXITY)
+        ).order_by(ComplexityMatrix.id).limit(1).correlate(Assignment).scalar_subquery()
+    assignments = connection.execute(
+        update(Assignment).where(Assignment.task_id.in_(task_ids))
+        .values(hours=func.coalesce(derived, Assignment.hours))
+    ).rowcount
+
+    assigned_hours = select(func.coalesce(func.sum(Assignment.hours), 0.0)) \
+        .where(Assignment.task_id == Task.id).correlate(Task).scalar_subquery()
+    tasks = connection.execute(
+        update(Task).where(Task.id.in_(task_ids), exists().where(Assignment.task_id == Task.id))
+        .values(estimated_hours=assigned_hours)
+    ).rowcount
+
+    rebuild_rollups(estimate_ids, connection)
+    clear_schedule(estimate_ids, connection)
+    connection.execute(
+        update(ProjectEstimate).where(ProjectEstimate.id.in_(estimate_ids))
+        .values(updated_at=datetime.utcnow(), revision=ProjectEstimate.revision + 1)
+    )
+    return assignments, tasks
@@ -0,0 +1,230 @@
+import csv
+import io
+from sqlalchemy import select, func, and_
+from src.models.estimator import (
+    db, ProjectEstimate, Phase, Activity, Task, RoleLevel, Assignment, RateOverride
+)
+from src.services.scheduler import ScheduleGraph, WORKING_DAYS_PER_WEEK
+from src.services.serialization import dumps
+
+# Row sources for estimate exports
+#
+# Each function yields plain tuples straight from a streamed SELECT
+# (yield_per), so exports never build ORM objects or nested dicts and their
+# memory use does not grow with the size of the estimate.
+
+EXPORT_BATCH_SIZE = 1000
+
+def _stream(statement):
+    return db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+def _wbs_order():
+    return (Phase.order_index, Phase.id, Activity.order_index, Activity.id, Task.order_index, Task.id)
+
+def _resolved_rates():
+    """Bill and cost rate of an assignment: override, estimate rate, role default."""
+    bill_rate = func.coalesce(Assignment.bill_rate_override, RateOverride.bill_rate, RoleLevel.default_bill_rate)
+    cost_rate = func.coalesce(Assignment.cost_rate_override, RateOverride.cost_rate, RoleLevel.default_cost_rate)
+    return bill_rate, cost_rate
+
+WBS_HEADER = ('Phase', 'Activity', 'Task', 'Complexity', 'Story Points', 'Estimated Hours')
+
+def wbs_rows(estimate_id):
+    statement = select(
+        Phase.name, Activity.name, Task.name, Task.complexity, Task.story_points, Task.estimated_hours
+    ).join(Activity, Activity.phase_id == Phase.id) \
+     .join(Task, Task.activity_id == Activity.id) \
+     .where(Phase.project_estimate_id == estimate_id) \
+     .order_by(*_wbs_order())
+    for row in _stream(statement):
+        yield tuple(row)
+
+ASSIGNMENT_HEADER = (
+    'Phase', 'Activity', 'Task', 'Role', 'Level', 'Hours', 'Bill Rate', 'Cost Rate', 'Revenue', 'Cost'
+)
+
+def assignment_rows(estimate_id):
+    bill_rate, cost_rate = _resolved_rates()
+    statement = select(
+        Phase.name, Activity.name, Task.name, RoleLevel.name, RoleLevel.level,
+        Assignment.hours, bill_rate, cost_rate
+    ).join(Activity, Activity.phase_id == Phase.id) \
+     .join(Task, Task.activity_id == Activity.id) \
+     .join(Assignment, Assignment.task_id == Task.id) \
+     .join(RoleLevel, RoleLevel.id == Assignment.role_level_id) \
+     .outerjoin(RateOverride, and_(
+         RateOverride.project_estimate_id == estimate_id,
+         RateOverride.role_level_id == Assignment.role_level_id
+     )) \
+     .where(Phase.project_estimate_id == estimate_id) \
+     .order_by(*_wbs_order(), Assignment.id)
+    for phase, activity, task, role, level, hours, bill, cost in _stream(statement):
+        hours = hours or 0.0
+        yield (phase, activity, task, role, level, hours, bill, cost, hours * bill, hours * cost)
+
+RATE_HEADER = (
+    'Role', 'Level', 'Default Bill Rate', 'Default Cost Rate', 'Override Bill Rate', 'Override Cost Rate',
+    'Effective Bill Rate', 'Effective Cost Rate'
+)
+
+def rate_rows(estimate_id):
+    statement = select(
+        RoleLevel.name, RoleLevel.level, RoleLevel.default_bill_rate, RoleLevel.default_cost_rate,
+        RateOverride.bill_rate, RateOverride.cost_rate
+    ).outerjoin(RateOverride, and_(
+        RateOverride.project_estimate_id == estimate_id,
+        RateOverride.role_level_id == RoleLevel.id
+    )).order_by(RoleLevel.name, RoleLevel.level, RoleLevel.id)
+    for name, level, default_bill, default_cost, bill, cost in _stream(statement):
+        yield (
+            name, level, default_bill, default_cost, bill, cost,
+            default_bill if bill is None else bill, default_cost if cost is None else cost
+        )
+
+KPI_HEADER = ('Phase', 'Hours', 'Cost', 'Revenue', 'Margin', 'AGM %')
+
+def _kpi_row(label, hours, cost, revenue, contingency):
+    hours, cost, revenue = hours * contingency, cost * contingency, revenue * contingency
+    margin = revenue - cost
+    return (label, hours, cost, revenue, margin, round(margin / revenue * 100, 2) if revenue else 0.0)
+
+def kpi_rows(estimate):
+    """Per-phase and total KPIs from the stored rollups, with contingency applied."""
+    contingency = 1 + (estimate.contingency_percentage or 0) / 100
+    statement = select(Phase.name, Phase.rollup_hours, Phase.rollup_cost, Phase.rollup_revenue) \
+        .where(Phase.project_estimate_id == estimate.id) \
+        .order_by(Phase.order_index, Phase.id)
+    for name, hours, cost, revenue in _stream(statement):
+        yield _kpi_row(name, hours, cost, revenue, contingency)
+    yield _kpi_row('Total', estimate.rollup_hours, estimate.rollup_cost, estimate.rollup_revenue, contingency)
+
+def excel_sheets(estimate):
+    return [
+        ('WBS', WBS_HEADER, wbs_rows(estimate.id)),
+        ('Assignments', ASSIGNMENT_HEADER, assignment_rows(estimate.id)),
+        ('Rates', RATE_HEADER, rate_rows(estimate.id)),
+        ('KPIs', KPI_HEADER, kpi_rows(estimate)),
+    ]
+
+def report_data(estimate):
+    """Plain, JSON-serializable values shown by the PDF proposal."""
+    contingency = 1 + (estimate.contingency_percentage or 0) / 100
+    # Phase windows come from the critical path schedule, in working weeks
+    graph = ScheduleGraph(estimate)
+    early_start, early_finish, _, _, _ = graph.solve()
+    days = {
+        phase_id: (early_start[2 * index], early_finish[2 * index + 1])
+        for index, phase_id in enumerate(graph.phase_ids)
+    }
+    statement = select(Phase.id, Phase.name, Phase.rollup_hours, Phase.rollup_cost, Phase.rollup_revenue) \
+        .where(Phase.project_estimate_id == estimate.id) \
+        .order_by(Phase.order_index, Phase.id)
+
+    keys = ('name', 'hours', 'cost', 'revenue', 'margin', 'agm')
+    phases = []
+    for phase_id, name, hours, cost, revenue in db.session.execute(statement):
+        phase = dict(zip(keys, _kpi_row(name, hours, cost, revenue, contingency)))
+        start, finish = days[phase_id]
+        phase['start_week'] = start / WORKING_DAYS_PER_WEEK
+        phase['weeks'] = (finish - start) / WORKING_DAYS_PER_WEEK
+        phases.append(phase)
+    totals = dict(zip(keys, _kpi_row(
+        'Total', estimate.rollup_hours, estimate.rollup_cost, estimate.rollup_revenue, contingency
+    )))
+    totals['weeks'] = max(early_finish, default=0) / WORKING_DAYS_PER_WEEK
+
+    return {
+        'estimate': {
+            'id': estimate.id,
+            'name': estimate.name,
+            'description': estimate.description,
+            'status': estimate.status,
+            'currency': estimate.currency,
+            'contingency_percentage': estimate.contingency_percentage,
+            'updated_at': estimate.updated_at.isoformat() if estimate.updated_at else None
+        },
+        'phases': phases,
+        'totals': totals
+    }
+
+def task_amounts(*conditions):
+    """Subquery of (task_id, cost, revenue) summed over each task's assignments
+    at resolved rates, for the estimates matching conditions."""
+    bill_rate, cost_rate = _resolved_rates()
+    return select(
+        Assignment.task_id.label('task_id'),
+        func.sum(Assignment.hours * cost_rate).label('cost'),
+        func.sum(Assignment.hours * bill_rate).label('revenue')
+    ).join(Task, Task.id == Assignment.task_id) \
+     .join(Activity, Activity.id == Task.activity_id) \
+     .join(Phase, Phase.id == Activity.phase_id) \
+     .join(ProjectEstimate, ProjectEstimate.id == Phase.project_estimate_id) \
+     .join(RoleLevel, RoleLevel.id == Assignment.role_level_id) \
+     .outerjoin(RateOverride, and_(
+         RateOverride.project_estimate_id == Phase.project_estimate_id,
+         RateOverride.role_level_id == Assignment.role_level_id
+     )) \
+     .where(*conditions) \
+     .group_by(Assignment.task_id).subquery()
+
+FLAT_WBS_COLUMNS = (
+    'estimate_id', 'estimate_name', 'estimate_status', 'estimate_updated_at', 'currency',
+    'contingency_percentage', 'phase_id', 'phase_name', 'activity_id', 'activity_name',
+    'task_id', 'task_name', 'estimated_hours', 'story_points', 'complexity', 'cost', 'revenue'
+)
+STREAM_FLUSH_ROWS = 500
+
+def flat_wbs_rows(updated_since=None):
+    """One tuple per task of every estimate, in FLAT_WBS_COLUMNS order.
+
+    Cost and revenue are the task's assignment hours at resolved rates,
+    before contingency. updated_since limits the rows to estimates updated
+    at or after that datetime.
+    """
+    conditions = []
+    if updated_since is not None:
+        conditions.append(ProjectEstimate.updated_at >= updated_since)
+
+    amounts = task_amounts(*conditions)
+
+    statement = select(
+        ProjectEstimate.id, ProjectEstimate.name, ProjectEstimate.status, ProjectEstimate.updated_at,
+        ProjectEstimate.currency, ProjectEstimate.contingency_percentage,
+        Phase.id, Phase.name, Activity.id, Activity.name,
+        Task.id, Task.name, Task.estimated_hours, Task.story_points, Task.complexity,
+        func.coalesce(amounts.c.cost, 0.0), func.coalesce(amounts.c.revenue, 0.0)
+    ).join(Phase, Phase.project_estimate_id == ProjectEstimate.id) \
+     .join(Activity, Activity.phase_id == Phase.id) \
+     .join(Task, Task.activity_id == Activity.id) \
+     .outerjoin(amounts, amounts.c.task_id == Task.id) \
+     .where(*conditions) \
+     .order_by(ProjectEstimate.id, *_wbs_order())
+    for row in _stream(statement):
+        row = list(row)
+        if row[3] is not None:
+            row[3] = row[3].isoformat()
+        yield row
+
+def stream_ndjson(columns, rows):
+    """Yield rows as newline-delimited JSON objects, a batch of lines at a time."""
+    lines = []
+    for row in rows:
+        lines.append(dumps(dict(zip(columns, row)), sort_keys=False))
+        if len(lines) >= STREAM_FLUSH_ROWS:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
+def stream_csv(columns, rows):
+    """Yield rows as CSV with a header line, a batch of lines at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % STREAM_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,155 @@
+import numpy as np
+from src.models.estimator import (
+    db, Phase, Activity, Task, Assignment, RateOverride
+)
+from src.services.reference import reference_data
+
+class EstimateFrame:
+    """Column-oriented view of one estimate's WBS.
+
+    Every level is held as parallel NumPy arrays sorted by id, and each child
+    row carries the index of its parent row, so rollups are plain bincounts.
+    """
+
+    def __init__(self, estimate):
+        self.estimate = estimate
+
+        phase_rows = db.session.query(Phase.id).filter(
+            Phase.project_estimate_id == estimate.id
+        ).order_by(Phase.id).all()
+        self.phase_ids = np.array([r[0] for r in phase_rows], dtype=np.int64)
+
+        activity_rows = db.session.query(Activity.id, Activity.phase_id) \
+            .join(Phase, Activity.phase_id == Phase.id) \
+            .filter(Phase.project_estimate_id == estimate.id) \
+            .order_by(Activity.id).all()
+        self.activity_ids = np.array([r[0] for r in activity_rows], dtype=np.int64)
+        self.activity_phase = np.searchsorted(
+            self.phase_ids, np.array([r[1] for r in activity_rows], dtype=np.int64)
+        )
+
+        task_rows = db.session.query(Task.id, Task.activity_id, Task.estimated_hours) \
+            .join(Activity, Task.activity_id == Activity.id) \
+            .join(Phase, Activity.phase_id == Phase.id) \
+            .filter(Phase.project_estimate_id == estimate.id) \
+            .order_by(Task.id).all()
+        self.task_ids = np.array([r[0] for r in task_rows], dtype=np.int64)
+        self.task_activity = np.searchsorted(
+            self.activity_ids, np.array([r[1] for r in task_rows], dtype=np.int64)
+        )
+        self.task_hours = np.array([r[2] or 0.0 for r in task_rows], dtype=np.float64)
+
+        assignment_rows = db.session.query(
+            Assignment.task_id, Assignment.role_level_id, Assignment.hours,
+            Assignment.bill_rate_override, Assignment.cost_rate_override
+        ).join(Task, Assignment.task_id == Task.id) \
+         .join(Activity, Task.activity_id == Activity.id) \
+         .join(Phase, Activity.phase_id == Phase.id) \
+         .filter(Phase.project_estimate_id == estimate.id).all()
+        self.assignment_task = np.searchsorted(
+            self.task_ids, np.array([r[0] for r in assignment_rows], dtype=np.int64)
+        )
+        self.assignment_role = np.array([r[1] for r in assignment_rows], dtype=np.int64)
+        self.assignment_hours = np.array([r[2] or 0.0 for r in assignment_rows], dtype=np.float64)
+
+        bill_rates, cost_rates = resolve_role_rates(estimate.id)
+        self.assignment_bill_rate = resolve_assignment_rates(
+            [r[3] for r in assignment_rows], self.assignment_role, bill_rates
+        )
+        self.assignment_cost_rate = resolve_assignment_rates(
+            [r[4] for r in assignment_rows], self.assignment_role, cost_rates
+        )
+
+def resolve_role_rates(estimate_id):
+    """Return {role_level_id: rate} maps for bill and cost rates.
+
+    Estimate-level RateOverride rows win over the cached RoleLevel defaults.
+    """
+    reference = reference_data()
+    bill_rates = dict(reference.bill_rates)
+    cost_rates = dict(reference.cost_rates)
+    for role_id, bill, cost in db.session.query(
+        RateOverride.role_level_id, RateOverride.bill_rate, RateOverride.cost_rate
+    ).filter(RateOverride.project_estimate_id == estimate_id):
+        bill_rates[role_id] = bill
+        cost_rates[role_id] = cost
+    return bill_rates, cost_rates
+
+def resolve_assignment_rates(overrides, roles, role_rates):
+    """Vectorized rate resolution: assignment override, else the role rate."""
+    override = np.array(
+        [np.nan if value is None else value for value in overrides], dtype=np.float64
+    )
+    if not role_rates:
+        return np.nan_to_num(override)
+    role_ids = np.array(sorted(role_rates), dtype=np.int64)
+    rates = np.array([role_rates[r] for r in role_ids], dtype=np.float64)
+    positions = np.clip(np.searchsorted(role_ids, roles), 0, len(role_ids) - 1)
+    fallback = np.where(role_ids[positions] == roles, rates[positions], 0.0)
+    return np.where(np.isnan(override), fallback, override)
+
+def _level_kpis(ids, hours, assigned_hours, cost, revenue):
+    margin = revenue - cost
+    with np.errstate(divide='ignore', invalid='ignore'):
+        agm = np.where(revenue > 0, margin / revenue * 100, 0.0)
+    return {
+        'ids': ids.tolist(),
+        'hours': hours.tolist(),
+        'assigned_hours': assigned_hours.tolist(),
+        'unassigned_hours': np.maximum(hours - assigned_hours, 0.0).tolist(),
+        'cost': cost.tolist(),
+        'revenue': revenue.tolist(),
+        'margin': margin.tolist(),
+        'agm': agm.tolist()
+    }
+
+def compute_kpis(frame):
+    """Compute task, activity, phase and estimate KPIs for an EstimateFrame.
+
+    Hours are the tasks' estimated hours; cost and revenue come from the
+    assignments at their resolved rates. Contingency scales every figure, so
+    each level still sums to its parent. Level results are column-oriented:
+    parallel lists keyed by metric, aligned with 'ids'.
+    """
+    contingency = 1 + (frame.estimate.contingency_percentage or 0) / 100
+
+    task_count = len(frame.task_ids)
+    activity_count = len(frame.activity_ids)
+    phase_count = len(frame.phase_ids)
+
+    task_hours = frame.task_hours * contingency
+    task_assigned = np.bincount(
+        frame.assignment_task, weights=frame.assignment_hours, minlength=task_count
+    ) * contingency
+    task_cost = np.bincount(
+        frame.assignment_task,
+        weights=frame.assignment_hours * frame.assignment_cost_rate,
+        minlength=task_count
+    ) * contingency
+    task_revenue = np.bincount(
+        frame.assignment_task,
+        weights=frame.assignment_hours * frame.assignment_bill_rate,
+        minlength=task_count
+    ) * contingency
+
+    def rollup(parent_index, values, size):
+        return np.bincount(parent_index, weights=values, minlength=size)
+
+    task_columns = (task_hours, task_assigned, task_cost, task_revenue)
+    activity_columns = tuple(rollup(frame.task_activity, c, activity_count) for c in task_columns)
+    phase_columns = tuple(rollup(frame.activity_phase, c, phase_count) for c in activity_columns)
+    totals = _level_kpis(np.zeros(1, dtype=np.int64), *(np.array([c.sum()]) for c in task_columns))
+
+    return {
+        'estimate_id': frame.estimate.id,
+        'currency': frame.estimate.currency,
+        'contingency_percentage': frame.estimate.contingency_percentage,
+        'totals': {key: values[0] for key, values in totals.items() if key != 'ids'},
+        'phases': _level_kpis(frame.phase_ids, *phase_columns),
+        'activities': _level_kpis(frame.activity_ids, *activity_columns),
+        'tasks': _level_kpis(frame.task_ids, *task_columns)
+    }
+
+def estimate_kpis(estimate):
+    """Load an estimate into an EstimateFrame and compute its KPIs."""
+    return compute_kpis(EstimateFrame(estimate))
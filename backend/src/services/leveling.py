@@ -0,0 +1,301 @@
+import heapq
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from sqlalchemy import select, func, update, delete
+from src.config import HOURS_PER_WEEK, LEVELING_WORKERS, LEVELING_QUEUE, LEVELING_JOBS_KEPT
+from src.models.estimator import db, Phase, Activity, Task, Assignment, LevelingJob
+from src.services.reference import reference_data
+from src.services.serialization import dumps
+from src.services.scheduler import (
+    ScheduleGraph, Calendar, estimate_holidays, schedule_start, link_offsets, WORKING_DAYS_PER_WEEK
+)
+
+# Resource leveling
+#
+# Starting from the critical path schedule, nodes are placed one at a time:
+# a heap holds the nodes whose predecessors are all placed, least flexible
+# (earliest late start) first. Each task starts on the day between its
+# earliest start, given where its predecessors went, and its late start
+# that adds the least overload to its roles, ties going to the earliest day.
+# A node never starts after its late start, so every successor stays
+# feasible, critical tasks do not move and the finish date is unchanged.
+#
+# Loads are hours per working day: assigned hours, with contingency, are
+# spread evenly over the task. The request thread reads the estimate; the
+# solver runs in a small thread pool and writes its status and proposal to
+# the leveling_jobs table, so clients can poll any worker process. A job
+# whose process exits before it finishes stays pending.
+
+HOURS_PER_DAY = HOURS_PER_WEEK / WORKING_DAYS_PER_WEEK
+
+class LevelingQueueFull(RuntimeError):
+    """Raised when LEVELING_QUEUE jobs of this process are already waiting or running."""
+
+class LevelingProblem:
+    """Schedule graph, early/late starts and role loads of one estimate, detached from the session."""
+
+    def __init__(self, estimate, capacity=1.0, capacities=None):
+        graph = ScheduleGraph(estimate)
+        early_start, early_finish, late_start, _, _ = graph.solve()
+        predecessors, successors, lags, start_to_start = graph.link_arrays()
+
+        self.estimate_id = estimate.id
+        self.start = schedule_start(estimate)
+        self.holidays = estimate_holidays(estimate.id)
+        self.durations = graph.durations
+        self.predecessors = predecessors
+        self.successors = successors
+        self.offsets = link_offsets(graph.durations, predecessors, lags, start_to_start)
+        self.early_start = np.asarray(early_start, dtype=np.int64)
+        self.late_start = np.asarray(late_start, dtype=np.int64)
+        self.end = max(early_finish, default=0)
+        self.task_offset = graph.task_offset
+        self.task_ids = graph.task_ids
+
+        # Hours per role and task, as daily rates over the task's duration
+        contingency = 1 + (estimate.contingency_percentage or 0) / 100
+        rows = db.session.connection().execute(
+            select(Assignment.task_id, Assignment.role_level_id, func.sum(Assignment.hours))
+            .join(Task, Task.id == Assignment.task_id)
+            .join(Activity, Activity.id == Task.activity_id)
+            .join(Phase, Phase.id == Activity.phase_id)
+            .where(Phase.project_estimate_id == estimate.id, Assignment.role_level_id.isnot(None))
+            .group_by(Assignment.task_id, Assignment.role_level_id)
+        ).all()
+        nodes = np.array([graph.task_offset + graph.task_index[row[0]] for row in rows], dtype=np.int64)
+        hours = np.array([row[2] or 0.0 for row in rows], dtype=np.float64) * contingency
+        durations = self.durations[nodes] if len(rows) else np.zeros(0, dtype=np.int64)
+        keep = (durations > 0) & (hours > 0)
+        roles = np.array([row[1] for row in rows], dtype=np.int64)[keep]
+        self.role_ids, self.usage_role = np.unique(roles, return_inverse=True)
+        self.usage_node = nodes[keep]
+        self.usage_rate = hours[keep] / durations[keep]
+
+        capacities = capacities or {}
+        self.capacity_fte = np.array(
+            [capacities.get(role_id, capacity) for role_id in self.role_ids.tolist()], dtype=np.float64
+        )
+        self.role_names = reference_data().role_names
+
+def daily_load(starts, durations, usage_node, usage_role, usage_rate, role_count, day_count):
+    """Role x day matrix of hours when node i starts on day starts[i]."""
+    steps = np.zeros((role_count, day_count + 1))
+    first = np.asarray(starts, dtype=np.int64)[usage_node]
+    np.add.at(steps, (usage_role, first), usage_rate)
+    np.add.at(steps, (usage_role, first + durations[usage_node]), -usage_rate)
+    return np.cumsum(steps, axis=1)[:, :day_count]
+
+def _best_start(load, capacity, roles, rates, lower, upper, duration):
+    """Day in [lower, upper] adding the least overload for a task using rates of roles.
+
+    Candidates are ranked by the highest overload they leave in any day of
+    the task, then by the overloaded hours they add, then by earliness.
+    """
+    window = load[roles, lower:upper + duration]
+    limit = capacity[roles, None]
+    peaks = sliding_window_view(window, duration, axis=1).max(axis=2)
+    peak_excess = np.round(np.maximum(peaks + rates[:, None] - limit, 0).sum(axis=0), 9)
+    added = (np.maximum(window + rates[:, None] - limit, 0) - np.maximum(window - limit, 0)).sum(axis=0)
+    totals = np.concatenate(([0.0], np.cumsum(added)))
+    added_excess = np.round(totals[duration:] - totals[:-duration], 9)
+    return lower + int(np.lexsort((added_excess, peak_excess))[0])
+
+def level_resources(durations, predecessors, successors, offsets, early_start, late_start,
+                    usage_node, usage_role, usage_rate, capacity):
+    """Leveled start day of every node.
+
+    offsets are link_offsets() of the links; usage rows give a node, a dense
+    role index and the hours per day it uses that role; capacity holds hours
+    per day per role.
+    """
+    count = len(durations)
+    durations = np.asarray(durations, dtype=np.int64)
+    predecessors = np.asarray(predecessors, dtype=np.int64)
+    by_predecessor = np.argsort(predecessors, kind='stable')
+    first = np.concatenate(([0], np.cumsum(np.bincount(predecessors, minlength=count)))).tolist()
+    targets = np.asarray(successors, dtype=np.int64)[by_predecessor].tolist()
+    offsets = np.asarray(offsets, dtype=np.int64)[by_predecessor].tolist()
+    indegree = np.bincount(successors, minlength=count).tolist()
+    end = int((np.asarray(late_start, dtype=np.int64) + durations).max()) if count else 0
+
+    # Usage rows of node i are usage[bounds[i]:bounds[i + 1]]
+    by_node = np.argsort(usage_node, kind='stable')
+    usage_role = np.asarray(usage_role, dtype=np.int64)[by_node]
+    usage_rate = np.asarray(usage_rate, dtype=np.float64)[by_node]
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(usage_node, minlength=count)))).tolist()
+    load = np.zeros((len(capacity), end))
+
+    early = np.asarray(early_start, dtype=np.int64).tolist()
+    late = np.asarray(late_start, dtype=np.int64).tolist()
+    lengths = durations.tolist()
+    earliest = [0] * count
+    starts = [0] * count
+    heap = [(late[node], early[node], node) for node in range(count) if not indegree[node]]
+    heapq.heapify(heap)
+    while heap:
+        _, _, node = heapq.heappop(heap)
+        start = earliest[node]
+        duration = lengths[node]
+        if bounds[node] < bounds[node + 1]:
+            roles = usage_role[bounds[node]:bounds[node + 1]]
+            rates = usage_rate[bounds[node]:bounds[node + 1]]
+            if late[node] > start:
+                start = _best_start(load, capacity, roles, rates, start, late[node], duration)
+            load[roles, start:start + duration] += rates[:, None]
+        starts[node] = start
+        finish = start + duration
+        for index in range(first[node], first[node + 1]):
+            successor = targets[index]
+            if finish + offsets[index] > earliest[successor]:
+                earliest[successor] = finish + offsets[index]
+            indegree[successor] -= 1
+            if not indegree[successor]:
+                heapq.heappush(heap, (late[successor], early[successor], successor))
+    return starts
+
+def solve_leveling(problem):
+    """Proposed task dates and per-role peaks before and after leveling.
+
+    When the heuristic would leave more overloaded hours than the critical
+    path schedule, that schedule is proposed unchanged.
+    """
+    role_count = len(problem.role_ids)
+    capacity = problem.capacity_fte * HOURS_PER_DAY
+    usage = (problem.durations, problem.usage_node, problem.usage_role, problem.usage_rate, role_count, problem.end)
+    before = daily_load(problem.early_start, *usage)
+    starts = np.asarray(level_resources(
+        problem.durations, problem.predecessors, problem.successors, problem.offsets,
+        problem.early_start, problem.late_start,
+        problem.usage_node, problem.usage_role, problem.usage_rate, capacity
+    ), dtype=np.int64)
+    after = daily_load(starts, *usage)
+    limit = capacity[:, None] + 1e-9
+    if np.maximum(after - limit, 0).sum() > np.maximum(before - limit, 0).sum():
+        starts, after = problem.early_start, before
+
+    fte_before = before / HOURS_PER_DAY
+    fte_after = after / HOURS_PER_DAY
+    peaks_before = fte_before.max(axis=1) if problem.end else np.zeros(role_count)
+    peaks_after = fte_after.max(axis=1) if problem.end else np.zeros(role_count)
+    over_before = (before > limit).sum(axis=1)
+    over_after = (after > limit).sum(axis=1)
+    roles = []
+    for index, role_id in enumerate(problem.role_ids.tolist()):
+        name, level = problem.role_names.get(role_id, (None, None))
+        roles.append({
+            'role_level_id': role_id,
+            'name': name,
+            'level': level,
+            'capacity_fte': float(problem.capacity_fte[index]),
+            'peak_fte_before': round(float(peaks_before[index]), 3),
+            'peak_fte_after': round(float(peaks_after[index]), 3),
+            'peak_reduction_fte': round(float(peaks_before[index] - peaks_after[index]), 3),
+            'overloaded_days_before': int(over_before[index]),
+            'overloaded_days_after': int(over_after[index])
+        })
+
+    calendar = Calendar(problem.start, problem.holidays)
+    dates = [calendar.date(day).isoformat() for day in range(problem.end + 1)]
+    tasks = []
+    durations = problem.durations.tolist()
+    early_start = problem.early_start.tolist()
+    starts = starts.tolist()
+    for index, task_id in enumerate(problem.task_ids):
+        node = problem.task_offset + index
+        start, finish = starts[node], starts[node] + durations[node]
+        tasks.append({
+            'id': task_id,
+            'early_start': early_start[node],
+            'start': start,
+            'finish': finish,
+            'shift_days': start - early_start[node],
+            'start_date': dates[start],
+            'finish_date': dates[max(finish - 1, start)]
+        })
+
+    return {
+        'estimate_id': problem.estimate_id,
+        'start_date': dates[0],
+        'finish_date': dates[max(problem.end - 1, 0)],
+        'duration_days': problem.end,
+        'hours_per_day': HOURS_PER_DAY,
+        'moved_tasks': sum(1 for task in tasks if task['shift_days']),
+        'peak_fte_before': round(float(fte_before.sum(axis=0).max(initial=0)), 3),
+        'peak_fte_after': round(float(fte_after.sum(axis=0).max(initial=0)), 3),
+        'roles': roles,
+        'tasks': tasks
+    }
+
+_executor = None
+_unfinished = 0
+_lock = threading.Lock()
+
+def _get_executor():
+    # Created on first use so that pre-forked workers each start their own threads
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LEVELING_WORKERS, thread_name_prefix='leveling')
+    return _executor
+
+def _release_slot():
+    global _unfinished
+    with _lock:
+        _unfinished -= 1
+
+def _set_job(engine, job_id, **values):
+    table = LevelingJob.__table__
+    with engine.begin() as connection:
+        connection.execute(update(table).where(table.c.id == job_id).values(**values))
+
+def _prune_jobs(engine):
+    # Keep the LEVELING_JOBS_KEPT most recently finished jobs
+    table = LevelingJob.__table__
+    finished = table.c.status.in_(('done', 'failed'))
+    kept = select(table.c.id).where(finished).order_by(table.c.finished_at.desc()).limit(LEVELING_JOBS_KEPT)
+    with engine.begin() as connection:
+        connection.execute(delete(table).where(finished, table.c.id.not_in(kept)))
+
+def _run_job(engine, job_id, problem):
+    try:
+        _set_job(engine, job_id, status='running')
+        try:
+            result = solve_leveling(problem)
+        except Exception as e:
+            _set_job(engine, job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+        else:
+            _set_job(engine, job_id, status='done', result=dumps(result).decode(), finished_at=datetime.utcnow())
+        _prune_jobs(engine)
+    finally:
+        _release_slot()
+
+def start_leveling(estimate, capacity=1.0, capacities=None):
+    """Queue a leveling run of an estimate and return its LevelingJob row.
+
+    capacity is the FTE cap of every role level, capacities maps role level
+    ids to their own cap. The job is committed before it is queued, so any
+    worker process can answer a poll. Raises LevelingQueueFull when this
+    process already has LEVELING_QUEUE unfinished runs, and CycleError when
+    the dependencies cannot be scheduled.
+    """
+    global _unfinished
+    with _lock:
+        if _unfinished >= LEVELING_QUEUE:
+            raise LevelingQueueFull('Too many leveling jobs in progress')
+        _unfinished += 1
+    try:
+        problem = LevelingProblem(estimate, capacity, capacities)
+        job = LevelingJob(id=uuid.uuid4().hex, project_estimate_id=estimate.id, status='pending')
+        db.session.add(job)
+        db.session.commit()
+        _get_executor().submit(_run_job, db.engine, job.id, problem)
+    except Exception:
+        _release_slot()
+        raise
+    return job
+
+def leveling_job(job_id):
+    return db.session.get(LevelingJob, job_id)
@@ -0,0 +1,48 @@
+from sqlalchemy import select
+from src.models.estimator import db, Phase, Activity, Task, Assignment
+from src.services.reference import reference_data
+
+# Normalized estimate representation
+#
+# The nested tree embeds the full role level in every assignment. The
+# normalized shape (?shape=normalized) returns phases, activities, tasks and
+# assignments as flat arrays ordered by id, each row pointing at its parent
+# by id, plus the role levels the assignments use once, keyed by id. Rows
+# are read as plain columns, so no ORM objects are built.
+
+ESTIMATE_SHAPES = ('nested', 'normalized')
+
+PHASE_COLUMNS = (Phase.id, Phase.name, Phase.description, Phase.order_index, Phase.project_estimate_id)
+ACTIVITY_COLUMNS = (Activity.id, Activity.name, Activity.description, Activity.order_index, Activity.phase_id)
+TASK_COLUMNS = (
+    Task.id, Task.name, Task.description, Task.order_index, Task.complexity, Task.story_points,
+    Task.estimated_hours, Task.low_hours, Task.likely_hours, Task.high_hours, Task.activity_id
+)
+ASSIGNMENT_COLUMNS = (
+    Assignment.id, Assignment.task_id, Assignment.role_level_id, Assignment.hours,
+    Assignment.bill_rate_override, Assignment.cost_rate_override
+)
+
+def _rows(connection, columns, condition):
+    keys = [column.key for column in columns]
+    result = connection.execute(select(*columns).where(condition).order_by(columns[0]))
+    return [dict(zip(keys, row)) for row in result]
+
+def normalized_estimate(estimate):
+    """Estimate fields plus flat phase/activity/task/assignment arrays and a
+    role_levels lookup."""
+    connection = db.session.connection()
+    phase_ids = select(Phase.id).where(Phase.project_estimate_id == estimate.id)
+    activity_ids = select(Activity.id).where(Activity.phase_id.in_(phase_ids))
+    task_ids = select(Task.id).where(Task.activity_id.in_(activity_ids))
+
+    result = estimate.to_dict(include_phases=False)
+    result['phases'] = _rows(connection, PHASE_COLUMNS, Phase.project_estimate_id == estimate.id)
+    result['activities'] = _rows(connection, ACTIVITY_COLUMNS, Activity.phase_id.in_(phase_ids))
+    result['tasks'] = _rows(connection, TASK_COLUMNS, Task.activity_id.in_(activity_ids))
+    result['assignments'] = _rows(connection, ASSIGNMENT_COLUMNS, Assignment.task_id.in_(task_ids))
+
+    roles = reference_data().roles_by_id
+    used = {assignment['role_level_id'] for assignment in result['assignments']}
+    result['role_levels'] = {role_id: roles[role_id] for role_id in sorted(used) if role_id in roles}
+    return result
@@ -0,0 +1,106 @@
+import zlib
+
+# Minimal PDF writer
+#
+# Enough of PDF 1.4 to draw text, rectangles and lines on US Letter pages
+# with the standard Helvetica fonts, which every viewer provides, so nothing
+# has to be embedded and no third-party library is needed. Content streams
+# are Flate-compressed.
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+FONTS = {False: 'F1', True: 'F2'}
+
+# Helvetica advance widths (1/1000 em) for the characters used in figures;
+# other characters are measured with an average width
+CHAR_WIDTHS = {' ': 278, ',': 278, '.': 278, '-': 333, '%': 889, '$': 556}
+AVERAGE_WIDTH = 556
+BOLD_AVERAGE_WIDTH = 611
+
+def text_width(value, size, bold=False):
+    """Approximate width of a string in points."""
+    average = BOLD_AVERAGE_WIDTH if bold else AVERAGE_WIDTH
+    units = sum(
+        556 if char.isdigit() else CHAR_WIDTHS.get(char, average) for char in value
+    )
+    return units * size / 1000
+
+def _escape(value):
+    # The fonts use WinAnsiEncoding, i.e. cp1252
+    value = str(value).encode('cp1252', errors='replace').decode('latin-1')
+    return value.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+def _color(rgb):
+    return ' '.join(f'{c:.3f}' for c in rgb)
+
+class PdfCanvas:
+    """Drawing operations collected per page and serialized by to_bytes().
+
+    Coordinates are in points from the bottom-left corner of the page.
+    """
+
+    def __init__(self, width=PAGE_WIDTH, height=PAGE_HEIGHT):
+        self.width = width
+        self.height = height
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.ops = []
+        self.pages.append(self.ops)
+
+    def text(self, x, y, value, size=10, bold=False, color=(0, 0, 0)):
+        self.ops.append(
+            f'{_color(color)} rg BT /{FONTS[bold]} {size} Tf {x:.2f} {y:.2f} Td ({_escape(value)}) Tj ET'
+        )
+
+    def text_right(self, x, y, value, size=10, bold=False, color=(0, 0, 0)):
+        self.text(x - text_width(value, size, bold), y, value, size, bold, color)
+
+    def rect(self, x, y, width, height, fill=None, stroke=None):
+        ops = []
+        if fill is not None:
+            ops.append(f'{_color(fill)} rg')
+        if stroke is not None:
+            ops.append(f'{_color(stroke)} RG 0.5 w')
+        paint = 'B' if fill is not None and stroke is not None else ('f' if fill is not None else 'S')
+        ops.append(f'{x:.2f} {y:.2f} {width:.2f} {height:.2f} re {paint}')
+        self.ops.append(' '.join(ops))
+
+    def line(self, x1, y1, x2, y2, color=(0, 0, 0), width=0.5):
+        self.ops.append(f'{_color(color)} RG {width} w {x1:.2f} {y1:.2f} m {x2:.2f} {y2:.2f} l S')
+
+    def to_bytes(self):
+        objects = [None, None]  # catalog and page tree are filled in last
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        regular = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>')
+        bold = add(b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>')
+        kids = []
+        for ops in self.pages:
+            stream = zlib.compress('\n'.join(ops).encode('latin-1'))
+            content = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+            kids.append(add((
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.width} {self.height}] '
+                f'/Resources << /Font << /F1 {regular} 0 R /F2 {bold} 0 R >> >> /Contents {content} 0 R >>'
+            ).encode()))
+        objects[0] = b'<< /Type /Catalog /Pages 2 0 R >>'
+        objects[1] = (
+            f'<< /Type /Pages /Kids [{" ".join(f"{kid} 0 R" for kid in kids)}] /Count {len(kids)} >>'
+        ).encode()
+
+        out = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n' % (len(objects) + 1, xref)
+        out += b'%EOF\n'
+        return bytes(out)
@@ -0,0 +1,259 @@
+import glob
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from src.config import PDF_CACHE_DIR, PDF_RENDER_WORKERS, PDF_RENDER_QUEUE, PDF_RENDER_TIMEOUT
+from src.models.estimator import db
+from src.services.exports import report_data
+from src.services.reference import estimate_generation
+from src.services.pdf import PdfCanvas, PAGE_WIDTH, PAGE_HEIGHT, text_width
+
+# PDF proposal export
+#
+# Rendered files are named after the estimate's revision and the reference
+# generation, which move with everything the report shows, so an unchanged
+# estimate is served from disk without reading it. On a miss the request
+# thread gathers the (small) report data and rendering runs in a bounded
+# thread pool. Bump RENDER_VERSION when the layout changes to invalidate
+# cached files.
+
+RENDER_VERSION = 2
+
+MARGIN = 48
+CONTENT_WIDTH = PAGE_WIDTH - 2 * MARGIN
+ACCENT = (0.149, 0.388, 0.922)
+MUTED = (0.42, 0.45, 0.50)
+RULE = (0.85, 0.87, 0.90)
+SHADE = (0.95, 0.96, 0.98)
+
+class RenderQueueFull(RuntimeError):
+    """Raised when PDF_RENDER_QUEUE renders are already waiting or running."""
+
+def _money(value):
+    return f'{value:,.0f}'
+
+def _fit(value, width, size, bold=False):
+    """Truncate a string with an ellipsis so it fits in width points."""
+    value = value or ''
+    if text_width(value, size, bold) <= width:
+        return value
+    while value and text_width(value + '...', size, bold) > width:
+        value = value[:-1]
+    return value + '...'
+
+class _Report:
+    """Top-down layout over a PdfCanvas that starts new pages as needed."""
+
+    def __init__(self):
+        self.canvas = PdfCanvas()
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def reserve(self, height):
+        if self.y - height < MARGIN:
+            self.canvas.new_page()
+            self.y = PAGE_HEIGHT - MARGIN
+
+    def heading(self, title):
+        self.reserve(40)
+        self.y -= 28
+        self.canvas.text(MARGIN, self.y, title, size=13, bold=True)
+        self.y -= 6
+        self.canvas.line(MARGIN, self.y, MARGIN + CONTENT_WIDTH, self.y, color=RULE)
+
+def _draw_title(report, data):
+    estimate = data['estimate']
+    canvas = report.canvas
+    report.y -= 20
+    canvas.text(MARGIN, report.y, _fit(estimate['name'], CONTENT_WIDTH, 20, True), size=20, bold=True)
+    report.y -= 16
+    details = (
+        f"Status: {estimate['status'] or '-'}    Currency: {estimate['currency'] or '-'}    "
+        f"Contingency: {estimate['contingency_percentage'] or 0:g}%"
+    )
+    canvas.text(MARGIN, report.y, details, size=9, color=MUTED)
+    if estimate['description']:
+        report.y -= 14
+        canvas.text(MARGIN, report.y, _fit(estimate['description'], CONTENT_WIDTH, 9), size=9, color=MUTED)
+
+def _draw_kpis(report, data):
+    totals = data['totals']
+    currency = data['estimate']['currency'] or ''
+    panels = [
+        ('Total Hours', f"{totals['hours']:,.1f}"),
+        (f'Cost ({currency})', _money(totals['cost'])),
+        (f'Revenue ({currency})', _money(totals['revenue'])),
+        (f'Margin ({currency})', _money(totals['margin'])),
+        ('AGM', f"{totals['agm']:.1f}%"),
+    ]
+    gap = 8
+    width = (CONTENT_WIDTH - gap * (len(panels) - 1)) / len(panels)
+    report.reserve(70)
+    report.y -= 62
+    for index, (label, value) in enumerate(panels):
+        x = MARGIN + index * (width + gap)
+        report.canvas.rect(x, report.y, width, 50, fill=SHADE, stroke=RULE)
+        report.canvas.text(x + 8, report.y + 33, label, size=8, color=MUTED)
+        report.canvas.text(x + 8, report.y + 12, _fit(value, width - 16, 14, True), size=14, bold=True)
+
+def _draw_phase_table(report, data):
+    currency = data['estimate']['currency'] or ''
+    # (title, right edge or None for left-aligned, value formatter)
+    columns = [
+        ('Phase', None, lambda row: _fit(row['name'], 170, 9)),
+        ('Hours', 290, lambda row: f"{row['hours']:,.1f}"),
+        (f'Cost ({currency})', 360, lambda row: _money(row['cost'])),
+        (f'Revenue ({currency})', 440, lambda row: _money(row['revenue'])),
+        (f'Margin ({currency})', 510, lambda row: _money(row['margin'])),
+        ('AGM', MARGIN + CONTENT_WIDTH - 4, lambda row: f"{row['agm']:.1f}%"),
+    ]
+    row_height = 16
+
+    def draw_row(values, bold=False, fill=None):
+        report.reserve(row_height)
+        report.y -= row_height
+        if fill is not None:
+            report.canvas.rect(MARGIN, report.y, CONTENT_WIDTH, row_height, fill=fill)
+        for (_, right, _), value in zip(columns, values):
+            if right is None:
+                report.canvas.text(MARGIN + 4, report.y + 5, value, size=9, bold=bold)
+            else:
+                report.canvas.text_right(right, report.y + 5, value, size=9, bold=bold)
+
+    report.heading('Phase Summary')
+    report.y -= 4
+    draw_row([title for title, _, _ in columns], bold=True, fill=SHADE)
+    for index, phase in enumerate(data['phases']):
+        draw_row([format_value(phase) for _, _, format_value in columns], fill=SHADE if index % 2 else None)
+    totals = dict(data['totals'], name='Total')
+    draw_row([format_value(totals) for _, _, format_value in columns], bold=True)
+    report.canvas.line(MARGIN, report.y + row_height, MARGIN + CONTENT_WIDTH, report.y + row_height, color=MUTED)
+
+def _draw_gantt(report, data):
+    phases = data['phases']
+    total_weeks = data['totals']['weeks']
+    report.heading('Timeline')
+    if not phases or total_weeks <= 0:
+        report.y -= 18
+        report.canvas.text(MARGIN, report.y, 'No effort estimated yet.', size=9, color=MUTED)
+        return
+
+    label_width = 150
+    left = MARGIN + label_width
+    width = CONTENT_WIDTH - label_width
+    scale = width / total_weeks
+    step = max(1, int(total_weeks / 10) + 1)
+    bar_height = 12
+    row_height = 20
+
+    def draw_axis():
+        report.reserve(20)
+        report.y -= 16
+        for week in range(0, int(total_weeks) + 1, step):
+            x = left + week * scale
+            report.canvas.text(x - 3, report.y, f'W{week}', size=7, color=MUTED)
+            report.canvas.line(x, report.y - 3, x, report.y - 6, color=MUTED)
+        report.y -= 6
+
+    draw_axis()
+    for phase in phases:
+        if report.y - row_height < MARGIN:
+            report.reserve(row_height + 20)
+            draw_axis()
+        report.y -= row_height
+        report.canvas.text(MARGIN, report.y + 6, _fit(phase['name'], label_width - 8, 9), size=9)
+        report.canvas.rect(left, report.y + 2, width, bar_height + 2, fill=SHADE)
+        start = phase['start_week']
+        bar = max(phase['weeks'] * scale, 1)
+        report.canvas.rect(left + start * scale, report.y + 3, bar, bar_height, fill=ACCENT)
+        caption = f"{phase['weeks']:.1f} wk"
+        caption_x = left + start * scale + bar + 4
+        if caption_x + text_width(caption, 7) > MARGIN + CONTENT_WIDTH:
+            caption_x = left + start * scale - text_width(caption, 7) - 4
+        report.canvas.text(caption_x, report.y + 6, caption, size=7, color=MUTED)
+    report.y -= 16
+    report.canvas.text(
+        MARGIN, report.y,
+        f'Total duration {total_weeks:.1f} working weeks, from the critical path schedule of '
+        f'the tasks and their dependencies.', size=8, color=MUTED
+    )
+
+def render_estimate_pdf(data):
+    """PDF bytes for report_data() output; pure function of its input."""
+    report = _Report()
+    _draw_title(report, data)
+    _draw_kpis(report, data)
+    _draw_phase_table(report, data)
+    _draw_gantt(report, data)
+    return report.canvas.to_bytes()
+
+def cache_key(revision, generation):
+    return f'{RENDER_VERSION}.{revision}.{generation}'
+
+_executor = None
+_pending = {}
+_lock = threading.RLock()
+
+def _get_executor():
+    # Created on first use so that pre-forked workers each start their own threads
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PDF_RENDER_WORKERS, thread_name_prefix='pdf-render')
+    return _executor
+
+def _render_to_file(estimate_id, path, data):
+    pdf = render_estimate_pdf(data)
+    os.makedirs(PDF_CACHE_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=PDF_CACHE_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pdf)
+    os.replace(temp_path, path)
+    # Older renders of the same estimate can never be requested again
+    for stale in glob.glob(os.path.join(PDF_CACHE_DIR, f'estimate-{estimate_id}-*.pdf')):
+        if stale != path:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+    return pdf
+
+def _forget(slot):
+    with _lock:
+        _pending.pop(slot, None)
+
+def export_estimate_pdf(estimate):
+    """(cache key, PDF bytes, served from cache) for an estimate.
+
+    The key is read before the report data is gathered, so a cache hit
+    costs one query. When a write commits while the data is read, the PDF
+    is rendered but not cached and the key is None. Concurrent requests for
+    the same content share one render. Raises RenderQueueFull when the pool
+    is saturated.
+    """
+    connection = db.session.connection()
+    version = estimate_generation(connection, estimate.id)
+    key = cache_key(*version)
+    path = os.path.join(PDF_CACHE_DIR, f'estimate-{estimate.id}-{key}.pdf')
+    try:
+        with open(path, 'rb') as f:
+            return key, f.read(), True
+    except FileNotFoundError:
+        pass
+
+    data = report_data(estimate)
+    if estimate_generation(connection, estimate.id) != version:
+        key = path = None
+
+    with _lock:
+        future = _pending.get(path) if path else None
+        if future is None:
+            if len(_pending) >= PDF_RENDER_QUEUE:
+                raise RenderQueueFull('Too many PDF exports in progress')
+            if path:
+                future = _get_executor().submit(_render_to_file, estimate.id, path, data)
+            else:
+                future = _get_executor().submit(render_estimate_pdf, data)
+            slot = path or future
+            _pending[slot] = future
+            future.add_done_callback(lambda _: _forget(slot))
+    return key, future.result(timeout=PDF_RENDER_TIMEOUT), False
@@ -0,0 +1,137 @@
+import hashlib
+import threading
+from itertools import chain
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+from src.models.estimator import db, ProjectEstimate, RoleLevel, ComplexityMatrix, ReferenceDataVersion
+from src.services.serialization import dumps
+
+# Reference data cache
+#
+# Role levels (with their default rates) and the complexity matrix change
+# rarely but are read by every admin, KPI and staffing request, so each
+# process keeps one ReferenceData snapshot tagged with a generation number.
+# The number lives in reference_data_versions and any flush that writes one
+# of these models bumps it in the same transaction, so every worker process
+# reloads once the write commits, at the cost of one primary key lookup per
+# read. A session holding uncommitted reference writes never publishes what
+# it loads.
+
+REFERENCE_MODELS = (RoleLevel, ComplexityMatrix)
+
+def _payload(data):
+    """(JSON bytes, strong ETag) of data."""
+    body = dumps(data)
+    return body, hashlib.sha256(body).hexdigest()[:32]
+
+class ReferenceData:
+    """Immutable snapshot of the role levels and the complexity matrix.
+
+    Holds the serialized responses of the two reference endpoints (the
+    matrix in both shapes), role levels, rates and names by id, and the
+    matrix index keyed by (role_level_id, complexity); the first row of a
+    duplicated key wins.
+    """
+
+    def __init__(self, generation, connection):
+        self.generation = generation
+        roles = connection.execute(
+            select(RoleLevel.id, RoleLevel.name, RoleLevel.level, RoleLevel.default_bill_rate,
+                   RoleLevel.default_cost_rate, RoleLevel.created_at).order_by(RoleLevel.id)
+        ).all()
+        self.role_levels = [{
+            'id': role_id,
+            'name': name,
+            'level': level,
+            'default_bill_rate': bill_rate,
+            'default_cost_rate': cost_rate,
+            'created_at': created_at.isoformat() if created_at else None
+        } for role_id, name, level, bill_rate, cost_rate, created_at in roles]
+        self.roles_by_id = {role['id']: role for role in self.role_levels}
+        self.role_names = {role['id']: (role['name'], role['level']) for role in self.role_levels}
+        self.bill_rates = {role['id']: role['default_bill_rate'] for role in self.role_levels}
+        self.cost_rates = {role['id']: role['default_cost_rate'] for role in self.role_levels}
+
+        # Role levels are joined in memory instead of one lazy load per entry
+        entries = connection.execute(
+            select(ComplexityMatrix.id, ComplexityMatrix.role_level_id, ComplexityMatrix.complexity,
+                   ComplexityMatrix.hours_per_story_point).order_by(ComplexityMatrix.id)
+        ).all()
+        self.complexity_matrix = [{
+            'id': entry_id,
+            'role_level_id': role_level_id,
+            'complexity': complexity,
+            'hours_per_story_point': hours,
+            'role_level': self.roles_by_id.get(role_level_id)
+        } for entry_id, role_level_id, complexity, hours in entries]
+        self.matrix_index = {}
+        for _, role_level_id, complexity, hours in entries:
+            self.matrix_index.setdefault((role_level_id, complexity), hours)
+
+        # ?shape=normalized: entries refer to a role_levels lookup instead of embedding it
+        used = sorted({role_level_id for _, role_level_id, _, _ in entries if role_level_id in self.roles_by_id})
+        normalized_matrix = {
+            'entries': [{key: value for key, value in entry.items() if key != 'role_level'}
+                        for entry in self.complexity_matrix],
+            'role_levels': {role_id: self.roles_by_id[role_id] for role_id in used}
+        }
+
+        self.role_levels_payload = _payload(self.role_levels)
+        self.complexity_matrix_payload = _payload(self.complexity_matrix)
+        self.normalized_complexity_matrix_payload = _payload(normalized_matrix)
+
+_cache = None
+_lock = threading.Lock()
+
+GENERATION_QUERY = select(ReferenceDataVersion.generation).where(ReferenceDataVersion.id == 1)
+
+def reference_generation(connection):
+    return connection.execute(GENERATION_QUERY).scalar() or 0
+
+def estimate_generation(connection, estimate_id):
+    """(revision, reference generation) of an estimate in one SELECT, or (None, None).
+
+    Together they change with everything an estimate's responses show.
+    """
+    row = connection.execute(
+        select(ProjectEstimate.revision, GENERATION_QUERY.scalar_subquery()).where(ProjectEstimate.id == estimate_id)
+    ).first()
+    return (row[0], row[1] or 0) if row else (None, None)
+
+def reference_data():
+    """The current ReferenceData, reloaded when the stored generation moved."""
+    global _cache
+    connection = db.session.connection()
+    generation = reference_generation(connection)
+    cached = _cache
+    if cached is not None and cached.generation == generation:
+        return cached
+
+    data = ReferenceData(generation, connection)
+    if not db.session.info.get('reference_data_changed'):
+        with _lock:
+            if _cache is None or _cache.generation <= generation:
+                _cache = data
+    return data
+
+def _reference_written(session):
+    if any(isinstance(obj, REFERENCE_MODELS) for obj in chain(session.new, session.deleted)):
+        return True
+    # A backref append (new assignment of a role level) dirties the role level without writing it
+    return any(isinstance(obj, REFERENCE_MODELS) and session.is_modified(obj, include_collections=False)
+               for obj in session.dirty)
+
+@event.listens_for(Session, 'after_flush')
+def _bump_generation(session, flush_context):
+    if _reference_written(session):
+        session.info['reference_data_changed'] = True
+        # The row is seeded by upgrade_schema(), so this never has to insert it
+        table = ReferenceDataVersion.__table__
+        session.connection().execute(
+            update(table).where(table.c.id == 1).values(generation=table.c.generation + 1)
+        )
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _transaction_ended(session):
+    session.info.pop('reference_data_changed', None)
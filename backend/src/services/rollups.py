@@ -0,0 +1,400 @@
+from collections import defaultdict
+from itertools import chain
+from sqlalchemy import event, select, update, func, and_, bindparam, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from src.models.estimator import (
+    db, ProjectEstimate, Phase, Activity, Task, RoleLevel, Assignment, RateOverride, Dependency, Holiday
+)
+
+# Rollup maintenance
+#
+# Activity, Phase and ProjectEstimate carry rollup_hours/cost/revenue. Every
+# ORM flush that touches Task.estimated_hours, an Assignment or a rate is
+# turned into per-activity deltas which are pushed up the three ancestor rows
+# with UPDATE ... SET x = x + delta, inside the flush's own transaction. Rate
+# changes and structural deletes affect too many rows for deltas, so those
+# estimates are rebuilt with set-based UPDATEs instead.
+#
+# The same flush bumps ProjectEstimate.revision of every estimate whose row,
+# WBS, rate overrides, dependencies or holidays it wrote (a shared holiday
+# bumps them all). Stored rollups and schedules are derived, so writing them
+# does not count; updated_at is sent with the estimate, so setting it does.
+# Set-based writes that bypass the ORM call bump_revisions.
+
+TASK_KEYS = ('activity_id', 'estimated_hours')
+ASSIGNMENT_KEYS = ('task_id', 'role_level_id', 'hours', 'bill_rate_override', 'cost_rate_override')
+RATE_OVERRIDE_KEYS = ('project_estimate_id', 'role_level_id', 'bill_rate', 'cost_rate')
+ROLE_RATE_KEYS = ('default_bill_rate', 'default_cost_rate')
+DERIVED_KEYS = frozenset((
+    'rollup_hours', 'rollup_cost', 'rollup_revenue', 'schedule_start', 'schedule_finish', 'revision'
+))
+ESTIMATE_CHILDREN = (RateOverride, Dependency, Holiday)
+
+def _changed(obj, keys):
+    return any(get_history(obj, key).has_changes() for key in keys)
+
+def _edited(obj):
+    """True if a flush writes anything but derived columns of obj."""
+    return any(attr.history.has_changes() for attr in inspect(obj).attrs if attr.key not in DERIVED_KEYS)
+
+def _old_value(obj, key):
+    """Committed value of an attribute, or raise LookupError if it is unknown."""
+    history = get_history(obj, key)
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    if history.added:
+        # The previous value was never loaded, so it cannot be subtracted
+        raise LookupError(key)
+    return getattr(obj, key)
+
+class RollupFlush:
+    """Collects the rollup changes implied by one flush and applies them."""
+
+    def __init__(self, session, connection):
+        self.session = session
+        self.connection = connection
+        self.deltas = defaultdict(lambda: [0.0, 0.0, 0.0])
+        self.rebuild = set()
+        self.parents = {}
+        self.rates = {}
+        self.revised = set()
+        self.revise_all = False
+        # Parents of rows deleted in this flush can no longer be read back
+        self.deleted_tasks = {}
+        self.deleted_activities = {}
+        self.deleted_phases = {}
+        for obj in session.deleted:
+            if isinstance(obj, Task):
+                self.deleted_tasks[obj.id] = _old_value(obj, 'activity_id')
+            elif isinstance(obj, Activity):
+                self.deleted_activities[obj.id] = _old_value(obj, 'phase_id')
+            elif isinstance(obj, Phase):
+                self.deleted_phases[obj.id] = _old_value(obj, 'project_estimate_id')
+
+    def task_activity(self, task_id):
+        if task_id in self.deleted_tasks:
+            return self.deleted_tasks[task_id]
+        return self.connection.execute(
+            select(Task.activity_id).where(Task.id == task_id)
+        ).scalar()
+
+    def phase_estimate(self, phase_id):
+        if phase_id in self.deleted_phases:
+            return self.deleted_phases[phase_id]
+        return self.connection.execute(
+            select(Phase.project_estimate_id).where(Phase.id == phase_id)
+        ).scalar()
+
+    def ancestors(self, activity_id):
+        """(phase_id, estimate_id) of an activity, or None if it is gone."""
+        if activity_id not in self.parents:
+            phase_id = self.deleted_activities.get(activity_id)
+            if phase_id is None:
+                phase_id = self.connection.execute(
+                    select(Activity.phase_id).where(Activity.id == activity_id)
+                ).scalar()
+            estimate_id = self.phase_estimate(phase_id) if phase_id is not None else None
+            self.parents[activity_id] = (phase_id, estimate_id) if estimate_id is not None else None
+        return self.parents[activity_id]
+
+    def role_rates(self, estimate_id, role_level_id):
+        """(bill, cost) for a role: estimate RateOverride, else RoleLevel default."""
+        key = (estimate_id, role_level_id)
+        if key not in self.rates:
+            row = self.connection.execute(
+                select(RateOverride.bill_rate, RateOverride.cost_rate).where(
+                    RateOverride.project_estimate_id == estimate_id,
+                    RateOverride.role_level_id == role_level_id
+                )
+            ).first()
+            if row is None:
+                row = self.connection.execute(
+                    select(RoleLevel.default_bill_rate, RoleLevel.default_cost_rate)
+                    .where(RoleLevel.id == role_level_id)
+                ).first()
+            self.rates[key] = tuple(row) if row else (0.0, 0.0)
+        return self.rates[key]
+
+    def add(self, activity_id, hours=0.0, cost=0.0, revenue=0.0):
+        delta = self.deltas[activity_id]
+        delta[0] += hours
+        delta[1] += cost
+        delta[2] += revenue
+
+    def add_task(self, activity_id, hours, sign):
+        if activity_id is not None:
+            self.add(activity_id, hours=sign * (hours or 0.0))
+
+    def add_assignment(self, task_id, role_level_id, hours, bill_override, cost_override, sign):
+        activity_id = self.task_activity(task_id)
+        ancestors = self.ancestors(activity_id) if activity_id is not None else None
+        if ancestors is None:
+            return
+        bill_rate, cost_rate = self.role_rates(ancestors[1], role_level_id)
+        if bill_override is not None:
+            bill_rate = bill_override
+        if cost_override is not None:
+            cost_rate = cost_override
+        hours = hours or 0.0
+        self.add(activity_id, cost=sign * hours * cost_rate, revenue=sign * hours * bill_rate)
+
+    def old_task(self, task):
+        self.add_task(_old_value(task, 'activity_id'), _old_value(task, 'estimated_hours'), -1)
+
+    def new_task(self, task):
+        self.add_task(task.activity_id, task.estimated_hours, 1)
+
+    def old_assignment(self, assignment):
+        self.add_assignment(*(_old_value(assignment, key) for key in ASSIGNMENT_KEYS), -1)
+
+    def new_assignment(self, assignment):
+        self.add_assignment(*(getattr(assignment, key) for key in ASSIGNMENT_KEYS), 1)
+
+    def rebuild_for_activity(self, activity_id):
+        ancestors = self.ancestors(activity_id)
+        if ancestors:
+            self.rebuild.add(ancestors[1])
+
+    def estimates_of(self, obj, moved=False):
+        """Ids of the estimates obj belongs to; when moved, also those it left."""
+        def parents(key):
+            return {getattr(obj, key), _old_value(obj, key)} if moved else {getattr(obj, key)}
+
+        if isinstance(obj, ProjectEstimate):
+            return {obj.id}
+        if isinstance(obj, (Phase,) + ESTIMATE_CHILDREN):
+            estimate_ids = parents('project_estimate_id')
+            if None in estimate_ids and isinstance(obj, Holiday):
+                self.revise_all = True
+            return estimate_ids
+        if isinstance(obj, Activity):
+            return {self.phase_estimate(phase_id) for phase_id in parents('phase_id') if phase_id is not None}
+        if isinstance(obj, Task):
+            activity_ids = parents('activity_id')
+        elif isinstance(obj, Assignment):
+            activity_ids = {self.task_activity(task_id) for task_id in parents('task_id') if task_id is not None}
+        else:
+            return set()
+        estimate_ids = set()
+        for activity_id in activity_ids:
+            ancestors = self.ancestors(activity_id) if activity_id is not None else None
+            if ancestors:
+                estimate_ids.add(ancestors[1])
+        return estimate_ids
+
+    def collect_revisions(self):
+        # New estimates start at revision 1 and deleted ones are gone
+        for obj in chain(self.session.new, self.session.deleted):
+            if not isinstance(obj, ProjectEstimate):
+                self.revised.update(self.estimates_of(obj))
+        for obj in self.session.dirty:
+            if _edited(obj):
+                try:
+                    self.revised.update(self.estimates_of(obj, moved=True))
+                except LookupError:
+                    # Moved from a parent that was never loaded
+                    self.revise_all = True
+
+    def collect(self):
+        for obj in self.session.new:
+            if isinstance(obj, Task):
+                self.new_task(obj)
+            elif isinstance(obj, Assignment):
+                self.new_assignment(obj)
+            elif isinstance(obj, RateOverride):
+                self.rebuild.add(obj.project_estimate_id)
+
+        for obj in self.session.dirty:
+            try:
+                if isinstance(obj, Task) and _changed(obj, ('activity_id',)):
+                    # Moved between activities: its assignments' cost and revenue move too
+                    self.rebuild_for_activity(obj.activity_id)
+                    self.rebuild_for_activity(_old_value(obj, 'activity_id'))
+                elif isinstance(obj, Task) and _changed(obj, TASK_KEYS):
+                    self.old_task(obj)
+                    self.new_task(obj)
+                elif isinstance(obj, Assignment) and _changed(obj, ASSIGNMENT_KEYS):
+                    self.old_assignment(obj)
+                    self.new_assignment(obj)
+                elif isinstance(obj, Activity) and _changed(obj, ('phase_id',)):
+                    # Moved between phases: both the old and new estimate change
+                    self.rebuild_for_activity(obj.id)
+                    self.rebuild.add(self.phase_estimate(_old_value(obj, 'phase_id')))
+                elif isinstance(obj, RateOverride) and _changed(obj, RATE_OVERRIDE_KEYS):
+                    self.rebuild.add(obj.project_estimate_id)
+                    self.rebuild.add(_old_value(obj, 'project_estimate_id'))
+                elif isinstance(obj, RoleLevel) and _changed(obj, ROLE_RATE_KEYS):
+                    self.rebuild.update(estimates_using_role(self.connection, obj.id))
+            except LookupError:
+                if isinstance(obj, Task):
+                    self.rebuild_for_activity(obj.activity_id)
+                elif isinstance(obj, Assignment):
+                    activity_id = self.task_activity(obj.task_id)
+                    if activity_id is not None:
+                        self.rebuild_for_activity(activity_id)
+
+        for obj in self.session.deleted:
+            if isinstance(obj, Task):
+                self.old_task(obj)
+            elif isinstance(obj, Assignment):
+                self.old_assignment(obj)
+            elif isinstance(obj, RateOverride):
+                self.rebuild.add(_old_value(obj, 'project_estimate_id'))
+            elif isinstance(obj, Activity):
+                self.rebuild.add(self.phase_estimate(self.deleted_activities[obj.id]))
+            elif isinstance(obj, Phase):
+                self.rebuild.add(self.deleted_phases[obj.id])
+
+    def apply(self):
+        self.rebuild.discard(None)
+        deltas = {}
+        for activity_id, delta in self.deltas.items():
+            ancestors = self.ancestors(activity_id)
+            if ancestors is not None and ancestors[1] not in self.rebuild:
+                deltas[activity_id] = delta
+        apply_rollup_deltas(self.connection, deltas)
+        if self.rebuild:
+            rebuild_rollups(sorted(self.rebuild), self.connection)
+        self.revised.discard(None)
+        if self.revise_all:
+            bump_revisions(self.connection)
+        elif self.revised:
+            bump_revisions(self.connection, sorted(self.revised))
+
+@event.listens_for(Session, 'after_flush')
+def maintain_rollups(session, flush_context):
+    rollup_flush = RollupFlush(session, session.connection())
+    rollup_flush.collect()
+    rollup_flush.collect_revisions()
+    rollup_flush.apply()
+
+def bump_revisions(connection, estimate_ids=None):
+    """Increment the revision of the given estimates, or of all of them."""
+    statement = update(ProjectEstimate).values(revision=ProjectEstimate.revision + 1)
+    if estimate_ids is not None:
+        statement = statement.where(ProjectEstimate.id.in_(estimate_ids))
+    connection.execute(statement)
+
+def apply_rollup_deltas(connection, deltas):
+    """Add {activity_id: (hours, cost, revenue)} deltas to each activity and its
+    phase and estimate.
+
+    Deltas are summed per node first, so each level is one executemany UPDATE.
+    Returns the ids of the estimates that changed.
+    """
+    activity_ids = [activity_id for activity_id, delta in deltas.items() if any(delta)]
+    if not activity_ids:
+        return set()
+    rows = connection.execute(
+        select(Activity.id, Activity.phase_id, Phase.project_estimate_id)
+        .join(Phase, Activity.phase_id == Phase.id)
+        .where(Activity.id.in_(activity_ids))
+    ).all()
+
+    levels = {model: defaultdict(lambda: [0.0, 0.0, 0.0]) for model in (Activity, Phase, ProjectEstimate)}
+    for activity_id, phase_id, estimate_id in rows:
+        hours, cost, revenue = deltas[activity_id]
+        for model, node_id in ((Activity, activity_id), (Phase, phase_id), (ProjectEstimate, estimate_id)):
+            total = levels[model][node_id]
+            total[0] += hours
+            total[1] += cost
+            total[2] += revenue
+
+    for model, totals in levels.items():
+        if not totals:
+            continue
+        table = model.__table__
+        connection.execute(
+            update(table).where(table.c.id == bindparam('node_id')).values(
+                rollup_hours=table.c.rollup_hours + bindparam('delta_hours'),
+                rollup_cost=table.c.rollup_cost + bindparam('delta_cost'),
+                rollup_revenue=table.c.rollup_revenue + bindparam('delta_revenue')
+            ),
+            [{'node_id': node_id, 'delta_hours': hours, 'delta_cost': cost, 'delta_revenue': revenue}
+             for node_id, (hours, cost, revenue) in totals.items()]
+        )
+    return set(levels[ProjectEstimate])
+
+def estimates_using_role(connection, role_level_id):
+    """Ids of estimates with at least one assignment for a role level."""
+    return connection.execute(
+        select(Phase.project_estimate_id).distinct()
+        .join(Activity, Activity.phase_id == Phase.id)
+        .join(Task, Task.activity_id == Activity.id)
+        .join(Assignment, Assignment.task_id == Task.id)
+        .where(Assignment.role_level_id == role_level_id)
+    ).scalars().all()
+
+def _activity_amount(rate_override_column, assignment_override_column, default_column):
+    """Correlated SUM(hours * resolved rate) over an activity's assignments."""
+    estimate_id = select(Phase.project_estimate_id) \
+        .where(Phase.id == Activity.phase_id).correlate(Activity).scalar_subquery()
+    rate = func.coalesce(assignment_override_column, rate_override_column, default_column)
+    return select(func.coalesce(func.sum(Assignment.hours * rate), 0.0)) \
+        .select_from(Assignment) \
+        .join(Task, Task.id == Assignment.task_id) \
+        .join(RoleLevel, RoleLevel.id == Assignment.role_level_id) \
+        .outerjoin(RateOverride, and_(
+            RateOverride.role_level_id == Assignment.role_level_id,
+            RateOverride.project_estimate_id == estimate_id
+        )) \
+        .where(Task.activity_id == Activity.id) \
+        .correlate(Activity).scalar_subquery()
+
+def rebuild_rollups(estimate_ids=None, connection=None):
+    """Recompute stored rollups from scratch with three set-based UPDATEs.
+
+    Rebuilds the given estimates, or every estimate when estimate_ids is None.
+    """
+    connection = connection if connection is not None else db.session.connection()
+
+    activity_hours = select(func.coalesce(func.sum(Task.estimated_hours), 0.0)) \
+        .where(Task.activity_id == Activity.id).correlate(Activity).scalar_subquery()
+    activities = update(Activity).values(
+        rollup_hours=activity_hours,
+        rollup_cost=_activity_amount(RateOverride.cost_rate, Assignment.cost_rate_override, RoleLevel.default_cost_rate),
+        rollup_revenue=_activity_amount(RateOverride.bill_rate, Assignment.bill_rate_override, RoleLevel.default_bill_rate)
+    )
+
+    def phase_sum(column):
+        return select(func.coalesce(func.sum(column), 0.0)) \
+            .where(Activity.phase_id == Phase.id).correlate(Phase).scalar_subquery()
+    phases = update(Phase).values(
+        rollup_hours=phase_sum(Activity.rollup_hours),
+        rollup_cost=phase_sum(Activity.rollup_cost),
+        rollup_revenue=phase_sum(Activity.rollup_revenue)
+    )
+
+    def estimate_sum(column):
+        return select(func.coalesce(func.sum(column), 0.0)) \
+            .where(Phase.project_estimate_id == ProjectEstimate.id) \
+            .correlate(ProjectEstimate).scalar_subquery()
+    estimates = update(ProjectEstimate).values(
+        rollup_hours=estimate_sum(Phase.rollup_hours),
+        rollup_cost=estimate_sum(Phase.rollup_cost),
+        rollup_revenue=estimate_sum(Phase.rollup_revenue)
+    )
+
+    if estimate_ids is not None:
+        phase_ids = select(Phase.id).where(Phase.project_estimate_id.in_(estimate_ids))
+        activities = activities.where(Activity.phase_id.in_(phase_ids))
+        phases = phases.where(Phase.project_estimate_id.in_(estimate_ids))
+        estimates = estimates.where(ProjectEstimate.id.in_(estimate_ids))
+
+    connection.execute(activities)
+    connection.execute(phases)
+    connection.execute(estimates)
+
+def ancestor_rollups(task):
+    """Current rollups of a task's activity, phase and estimate."""
+    activity = db.session.get(Activity, task.activity_id)
+    phase = db.session.get(Phase, activity.phase_id)
+    estimate = db.session.get(ProjectEstimate, phase.project_estimate_id)
+    return {
+        'activity': activity.rollup_dict(),
+        'phase': phase.rollup_dict(),
+        'estimate': estimate.rollup_dict()
+    }
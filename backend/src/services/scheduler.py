@@ -0,0 +1,754 @@
+from datetime import date, timedelta
+import heapq
+import numpy as np
+from sqlalchemy import select, update, func, or_, bindparam
+from src.config import HOURS_PER_WEEK
+from src.models.estimator import db, Phase, Activity, Task, Assignment, Dependency, Holiday
+
+# Critical path scheduling
+#
+# Every task is a node lasting a whole number of working days; every activity
+# and phase contributes two zero-length milestones (start and finish) that
+# bracket its children. Consecutive phases are linked finish-to-start, and
+# Dependency rows add finish-to-start or start-to-start links with a lag in
+# working days between tasks and/or activities. Without dependencies the
+# tasks of a phase all run in parallel.
+#
+# The forward pass runs inside Kahn's topological sort and the backward pass
+# walks the same order in reverse, so a schedule costs O(nodes + links).
+# Days are working-day offsets from the project start; Calendar maps them to
+# dates, skipping weekends and holidays.
+
+WORKING_DAYS_PER_WEEK = 5
+DEPENDENCY_TYPES = ('FS', 'SS')
+DEPENDENCY_NODE_TYPES = ('task', 'activity')
+
+class CycleError(ValueError):
+    """Raised when dependencies make a node (indirectly) depend on itself."""
+
+def task_durations(estimated_hours, assignment_counts, max_assignment_hours, contingency=1.0):
+    """Working days each task takes once staffed, as an int array.
+
+    Each assignment is one person working full days in parallel, so a task
+    lasts as long as its busiest assignee, and never less than its estimated
+    hours split evenly across them. Tasks without hours take no time.
+    """
+    people = np.maximum(np.asarray(assignment_counts, dtype=np.float64), 1)
+    hours = np.maximum(np.asarray(estimated_hours, dtype=np.float64) / people,
+                       np.asarray(max_assignment_hours, dtype=np.float64)) * contingency
+    days = np.ceil(hours / (HOURS_PER_WEEK / WORKING_DAYS_PER_WEEK) - 1e-9)
+    return np.maximum(days, 0).astype(np.int64)
+
+def link_offsets(durations, predecessors, lags, start_to_start):
+    """Days after its predecessor finishes that each link lets the successor start.
+
+    A start-to-start link counts from the predecessor's start, so its
+    offset is the lag minus the predecessor's duration.
+    """
+    return np.asarray(lags, dtype=np.int64) - \
+        np.where(np.asarray(start_to_start, dtype=bool), np.asarray(durations, dtype=np.int64)[predecessors], 0)
+
+def critical_path_method(durations, predecessors, successors, lags, start_to_start):
+    """Early/late start and finish of every node, or CycleError.
+
+    durations[i] is the length of node i; link k runs from predecessors[k]
+    to successors[k]. A finish-to-start link lets the successor start
+    lags[k] days after the predecessor finishes, a start-to-start link
+    lags[k] days after it starts. Nothing starts before day 0. Returns lists
+    (early_start, early_finish, late_start, late_finish, order).
+    """
+    count = len(durations)
+    durations = np.asarray(durations, dtype=np.int64)
+    predecessors = np.asarray(predecessors, dtype=np.int64)
+    successors = np.asarray(successors, dtype=np.int64)
+    offsets = link_offsets(durations, predecessors, lags, start_to_start)
+
+    # Successors of node i are targets[first[i]:first[i + 1]]
+    by_predecessor = np.argsort(predecessors, kind='stable')
+    first = np.concatenate(([0], np.cumsum(np.bincount(predecessors, minlength=count)))).tolist()
+    targets = successors[by_predecessor].tolist()
+    offsets = offsets[by_predecessor].tolist()
+    indegree = np.bincount(successors, minlength=count).tolist()
+    durations = durations.tolist()
+
+    # Forward pass, fused with the topological sort
+    early_start = [0] * count
+    early_finish = [0] * count
+    order = [node for node in range(count) if not indegree[node]]
+    for node in order:
+        finish = early_finish[node] = early_start[node] + durations[node]
+        for index in range(first[node], first[node + 1]):
+            successor = targets[index]
+            if finish + offsets[index] > early_start[successor]:
+                early_start[successor] = finish + offsets[index]
+            indegree[successor] -= 1
+            if not indegree[successor]:
+                order.append(successor)
+    if len(order) < count:
+        raise CycleError('Dependencies form a cycle')
+
+    # Backward pass: nothing may finish after the project does
+    end = max(early_finish, default=0)
+    late_start = [0] * count
+    late_finish = [end] * count
+    for node in reversed(order):
+        finish = late_finish[node]
+        for index in range(first[node], first[node + 1]):
+            if late_start[targets[index]] - offsets[index] < finish:
+                finish = late_start[targets[index]] - offsets[index]
+        late_finish[node] = finish
+        late_start[node] = finish - durations[node]
+    return early_start, early_finish, late_start, late_finish, order
+
+class Calendar:
+    """Working days (Monday to Friday, minus holidays) counted from a start date."""
+
+    def __init__(self, start, holidays=()):
+        self.holidays = set(holidays)
+        self.days = []
+        self._next = start
+
+    def _is_working(self, day):
+        return day.weekday() < WORKING_DAYS_PER_WEEK and day not in self.holidays
+
+    def date(self, offset):
+        """Date of working day number offset (0 is the first working day)."""
+        while len(self.days) <= offset:
+            day = self._next
+            while not self._is_working(day):
+                day += timedelta(days=1)
+            self.days.append(day)
+            self._next = day + timedelta(days=1)
+        return self.days[offset]
+
+    def span(self, start, finish):
+        """(first, last) dates of a node covering working days [start, finish)."""
+        return self.date(start), self.date(max(finish - 1, start))
+
+def estimate_holidays(estimate_id):
+    return db.session.execute(
+        select(Holiday.holiday_date).where(
+            or_(Holiday.project_estimate_id == estimate_id, Holiday.project_estimate_id.is_(None))
+        )
+    ).scalars().all()
+
+def task_staffing(*conditions):
+    """Subquery of (task_id, people, max_hours) over the assignments matching conditions."""
+    return select(
+        Assignment.task_id.label('task_id'),
+        func.count(Assignment.id).label('people'),
+        func.max(Assignment.hours).label('max_hours')
+    ).join(Task, Task.id == Assignment.task_id) \
+     .join(Activity, Activity.id == Task.activity_id) \
+     .join(Phase, Phase.id == Activity.phase_id) \
+     .where(*conditions) \
+     .group_by(Assignment.task_id).subquery()
+
+class ScheduleGraph:
+    """Nodes and links of one estimate, loaded with four queries.
+
+    Nodes are numbered phase milestones first (start, finish per phase),
+    then activity milestones, then tasks, all in WBS order. Task durations
+    are computed from hours and assignments, or with stored=True taken from
+    the stored schedule, which skips the assignment aggregate.
+    """
+
+    def __init__(self, estimate, stored=False):
+        self.estimate = estimate
+        connection = db.session.connection()
+        contingency = 1 + (estimate.contingency_percentage or 0) / 100
+
+        phases = connection.execute(
+            select(Phase.id, Phase.name, Phase.schedule_start, Phase.schedule_finish)
+            .where(Phase.project_estimate_id == estimate.id)
+            .order_by(Phase.order_index, Phase.id)
+        ).all()
+        activities = connection.execute(
+            select(Activity.id, Activity.phase_id, Activity.name, Activity.schedule_start, Activity.schedule_finish)
+            .join(Phase, Phase.id == Activity.phase_id)
+            .where(Phase.project_estimate_id == estimate.id)
+            .order_by(Phase.order_index, Phase.id, Activity.order_index, Activity.id)
+        ).all()
+        task_columns = [Task.id, Task.activity_id, Task.name, Task.schedule_start, Task.schedule_finish]
+        task_query = select(*task_columns) \
+            .join(Activity, Activity.id == Task.activity_id) \
+            .join(Phase, Phase.id == Activity.phase_id) \
+            .where(Phase.project_estimate_id == estimate.id) \
+            .order_by(Phase.order_index, Phase.id, Activity.order_index, Activity.id, Task.order_index, Task.id)
+        if not stored:
+            staffing = task_staffing(Phase.project_estimate_id == estimate.id)
+            task_query = task_query.add_columns(
+                func.coalesce(Task.estimated_hours, 0.0),
+                func.coalesce(staffing.c.people, 0), func.coalesce(staffing.c.max_hours, 0.0)
+            ).outerjoin(staffing, staffing.c.task_id == Task.id)
+        tasks = connection.execute(task_query).all()
+
+        self.phase_ids = [row[0] for row in phases]
+        self.phase_names = [row[1] for row in phases]
+        self.activity_ids = [row[0] for row in activities]
+        self.activity_names = [row[2] for row in activities]
+        self.task_ids = [row[0] for row in tasks]
+        self.task_names = [row[2] for row in tasks]
+        phase_index = {phase_id: index for index, phase_id in enumerate(self.phase_ids)}
+        activity_index = {activity_id: index for index, activity_id in enumerate(self.activity_ids)}
+        self.activity_phase = np.array([phase_index[row[1]] for row in activities], dtype=np.int64)
+        self.task_activity = np.array([activity_index[row[1]] for row in tasks], dtype=np.int64)
+
+        # Stored early start/finish per node; milestones start and finish on the same day
+        self.stored_start = []
+        self.stored_finish = []
+        for row in phases:
+            self.stored_start += [row[2], row[3]]
+            self.stored_finish += [row[2], row[3]]
+        for row in activities:
+            self.stored_start += [row[3], row[4]]
+            self.stored_finish += [row[3], row[4]]
+        self.stored_start += [row[3] for row in tasks]
+        self.stored_finish += [row[4] for row in tasks]
+        self.scheduled = None not in self.stored_start and None not in self.stored_finish
+
+        phase_count, activity_count, task_count = len(phases), len(activities), len(tasks)
+        self.activity_offset = 2 * phase_count
+        self.task_offset = self.activity_offset + 2 * activity_count
+        self.durations = np.zeros(self.task_offset + task_count, dtype=np.int64)
+        if tasks and not stored:
+            self.durations[self.task_offset:] = task_durations(
+                [row[5] for row in tasks], [row[6] for row in tasks], [row[7] for row in tasks], contingency
+            )
+        elif tasks and self.scheduled:
+            self.durations[self.task_offset:] = [row[4] - row[3] for row in tasks]
+
+        # Zero-lag finish-to-start links of the WBS itself
+        phase_start = 2 * np.arange(phase_count)
+        activity_start = self.activity_offset + 2 * np.arange(activity_count)
+        task_nodes = self.task_offset + np.arange(task_count)
+        self.predecessors = np.concatenate((
+            phase_start[:-1] + 1,                        # phase finish -> next phase start
+            phase_start[self.activity_phase],            # phase start -> activity start
+            activity_start + 1,                          # activity finish -> phase finish
+            activity_start[self.task_activity],          # activity start -> task
+            task_nodes                                   # task -> activity finish
+        ))
+        self.successors = np.concatenate((
+            phase_start[1:],
+            activity_start,
+            phase_start[self.activity_phase] + 1,
+            task_nodes,
+            activity_start[self.task_activity] + 1
+        ))
+        self.activity_index = activity_index
+        self.task_index = {task_id: index for index, task_id in enumerate(self.task_ids)}
+
+        self.links = []
+        for dependency in connection.execute(
+            select(
+                Dependency.predecessor_type, Dependency.predecessor_id, Dependency.successor_type,
+                Dependency.successor_id, Dependency.dependency_type, Dependency.lag_days
+            ).where(Dependency.project_estimate_id == estimate.id)
+        ):
+            link = self.dependency_link(*dependency)
+            if link is not None:
+                self.links.append(link)
+
+    def node(self, node_type, node_id, side='start'):
+        """Graph node of a task, or of an activity's 'start' or 'finish' milestone."""
+        if node_type == 'task':
+            index = self.task_index.get(node_id)
+            return None if index is None else self.task_offset + index
+        index = self.activity_index.get(node_id)
+        return None if index is None else self.activity_offset + 2 * index + (side == 'finish')
+
+    def dependency_link(self, predecessor_type, predecessor_id, successor_type, successor_id,
+                        dependency_type='FS', lag_days=0):
+        """(predecessor, successor, lag, start_to_start), or None when an end is not in the estimate."""
+        start_to_start = dependency_type == 'SS'
+        predecessor = self.node(predecessor_type, predecessor_id, 'start' if start_to_start else 'finish')
+        successor = self.node(successor_type, successor_id, 'start')
+        if predecessor is None or successor is None:
+            return None
+        return (predecessor, successor, lag_days or 0, start_to_start)
+
+    def link_arrays(self, extra_links=()):
+        """(predecessors, successors, lags, start_to_start) arrays of every link."""
+        links = self.links + list(extra_links)
+        predecessors, successors, lags, start_to_start = zip(*links) if links else ((), (), (), ())
+        hierarchy = len(self.predecessors)
+        return (
+            np.concatenate((self.predecessors, np.asarray(predecessors, dtype=np.int64))),
+            np.concatenate((self.successors, np.asarray(successors, dtype=np.int64))),
+            np.concatenate((np.zeros(hierarchy, dtype=np.int64), np.asarray(lags, dtype=np.int64))),
+            np.concatenate((np.zeros(hierarchy, dtype=bool), np.asarray(start_to_start, dtype=bool)))
+        )
+
+    def solve(self, extra_links=()):
+        """critical_path_method() over the WBS, the dependencies and any extra links."""
+        return critical_path_method(self.durations, *self.link_arrays(extra_links))
+
+    def items(self):
+        """(model, id, start node, finish node) of every phase, activity and task."""
+        for index, phase_id in enumerate(self.phase_ids):
+            yield Phase, phase_id, 2 * index, 2 * index + 1
+        for index, activity_id in enumerate(self.activity_ids):
+            node = self.activity_offset + 2 * index
+            yield Activity, activity_id, node, node + 1
+        for index, task_id in enumerate(self.task_ids):
+            node = self.task_offset + index
+            yield Task, task_id, node, node
+
+def store_schedule(graph, early_start, early_finish):
+    """Write early dates that differ from the stored ones.
+
+    Returns the (model, id, start, finish) items that changed.
+    """
+    changed = []
+    rows = {Phase: [], Activity: [], Task: []}
+    for model, item_id, start, finish in graph.items():
+        if graph.stored_start[start] != early_start[start] or graph.stored_finish[finish] != early_finish[finish]:
+            changed.append((model, item_id, start, finish))
+            rows[model].append({'node_id': item_id, 'start': early_start[start], 'finish': early_finish[finish]})
+
+    _write_dates(db.session.connection(), rows)
+    return changed
+
+def _write_dates(connection, rows):
+    """One executemany UPDATE per model of {model: [{node_id, start, finish}]}."""
+    for model, values in rows.items():
+        if values:
+            table = model.__table__
+            connection.execute(
+                update(table).where(table.c.id == bindparam('node_id')).values(
+                    schedule_start=bindparam('start'), schedule_finish=bindparam('finish')
+                ),
+                values
+            )
+
+def schedule_start(estimate):
+    if estimate.start_date:
+        return estimate.start_date
+    return estimate.created_at.date() if estimate.created_at else date.today()
+
+def estimate_schedule(estimate):
+    """ES/EF/LS/LF, slack and dates per task, activity and phase, plus the critical path.
+
+    Offsets are working days from the first working day on or after the
+    estimate's start date; finish dates are the last working day. Activities
+    and phases span from their start milestone to their finish milestone,
+    and their slack is the smaller of the two. Early dates are stored so
+    that later edits can be propagated by reschedule().
+    """
+    graph = ScheduleGraph(estimate)
+    early_start, early_finish, late_start, late_finish, _ = graph.solve()
+    store_schedule(graph, early_start, early_finish)
+    durations = graph.durations.tolist()
+    duration = max(early_finish, default=0)
+    calendar = Calendar(schedule_start(estimate), estimate_holidays(estimate.id))
+    dates = [calendar.date(day).isoformat() for day in range(duration + 1)]
+
+    def entry(item_id, name, start, finish):
+        slack = min(late_start[start] - early_start[start], late_finish[finish] - early_finish[finish])
+        return {
+            'id': item_id,
+            'name': name,
+            'early_start': early_start[start],
+            'early_finish': early_finish[finish],
+            'late_start': late_start[start],
+            'late_finish': late_finish[finish],
+            'slack': slack,
+            'critical': slack == 0,
+            'start_date': dates[early_start[start]],
+            'finish_date': dates[max(early_finish[finish] - 1, early_start[start])]
+        }
+
+    phases = [
+        entry(phase_id, name, 2 * index, 2 * index + 1)
+        for index, (phase_id, name) in enumerate(zip(graph.phase_ids, graph.phase_names))
+    ]
+    activities = []
+    for index, (activity_id, name) in enumerate(zip(graph.activity_ids, graph.activity_names)):
+        node = graph.activity_offset + 2 * index
+        item = entry(activity_id, name, node, node + 1)
+        item['phase_id'] = graph.phase_ids[graph.activity_phase[index]]
+        activities.append(item)
+    tasks = []
+    activity_of_task = graph.task_activity.tolist()
+    for index, (task_id, name) in enumerate(zip(graph.task_ids, graph.task_names)):
+        node = graph.task_offset + index
+        item = entry(task_id, name, node, node)
+        item['activity_id'] = graph.activity_ids[activity_of_task[index]]
+        item['duration'] = durations[node]
+        tasks.append(item)
+
+    # Zero-slack tasks that take time, in the order they start (ties keep WBS order)
+    critical = [
+        (early_start[graph.task_offset + index], index)
+        for index in range(len(graph.task_ids))
+        if tasks[index]['critical'] and tasks[index]['duration'] > 0
+    ]
+    return {
+        'estimate_id': estimate.id,
+        'start_date': dates[0],
+        'finish_date': dates[max(duration - 1, 0)],
+        'duration_days': duration,
+        'hours_per_day': HOURS_PER_WEEK / WORKING_DAYS_PER_WEEK,
+        'phases': phases,
+        'activities': activities,
+        'tasks': tasks,
+        'critical_path': [graph.task_ids[index] for _, index in sorted(critical)]
+    }
+
+def check_dependency(estimate, dependency):
+    """Error message for a new dependency, or None when it can be added.
+
+    dependency is a (predecessor_type, predecessor_id, successor_type,
+    successor_id, dependency_type, lag_days) tuple.
+    """
+    graph = ScheduleGraph(estimate, stored=True)
+    link = graph.dependency_link(*dependency)
+    if link is None:
+        return 'Predecessor and successor must belong to the estimate'
+    if dependency[:2] == dependency[2:4]:
+        return 'A node cannot depend on itself'
+    try:
+        graph.solve([link])
+    except CycleError:
+        return 'Dependency would create a cycle'
+    return None
+
+# Incremental rescheduling
+#
+# Once an estimate has a stored schedule, an edit only needs the nodes
+# downstream of it: each affected node takes the latest of its predecessors'
+# dates, and its successors are queued only when its own dates move. Nodes
+# are processed roughly in schedule order through a heap keyed on their
+# early start, so most are visited once. The graph is read from the stored
+# schedule one activity (its tasks and dependencies) or phase (its
+# activities) at a time, as propagation reaches it, so an edit that settles
+# inside its activity costs a handful of small queries. Late dates and
+# slack depend on the whole project and are left to estimate_schedule().
+
+def refresh_schedule(estimate):
+    """Recompute and store every early date, if the estimate has been scheduled."""
+    graph = ScheduleGraph(estimate)
+    if graph.scheduled:
+        early_start, early_finish, _, _, _ = graph.solve()
+        store_schedule(graph, early_start, early_finish)
+
+def clear_schedule(estimate_ids, connection=None):
+    """Drop the stored dates of many estimates (ids or a SELECT of ids).
+
+    Used after set-based edits; each estimate is scheduled again the next
+    time its schedule is requested.
+    """
+    connection = connection if connection is not None else db.session.connection()
+    phase_ids = select(Phase.id).where(Phase.project_estimate_id.in_(estimate_ids))
+    activity_ids = select(Activity.id).where(Activity.phase_id.in_(phase_ids))
+    for model, condition in (
+        (Phase, Phase.id.in_(phase_ids)),
+        (Activity, Activity.id.in_(activity_ids)),
+        (Task, Task.activity_id.in_(activity_ids))
+    ):
+        connection.execute(update(model).where(condition).values(schedule_start=None, schedule_finish=None))
+
+class Unscheduled(Exception):
+    """Raised when part of the stored schedule is missing."""
+
+class StoredSchedule:
+    """Slice of an estimate's stored schedule graph, loaded on demand.
+
+    Nodes are ('task', id), ('activity_start', id), ('activity_finish', id),
+    ('phase_start', id) and ('phase_finish', id). dates maps loaded nodes to
+    their current [early start, early finish]. Once more than
+    LAZY_ACTIVITY_LIMIT activities are needed the rest of the estimate is
+    read in three set-based queries instead.
+    """
+
+    LAZY_ACTIVITY_LIMIT = 32
+
+    def __init__(self, estimate):
+        self.estimate = estimate
+        self.connection = db.session.connection()
+        self.dates = {}
+        self.stored = {}
+        self.durations = {}
+        self.predecessors = {}  # node -> [(predecessor, lag, start_to_start)]
+        self.successors = {}    # node -> [successor]
+        self.task_activity = {}
+        self.activity_phase = {}
+        self.loaded_phases = set()
+        self.loaded_activities = set()
+        self.loaded_dependencies = set()
+        self.complete = False
+
+        phases = self.connection.execute(
+            select(Phase.id, Phase.schedule_start, Phase.schedule_finish)
+            .where(Phase.project_estimate_id == estimate.id)
+            .order_by(Phase.order_index, Phase.id)
+        ).all()
+        self.last_phase = phases[-1][0] if phases else None
+        previous = None
+        for phase_id, start, finish in phases:
+            self._add_dates(('phase_start', phase_id), start, start)
+            self._add_dates(('phase_finish', phase_id), finish, finish)
+            if previous is not None:
+                self._link(('phase_finish', previous), ('phase_start', phase_id))
+            previous = phase_id
+
+    def _add_dates(self, node, start, finish):
+        if start is None or finish is None:
+            raise Unscheduled(node)
+        if node not in self.dates:
+            self.dates[node] = [start, finish]
+            self.stored[node] = (start, finish)
+            self.durations[node] = finish - start
+
+    def _link(self, predecessor, successor, lag=0, start_to_start=False):
+        self.predecessors.setdefault(successor, []).append((predecessor, lag, start_to_start))
+        self.successors.setdefault(predecessor, []).append(successor)
+
+    def _add_activities(self, rows):
+        for activity_id, phase_id, start, finish in rows:
+            self.activity_phase[activity_id] = phase_id
+            self._add_dates(('activity_start', activity_id), start, start)
+            self._add_dates(('activity_finish', activity_id), finish, finish)
+
+    def _add_tasks(self, rows):
+        for task_id, activity_id, start, finish in rows:
+            self.task_activity[task_id] = activity_id
+            self._add_dates(('task', task_id), start, finish)
+
+    def _attach_phase(self, phase_id, activity_ids):
+        self.loaded_phases.add(phase_id)
+        for activity_id in activity_ids:
+            self._link(('phase_start', phase_id), ('activity_start', activity_id))
+            self._link(('activity_finish', activity_id), ('phase_finish', phase_id))
+
+    def _attach_activity(self, activity_id, task_ids):
+        self.loaded_activities.add(activity_id)
+        start, finish = ('activity_start', activity_id), ('activity_finish', activity_id)
+        tasks = [('task', task_id) for task_id in task_ids]
+        self.successors.setdefault(start, []).extend(tasks)
+        self.predecessors.setdefault(finish, []).extend((task, 0, False) for task in tasks)
+        for task in tasks:
+            self.predecessors.setdefault(task, []).append((start, 0, False))
+            self.successors.setdefault(task, []).append(finish)
+
+    def _attach_dependencies(self, rows):
+        for dependency_id, predecessor_type, predecessor_id, successor_type, successor_id, \
+                dependency_type, lag_days in rows:
+            if dependency_id in self.loaded_dependencies:
+                continue
+            self.loaded_dependencies.add(dependency_id)
+            start_to_start = dependency_type == 'SS'
+            if predecessor_type == 'task':
+                predecessor = ('task', predecessor_id)
+            else:
+                predecessor = ('activity_start' if start_to_start else 'activity_finish', predecessor_id)
+            successor = ('task', successor_id) if successor_type == 'task' else ('activity_start', successor_id)
+            if predecessor in self.dates and successor in self.dates:
+                self._link(predecessor, successor, lag_days or 0, start_to_start)
+
+    def _activity_rows(self, *conditions):
+        return self.connection.execute(
+            select(Activity.id, Activity.phase_id, Activity.schedule_start, Activity.schedule_finish)
+            .where(*conditions)
+        ).all()
+
+    def _task_rows(self, *conditions):
+        return self.connection.execute(
+            select(Task.id, Task.activity_id, Task.schedule_start, Task.schedule_finish).where(*conditions)
+        ).all()
+
+    def _dependency_rows(self, *conditions):
+        return self.connection.execute(
+            select(
+                Dependency.id, Dependency.predecessor_type, Dependency.predecessor_id,
+                Dependency.successor_type, Dependency.successor_id, Dependency.dependency_type, Dependency.lag_days
+            ).where(*conditions)
+        ).all()
+
+    def load_phase(self, phase_id):
+        """Activities of a phase, linked between its milestones."""
+        if self.complete or phase_id in self.loaded_phases:
+            return
+        rows = self._activity_rows(Activity.phase_id == phase_id)
+        self._add_activities(rows)
+        self._attach_phase(phase_id, [row[0] for row in rows])
+
+    def load_activity(self, activity_id):
+        """Tasks of an activity and every dependency touching it or its tasks."""
+        if self.complete or activity_id in self.loaded_activities:
+            return
+        if len(self.loaded_activities) >= self.LAZY_ACTIVITY_LIMIT:
+            self.load_all()
+            return
+        if activity_id not in self.activity_phase:
+            self._add_activities(self._activity_rows(Activity.id == activity_id))
+        self.load_phase(self.activity_phase[activity_id])
+
+        rows = self._task_rows(Task.activity_id == activity_id)
+        self._add_tasks(rows)
+        task_ids = [row[0] for row in rows]
+        self._attach_activity(activity_id, task_ids)
+
+        # Each branch repeats the estimate so it can use its own index (see Dependency)
+        in_estimate = Dependency.project_estimate_id == self.estimate.id
+        dependencies = self._dependency_rows(or_(
+            in_estimate & (Dependency.predecessor_type == 'activity') & (Dependency.predecessor_id == activity_id),
+            in_estimate & (Dependency.successor_type == 'activity') & (Dependency.successor_id == activity_id),
+            in_estimate & (Dependency.predecessor_type == 'task') & Dependency.predecessor_id.in_(task_ids),
+            in_estimate & (Dependency.successor_type == 'task') & Dependency.successor_id.in_(task_ids)
+        ))
+        # The far end of a dependency may not be loaded yet; its dates are needed either way
+        far_tasks, far_activities = set(), set()
+        for _, predecessor_type, predecessor_id, successor_type, successor_id, _, _ in dependencies:
+            for node_type, node_id in ((predecessor_type, predecessor_id), (successor_type, successor_id)):
+                if node_type == 'task' and node_id not in self.task_activity:
+                    far_tasks.add(node_id)
+                elif node_type == 'activity' and node_id not in self.activity_phase:
+                    far_activities.add(node_id)
+        if far_tasks:
+            self._add_tasks(self._task_rows(Task.id.in_(far_tasks)))
+        if far_activities:
+            self._add_activities(self._activity_rows(Activity.id.in_(far_activities)))
+        self._attach_dependencies(dependencies)
+
+    def load_all(self):
+        """Load the rest of the estimate: every activity, task and dependency."""
+        in_estimate = Phase.project_estimate_id == self.estimate.id
+        activities = self._activity_rows(Activity.phase_id == Phase.id, in_estimate)
+        self._add_activities(activities)
+        by_phase = {}
+        for activity_id, phase_id, _, _ in activities:
+            by_phase.setdefault(phase_id, []).append(activity_id)
+        for phase_id, activity_ids in by_phase.items():
+            if phase_id not in self.loaded_phases:
+                self._attach_phase(phase_id, activity_ids)
+
+        tasks = self._task_rows(Task.activity_id == Activity.id, Activity.phase_id == Phase.id, in_estimate)
+        self._add_tasks(tasks)
+        by_activity = {}
+        for task_id, activity_id, _, _ in tasks:
+            by_activity.setdefault(activity_id, []).append(task_id)
+        for activity_id, task_ids in by_activity.items():
+            if activity_id not in self.loaded_activities:
+                self._attach_activity(activity_id, task_ids)
+
+        self._attach_dependencies(self._dependency_rows(Dependency.project_estimate_id == self.estimate.id))
+        self.complete = True
+
+    def load(self, node):
+        """Load everything linked to or from a node."""
+        if self.complete:
+            return
+        kind, node_id = node
+        if kind == 'task':
+            if node_id not in self.task_activity:
+                self._add_tasks(self._task_rows(Task.id == node_id))
+            self.load_activity(self.task_activity[node_id])
+        elif kind in ('activity_start', 'activity_finish'):
+            self.load_activity(node_id)
+        else:
+            self.load_phase(node_id)
+
+def reschedule(estimate, task_ids=(), successors=()):
+    """Propagate edits through the stored schedule of an estimate.
+
+    task_ids are tasks whose hours or assignments changed; successors are
+    the (type, id) successor ends of dependencies added or removed. Returns
+    the project duration and the items whose dates changed, or None when
+    the estimate has not been scheduled yet.
+    """
+    try:
+        graph = StoredSchedule(estimate)
+        seeds = [('task', task_id) for task_id in task_ids] + [
+            ('task' if node_type == 'task' else 'activity_start', node_id) for node_type, node_id in successors
+        ]
+        for node in seeds:
+            graph.load(node)
+    except Unscheduled:
+        return None
+    except KeyError:
+        # A task or activity that does not belong to the estimate
+        return None
+    if task_ids:
+        contingency = 1 + (estimate.contingency_percentage or 0) / 100
+        staffing = task_staffing(Task.id.in_(task_ids))
+        rows = graph.connection.execute(
+            select(
+                Task.id, func.coalesce(Task.estimated_hours, 0.0),
+                func.coalesce(staffing.c.people, 0), func.coalesce(staffing.c.max_hours, 0.0)
+            ).outerjoin(staffing, staffing.c.task_id == Task.id).where(Task.id.in_(task_ids))
+        ).all()
+        days = task_durations([row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows],
+                              contingency).tolist()
+        for row, task_days in zip(rows, days):
+            graph.durations[('task', row[0])] = task_days
+
+    dates = graph.dates
+    queued = set(seeds)
+    queue = [(dates[node][0], node) for node in queued]
+    heapq.heapify(queue)
+    while queue:
+        _, node = heapq.heappop(queue)
+        queued.discard(node)
+        try:
+            graph.load(node)
+        except Unscheduled:
+            return None
+        start = 0
+        for predecessor, lag, start_to_start in graph.predecessors.get(node, ()):
+            candidate = dates[predecessor][0 if start_to_start else 1] + lag
+            if candidate > start:
+                start = candidate
+        finish = start + graph.durations[node]
+        if dates[node] == [start, finish]:
+            continue
+        dates[node] = [start, finish]
+        for successor in graph.successors.get(node, ()):
+            if successor not in queued:
+                queued.add(successor)
+                heapq.heappush(queue, (dates[successor][0], successor))
+    return _store_changes(graph)
+
+def _store_changes(graph):
+    """Write the moved nodes of a StoredSchedule; returns the reschedule() result."""
+    dates = graph.dates
+    items = {}
+    for node, stored in graph.stored.items():
+        if tuple(dates[node]) != stored:
+            kind, node_id = node
+            items.setdefault((kind.split('_')[0], node_id), None)
+
+    rows = {Phase: [], Activity: [], Task: []}
+    changed = []
+    calendar = Calendar(schedule_start(graph.estimate), estimate_holidays(graph.estimate.id))
+    iso_dates = {}
+
+    def iso_date(day):
+        if day not in iso_dates:
+            iso_dates[day] = calendar.date(day).isoformat()
+        return iso_dates[day]
+
+    for (kind, node_id) in items:
+        if kind == 'task':
+            model, start, finish = Task, dates[('task', node_id)][0], dates[('task', node_id)][1]
+        else:
+            model = Phase if kind == 'phase' else Activity
+            start, finish = dates[(f'{kind}_start', node_id)][0], dates[(f'{kind}_finish', node_id)][0]
+        rows[model].append({'node_id': node_id, 'start': start, 'finish': finish})
+        changed.append({
+            'type': kind,
+            'id': node_id,
+            'early_start': start,
+            'early_finish': finish,
+            'start_date': iso_date(start),
+            'finish_date': iso_date(max(finish - 1, start))
+        })
+    _write_dates(graph.connection, rows)
+
+    duration = dates[('phase_finish', graph.last_phase)][0] if graph.last_phase is not None else 0
+    return {
+        'duration_days': duration,
+        'finish_date': iso_date(max(duration - 1, 0)),
+        'changed': changed
+    }
@@ -0,0 +1,200 @@
+import gzip
+import json
+import threading
+from collections import OrderedDict
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from src.config import (
+    JSON_ENCODER, COMPRESSION_MIN_SIZE, COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY, PAYLOAD_CACHE_BYTES
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# JSON encoding and response compression
+#
+# Every JSON body goes through one encoder, picked by JSON_ENCODER: orjson
+# when it is installed, else the standard library. Both write compact UTF-8
+# with sorted keys and fall back to Flask's conversions (dates, decimals,
+# dataclasses) for types they do not know.
+#
+# Responses of at least COMPRESSION_MIN_SIZE bytes are compressed with the
+# best encoding the client accepts: brotli when the module is installed,
+# else gzip. Streamed responses are left alone. Payloads that never change
+# under a key (a version snapshot, an estimate at one revision) are cached
+# per encoding, so repeated requests skip both encoding and compression.
+#
+# ETags stay strong: each content coding gets its own tag ("<etag>-gzip"),
+# and a conditional request naming the tag in any coding is answered 304.
+
+def _stdlib_dumps(obj, sort_keys=True):
+    return json.dumps(
+        obj, default=DefaultJSONProvider.default, sort_keys=sort_keys, separators=(',', ':')
+    ).encode()
+
+def _orjson_dumps(obj, sort_keys=True):
+    # Dates are passed through so they render as Flask renders them
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SERIALIZE_NUMPY
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    return orjson.dumps(obj, default=DefaultJSONProvider.default, option=option)
+
+JSON_ENCODERS = {'json': _stdlib_dumps}
+if orjson is not None:
+    JSON_ENCODERS['orjson'] = _orjson_dumps
+
+def json_encoder(name='auto'):
+    """The dumps(obj, sort_keys=True) -> bytes function registered as name."""
+    if name == 'auto':
+        name = 'orjson' if 'orjson' in JSON_ENCODERS else 'json'
+    if name not in JSON_ENCODERS:
+        raise ValueError(f'Unknown or unavailable JSON encoder: {name}')
+    return JSON_ENCODERS[name]
+
+dumps = json_encoder(JSON_ENCODER)
+
+class EstimatorJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with the configured encoder.
+
+    Indented output (debug mode) keeps the standard library path.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, self.sort_keys).decode()
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, self.sort_keys), mimetype=self.mimetype)
+
+COMPRESSIBLE_MIMETYPES = {'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain'}
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding(accept_encodings):
+    """Best content coding the client accepts (werkzeug Accept), or None."""
+    return accept_encodings.best_match(available_encodings())
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def coded_etag(etag, encoding):
+    """Strong ETag of the representation of etag sent with encoding."""
+    return f'{etag}-{encoding}' if encoding else etag
+
+def not_modified(if_none_match, etag):
+    """304 response when If-None-Match names etag in any content coding, else None."""
+    for tag in (etag, *(coded_etag(etag, encoding) for encoding in available_encodings())):
+        if if_none_match.contains_weak(tag):
+            response = Response(status=304)
+            response.set_etag(tag)
+            response.vary.add('Accept-Encoding')
+            return response
+    return None
+
+def _encode_response(response, body, encoding):
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes are a different representation, so they get their own tag
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(coded_etag(etag, encoding), weak=weak)
+
+def compress_response(response, accept_encodings):
+    """Compress a buffered, compressible response in place when it is worth it."""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_SIZE:
+        return response
+    encoding = negotiate_encoding(accept_encodings)
+    if encoding:
+        _encode_response(response, compress(body, encoding), encoding)
+    return response
+
+class PayloadCache:
+    """LRU of (body, content coding) entries keyed by (key, encoding), bounded in bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        if len(entry[0]) > self.max_bytes // 4:
+            return
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous[0])
+            self.entries[key] = entry
+            self.size += len(entry[0])
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted[0])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+payload_cache = PayloadCache(PAYLOAD_CACHE_BYTES)
+
+def payload_response(key, build, accept_encodings, etag=None, mimetype='application/json', current=None):
+    """Response for a payload that never changes under key.
+
+    build() returns the payload bytes and is only called on a miss; the
+    bytes are cached as sent for the encoding the client negotiated. The
+    response carries coded_etag(etag, encoding); pair it with not_modified().
+
+    When the key was read before build() and a write can move it meanwhile,
+    current() re-reads it after the build and returns False if it moved.
+    The bytes may then belong to a later state, so they are sent without
+    an ETag and not cached.
+    """
+    accepted = negotiate_encoding(accept_encodings)
+    entry = payload_cache.get((key, accepted))
+    if entry is None:
+        body = build()
+        if accepted and len(body) >= COMPRESSION_MIN_SIZE:
+            entry = (compress(body, accepted), accepted)
+        else:
+            entry = (body, None)
+        if current is None or current():
+            payload_cache.put((key, accepted), entry)
+        else:
+            etag = None
+
+    body, encoding = entry
+    response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    if etag:
+        response.set_etag(coded_etag(etag, encoding))
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
@@ -0,0 +1,169 @@
+import numpy as np
+from src.models.estimator import db, Phase, Activity, Task
+from src.services.kpis import EstimateFrame
+
+# Monte Carlo contingency simulation
+#
+# Every task's hours follow a triangular or PERT distribution between a low
+# and a high estimate around its likely hours. Points missing on the task
+# come from its complexity as multiples of the likely hours, which default
+# to estimated_hours. Cost and revenue scale with the task's sampled hours
+# relative to its estimate, so the base point matches the KPIs before
+# contingency.
+#
+# Each distribution is discretized into QUANTILES equally likely quantiles,
+# so a draw is one random byte and a table lookup. Tasks are sampled in
+# blocks small enough for their tables to stay in cache, and iterations in
+# chunks, so memory is bounded by the per-iteration totals. The run holds
+# the request thread, so iterations times tasks is capped.
+
+SIMULATION_DISTRIBUTIONS = ('pert', 'triangular')
+SIMULATION_MAX_ITERATIONS = 100000
+SIMULATION_MAX_DRAWS = 200000000  # iterations x uncertain tasks, about a second on one core
+SIMULATION_PERCENTILES = (50, 80, 95)
+
+# (low, high) multiples of the likely hours per complexity; unknown means Medium
+COMPLEXITY_RANGES = {
+    'Low': (0.9, 1.25),
+    'Medium': (0.8, 1.5),
+    'High': (0.7, 2.0)
+}
+
+QUANTILES = 256
+PERT_GRID = 4097
+TASK_BLOCK = 256
+ITERATION_CHUNK = 4096
+
+def standard_quantiles(modes, distribution='pert'):
+    """QUANTILES midpoint quantiles of a distribution on [0, 1] for each mode.
+
+    PERT is Beta(1 + 4 * mode, 5 - 4 * mode); its CDF has no closed form, so
+    it is integrated on a grid and inverted by interpolation.
+    """
+    modes = np.asarray(modes, dtype=np.float64)[:, None]
+    p = (np.arange(QUANTILES) + 0.5) / QUANTILES
+    if distribution == 'triangular':
+        return np.where(p < modes, np.sqrt(p * modes), 1 - np.sqrt((1 - p) * (1 - modes)))
+
+    grid = np.linspace(0.0, 1.0, PERT_GRID)
+    pdf = grid ** (4 * modes) * (1 - grid) ** (4 * (1 - modes))
+    cdf = np.concatenate((np.zeros((len(modes), 1)), np.cumsum(pdf[:, 1:] + pdf[:, :-1], axis=1)), axis=1)
+    cdf /= cdf[:, -1:]
+    return np.array([np.interp(p, row, grid) for row in cdf])
+
+def three_point_hours(estimated, complexity, low, likely, high):
+    """(low, likely, high) hour arrays, filling unset points from complexity.
+
+    Points are clamped so that low <= likely <= high.
+    """
+    estimated = np.array([value or 0.0 for value in estimated], dtype=np.float64)
+    likely = np.array([e if value is None else value for value, e in zip(likely, estimated)], dtype=np.float64)
+    ranges = np.array([COMPLEXITY_RANGES.get(value, COMPLEXITY_RANGES['Medium']) for value in complexity],
+                      dtype=np.float64).reshape(-1, 2)
+    low = np.array([np.nan if value is None else value for value in low], dtype=np.float64)
+    high = np.array([np.nan if value is None else value for value in high], dtype=np.float64)
+    low = np.minimum(np.where(np.isnan(low), likely * ranges[:, 0], low), likely)
+    high = np.maximum(np.where(np.isnan(high), likely * ranges[:, 1], high), likely)
+    return low, likely, high
+
+def sample_totals(low, likely, high, weights, iterations, rng, distribution='pert'):
+    """iterations x metrics matrix of sampled hours @ weights.
+
+    weights is tasks x metrics: each metric adds a task's sampled hours
+    times its weight. Raises ValueError when the run would take more than
+    SIMULATION_MAX_DRAWS draws.
+    """
+    width = high - low
+    fixed = width <= 0
+    uncertain = int((~fixed).sum())
+    if iterations * uncertain > SIMULATION_MAX_DRAWS:
+        raise ValueError(f'At most {SIMULATION_MAX_DRAWS // uncertain} iterations can be run '
+                         f'for {uncertain} tasks with uncertain hours')
+    totals = np.zeros((iterations, weights.shape[1]))
+    totals += likely[fixed] @ weights[fixed]
+
+    # Tasks of similar shape share a standard quantile table
+    varying = np.flatnonzero(~fixed)
+    modes = np.round((likely[varying] - low[varying]) / width[varying], 3)
+    shapes, shape_index = np.unique(modes, return_inverse=True)
+    standard = standard_quantiles(shapes, distribution)
+
+    for first in range(0, len(varying), TASK_BLOCK):
+        tasks = varying[first:first + TASK_BLOCK]
+        table = (low[tasks, None] + width[tasks, None] * standard[shape_index[first:first + TASK_BLOCK]])
+        table = table.astype(np.float32).ravel()
+        offsets = np.arange(len(tasks)) * QUANTILES
+        block_weights = weights[tasks].astype(np.float32)
+        for start in range(0, iterations, ITERATION_CHUNK):
+            stop = min(start + ITERATION_CHUNK, iterations)
+            draws = rng.integers(0, QUANTILES, size=(stop - start, len(tasks)), dtype=np.uint8).astype(np.intp)
+            draws += offsets
+            totals[start:stop] += np.take(table, draws) @ block_weights
+    return totals
+
+def simulate_estimate(estimate, iterations=10000, seed=None, distribution='pert', confidence=80):
+    """P50/P80/P95 hours, cost, revenue and margin, and a suggested contingency.
+
+    Figures exclude contingency. Hours, cost and revenue at Pn are the
+    values not exceeded in n% of iterations; margin at Pn is the margin
+    reached in at least n% of them. The suggested contingency covers the
+    hours at the confidence percentile. The seed is returned so a run can be
+    repeated.
+    """
+    frame = EstimateFrame(estimate)
+    rows = db.session.query(
+        Task.complexity, Task.low_hours, Task.likely_hours, Task.high_hours
+    ).join(Activity, Task.activity_id == Activity.id) \
+     .join(Phase, Activity.phase_id == Phase.id) \
+     .filter(Phase.project_estimate_id == estimate.id) \
+     .order_by(Task.id).all()
+    low, likely, high = three_point_hours(
+        frame.task_hours, [r[0] for r in rows], [r[1] for r in rows], [r[2] for r in rows], [r[3] for r in rows]
+    )
+
+    task_count = len(frame.task_ids)
+    cost = np.bincount(frame.assignment_task, weights=frame.assignment_hours * frame.assignment_cost_rate,
+                       minlength=task_count)
+    revenue = np.bincount(frame.assignment_task, weights=frame.assignment_hours * frame.assignment_bill_rate,
+                          minlength=task_count)
+    # Cost and revenue per estimated hour; tasks without an estimate keep theirs fixed
+    estimated = frame.task_hours
+    scaled = estimated > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.column_stack((
+            np.ones(task_count),
+            np.where(scaled, cost / estimated, 0.0),
+            np.where(scaled, revenue / estimated, 0.0)
+        ))
+
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2 ** 32)
+    totals = sample_totals(low, likely, high, weights, iterations, np.random.default_rng(seed), distribution)
+    totals[:, 1] += cost[~scaled].sum()
+    totals[:, 2] += revenue[~scaled].sum()
+    margins = totals[:, 2] - totals[:, 1]
+
+    def figures(hours, cost, revenue, margin):
+        return {'hours': float(hours), 'cost': float(cost), 'revenue': float(revenue), 'margin': float(margin)}
+
+    percentiles = {}
+    for percentile in SIMULATION_PERCENTILES:
+        hours, cost_p, revenue_p = np.percentile(totals, percentile, axis=0)
+        percentiles[f'p{percentile}'] = figures(hours, cost_p, revenue_p, np.percentile(margins, 100 - percentile))
+
+    base_hours = float(estimated.sum())
+    target = float(np.percentile(totals[:, 0], confidence))
+    contingency = estimate.contingency_percentage or 0
+    return {
+        'estimate_id': estimate.id,
+        'iterations': iterations,
+        'seed': seed,
+        'distribution': distribution,
+        'confidence': confidence,
+        'base': figures(base_hours, cost.sum(), revenue.sum(), revenue.sum() - cost.sum()),
+        'mean': figures(*totals.mean(axis=0), margins.mean()),
+        'percentiles': percentiles,
+        'contingency_percentage': contingency,
+        'contingency_confidence': float(np.mean(totals[:, 0] <= base_hours * (1 + contingency / 100) + 1e-9)),
+        'suggested_contingency_percentage': round(max(target / base_hours - 1, 0) * 100, 1) if base_hours else 0.0
+    }
@@ -0,0 +1,186 @@
+import json
+import zlib
+from sqlalchemy.exc import IntegrityError
+from src.models.estimator import db, EstimateVersion
+from src.config import SNAPSHOT_KEYFRAME_INTERVAL
+
+# Version snapshot storage
+#
+# Snapshots are stored flattened: one {id: fields} map per level (phases,
+# activities, tasks, assignments) plus the estimate's own fields, each node
+# keeping its parent foreign key instead of a nested child list. Every Nth
+# version is a zlib-compressed full keyframe; the versions in between store a
+# compressed structural delta against the previous version, so rebuilding
+# any version reads one keyframe and at most N - 1 deltas.
+
+CHILD_LEVELS = (
+    ('phases', 'activities', 'project_estimate_id'),
+    ('activities', 'tasks', 'phase_id'),
+    ('tasks', 'assignments', 'activity_id'),
+    ('assignments', None, 'task_id'),
+)
+
+FORMAT_LEGACY = 'json'
+FORMAT_FULL = 'full'
+FORMAT_DELTA = 'delta'
+
+VERSION_SAVE_ATTEMPTS = 3
+
+def flatten_snapshot(tree):
+    """Nested estimate dict -> {'estimate': fields, level: {str(id): fields}}."""
+    flat = {'estimate': {k: v for k, v in tree.items() if k != 'phases'}}
+    for level, _, _ in CHILD_LEVELS:
+        flat[level] = {}
+    parents = [tree]
+    for level, child_key, _ in CHILD_LEVELS:
+        children = []
+        for parent in parents:
+            for node in parent.get(level, []):
+                flat[level][str(node['id'])] = {k: v for k, v in node.items() if k != child_key}
+                children.append(node)
+        parents = children
+    return flat
+
+def unflatten_snapshot(flat):
+    """Inverse of flatten_snapshot; children are ordered by id."""
+    tree = dict(flat['estimate'])
+    nodes = {'estimate': {tree.get('id'): tree}}
+    parent_level = 'estimate'
+    for level, child_key, parent_key in CHILD_LEVELS:
+        for parent in nodes[parent_level].values():
+            parent[level] = []
+        nodes[level] = {}
+        for node_id in sorted(flat[level], key=int):
+            node = dict(flat[level][node_id])
+            if child_key:
+                node[child_key] = []
+            parent = nodes[parent_level].get(node[parent_key])
+            if parent is not None:
+                parent[level].append(node)
+            nodes[level][node['id']] = node
+        parent_level = level
+    return tree
+
+def diff_snapshots(old, new):
+    """Structural delta between two flattened snapshots.
+
+    Nodes are matched by id through dict lookups, so the cost is linear in
+    the number of nodes. Added nodes are stored whole, changed nodes only
+    carry the fields that differ.
+    """
+    delta = {'estimate': {k: v for k, v in new['estimate'].items() if old['estimate'].get(k) != v}}
+    for level, _, _ in CHILD_LEVELS:
+        old_nodes, new_nodes = old[level], new[level]
+        added = {}
+        changed = {}
+        for node_id, node in new_nodes.items():
+            previous = old_nodes.get(node_id)
+            if previous is None:
+                added[node_id] = node
+            elif previous != node:
+                changed[node_id] = {k: v for k, v in node.items() if previous.get(k) != v}
+        removed = [node_id for node_id in old_nodes if node_id not in new_nodes]
+        delta[level] = {'add': added, 'change': changed, 'remove': removed}
+    return delta
+
+def apply_delta(flat, delta):
+    """Apply a diff_snapshots() delta to a flattened snapshot in place."""
+    flat['estimate'].update(delta['estimate'])
+    for level, _, _ in CHILD_LEVELS:
+        nodes = flat[level]
+        level_delta = delta[level]
+        for node_id in level_delta['remove']:
+            nodes.pop(node_id, None)
+        for node_id, fields in level_delta['change'].items():
+            nodes[node_id].update(fields)
+        nodes.update(level_delta['add'])
+    return flat
+
+def encode(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode(), 6)
+
+def decode(blob):
+    return json.loads(zlib.decompress(blob))
+
+def _keyframe_payload(version):
+    if version.snapshot_format == FORMAT_LEGACY:
+        return flatten_snapshot(json.loads(version.snapshot_data))
+    return decode(version.snapshot_blob)
+
+def load_flat_snapshot(estimate_id, version_number):
+    """Rebuild the flattened snapshot of one version, or None if it does not exist.
+
+    Reads the nearest keyframe at or before the version and replays the
+    deltas after it, at most SNAPSHOT_KEYFRAME_INTERVAL - 1 of them.
+    """
+    keyframe_number = db.session.query(db.func.max(EstimateVersion.version_number)).filter(
+        EstimateVersion.project_estimate_id == estimate_id,
+        EstimateVersion.version_number <= version_number,
+        EstimateVersion.snapshot_format.in_((FORMAT_FULL, FORMAT_LEGACY))
+    ).scalar()
+    if keyframe_number is None:
+        return None
+    chain = EstimateVersion.query.filter(
+        EstimateVersion.project_estimate_id == estimate_id,
+        EstimateVersion.version_number >= keyframe_number,
+        EstimateVersion.version_number <= version_number
+    ).order_by(EstimateVersion.version_number).all()
+    if not chain or chain[-1].version_number != version_number:
+        return None
+
+    flat = _keyframe_payload(chain[0])
+    for version in chain[1:]:
+        apply_delta(flat, decode(version.snapshot_blob))
+    return flat
+
+def load_snapshot(version):
+    """Nested snapshot dict of an EstimateVersion."""
+    if version.snapshot_format == FORMAT_LEGACY:
+        return json.loads(version.snapshot_data)
+    return unflatten_snapshot(load_flat_snapshot(version.project_estimate_id, version.version_number))
+
+def build_version(estimate, tree, **fields):
+    """Create (but do not commit) the next EstimateVersion for an estimate.
+
+    Returns the version and the snapshot as it will read back, so callers
+    can respond without decoding the payload again.
+    """
+    last_number = db.session.query(db.func.max(EstimateVersion.version_number)).filter(
+        EstimateVersion.project_estimate_id == estimate.id
+    ).scalar()
+    next_number = (last_number + 1) if last_number else 1
+    flat = flatten_snapshot(tree)
+
+    version = EstimateVersion(project_estimate_id=estimate.id, version_number=next_number, **fields)
+    keyframe_number = db.session.query(db.func.max(EstimateVersion.version_number)).filter(
+        EstimateVersion.project_estimate_id == estimate.id,
+        EstimateVersion.snapshot_format.in_((FORMAT_FULL, FORMAT_LEGACY))
+    ).scalar()
+    if keyframe_number is None or next_number - keyframe_number >= SNAPSHOT_KEYFRAME_INTERVAL:
+        version.snapshot_format = FORMAT_FULL
+        version.snapshot_blob = encode(flat)
+    else:
+        previous = load_flat_snapshot(estimate.id, last_number)
+        version.snapshot_format = FORMAT_DELTA
+        version.snapshot_blob = encode(diff_snapshots(previous, flat))
+    version.snapshot_size = len(version.snapshot_blob)
+    return version, unflatten_snapshot(flat)
+
+def save_version(estimate, tree, **fields):
+    """Build the next EstimateVersion and commit it.
+
+    The version number is read as max + 1, so a concurrent save can take it
+    first; the unique (estimate, version_number) index then rejects the
+    commit, which is rolled back and retried on the new last version.
+    Returns what build_version() returns.
+    """
+    for attempt in range(VERSION_SAVE_ATTEMPTS):
+        version, snapshot = build_version(estimate, tree, **fields)
+        db.session.add(version)
+        try:
+            db.session.commit()
+            return version, snapshot
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == VERSION_SAVE_ATTEMPTS - 1:
+                raise
@@ -0,0 +1,214 @@
+import csv
+import io
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import select, func
+from src.config import HOURS_PER_WEEK
+from src.models.estimator import db, Phase, Activity, Task, Assignment
+from src.services.reference import reference_data
+from src.services.scheduler import ScheduleGraph, WORKING_DAYS_PER_WEEK
+
+class StaffingFrame:
+    """Assigned hours of one estimate as parallel NumPy arrays.
+
+    Each item carries the dense index of its role level and the (fractional)
+    start and end week its hours are spread over: the early start and finish
+    of its task in the critical path schedule, in working weeks of
+    WORKING_DAYS_PER_WEEK days. Hours include contingency.
+    """
+
+    def __init__(self, estimate):
+        self.estimate = estimate
+        contingency = 1 + (estimate.contingency_percentage or 0) / 100
+        graph = ScheduleGraph(estimate)
+        early_start, early_finish, _, _, _ = graph.solve()
+
+        rows = db.session.connection().execute(
+            select(Assignment.task_id, Assignment.role_level_id, func.sum(Assignment.hours))
+            .join(Task, Task.id == Assignment.task_id)
+            .join(Activity, Activity.id == Task.activity_id)
+            .join(Phase, Phase.id == Activity.phase_id)
+            .where(Phase.project_estimate_id == estimate.id, Assignment.role_level_id.isnot(None))
+            .group_by(Assignment.task_id, Assignment.role_level_id)
+        ).all()
+        nodes = np.array([graph.task_offset + graph.task_index[r[0]] for r in rows], dtype=np.int64)
+        roles = np.array([r[1] for r in rows], dtype=np.int64)
+        self.role_ids, self.assignment_role = np.unique(roles, return_inverse=True)
+        self.assignment_start = np.asarray(early_start, dtype=np.float64)[nodes] / WORKING_DAYS_PER_WEEK
+        self.assignment_end = np.asarray(early_finish, dtype=np.float64)[nodes] / WORKING_DAYS_PER_WEEK
+        self.assignment_hours = np.array([r[2] or 0.0 for r in rows], dtype=np.float64) * contingency
+
+def spread_hours(rows, starts, ends, hours, row_count, week_count=None):
+    """Dense rows x weeks matrix of hours, each item spread evenly over [start, end).
+
+    Weeks only partly covered by an item get a proportional share, and an
+    item that starts and ends within one week (including zero-length ones)
+    lands entirely in that week. Full weeks are written through a
+    difference array, so the cost is linear in items plus matrix cells.
+    week_count defaults to the last week any item reaches; a smaller value
+    crops the matrix.
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.maximum(np.asarray(ends, dtype=np.float64), starts)
+    hours = np.asarray(hours, dtype=np.float64)
+    rows = np.asarray(rows, dtype=np.int64)
+    needed = max(int(np.ceil(ends.max())), int(starts.max()) + 1) if len(starts) else 0
+    if week_count is None:
+        week_count = needed
+    width = max(needed, week_count) + 1
+    if row_count == 0 or week_count == 0:
+        return np.zeros((row_count, week_count))
+
+    first = np.floor(starts).astype(np.int64)
+    last = np.maximum(np.ceil(ends).astype(np.int64) - 1, first)
+    single = first == last
+    duration = np.where(single, 1.0, ends - starts)
+    rate = hours / duration
+
+    # Partial first and last weeks, or the whole item when it fits in one week
+    first_share = np.where(single, hours, rate * (first + 1 - starts))
+    last_share = np.where(single, 0.0, rate * (ends - last))
+    cells = np.bincount(rows * width + first, weights=first_share, minlength=row_count * width)
+    cells += np.bincount(rows * width + last, weights=last_share, minlength=row_count * width)
+
+    # Full weeks strictly between the first and the last: +rate at first + 1, -rate at last
+    full = last - first > 1
+    steps = np.bincount(rows[full] * width + first[full] + 1, weights=rate[full], minlength=row_count * width)
+    steps -= np.bincount(rows[full] * width + last[full], weights=rate[full], minlength=row_count * width)
+
+    matrix = cells.reshape(row_count, width) + np.cumsum(steps.reshape(row_count, width), axis=1)
+    return matrix[:, :week_count]
+
+STAFFING_CACHE_SIZE = 128
+HEATMAP_LEVELS = ('low', 'medium', 'high', 'overloaded')
+HEATMAP_MAX_WEEKS = 520  # Longest window past the schedule's own weeks
+
+_hours_cache = OrderedDict()
+_hours_cache_lock = threading.Lock()
+
+def staffing_hours(estimate):
+    """(role_ids, role x week hours matrix) of an estimate.
+
+    Memoized per estimate revision, which every change to the estimate,
+    its WBS, dependencies or holidays bumps. The arrays are shared and
+    must not be modified.
+    """
+    key = estimate.revision
+    with _hours_cache_lock:
+        cached = _hours_cache.get(estimate.id)
+        if cached is not None and cached[0] == key:
+            _hours_cache.move_to_end(estimate.id)
+            return cached[1]
+
+    frame = StaffingFrame(estimate)
+    hours = spread_hours(
+        frame.assignment_role, frame.assignment_start, frame.assignment_end,
+        frame.assignment_hours, len(frame.role_ids)
+    )
+    result = (frame.role_ids, hours)
+    with _hours_cache_lock:
+        _hours_cache[estimate.id] = (key, result)
+        _hours_cache.move_to_end(estimate.id)
+        while len(_hours_cache) > STAFFING_CACHE_SIZE:
+            _hours_cache.popitem(last=False)
+    return result
+
+def _role_names(role_ids):
+    names = reference_data().role_names if len(role_ids) else {}
+    return {role_id: names[role_id] for role_id in role_ids.tolist() if role_id in names}
+
+def estimate_staffing(estimate, capacity=1.0):
+    """Role x week FTE matrix with per-role totals and overloaded weeks.
+
+    A role is overloaded in a week when it needs more than capacity FTE.
+    """
+    role_ids, hours = staffing_hours(estimate)
+    fte = hours / HOURS_PER_WEEK
+    week_count = fte.shape[1]
+    names = _role_names(role_ids)
+
+    overloaded = fte > capacity + 1e-9
+    role_hours = hours.sum(axis=1)
+    peaks = fte.max(axis=1) if week_count else np.zeros(len(role_ids))
+    roles = []
+    for index, role_id in enumerate(role_ids.tolist()):
+        name, level = names.get(role_id, (None, None))
+        roles.append({
+            'role_level_id': role_id,
+            'name': name,
+            'level': level,
+            'total_hours': float(role_hours[index]),
+            'peak_fte': float(peaks[index]),
+            'average_fte': float(role_hours[index] / HOURS_PER_WEEK / week_count) if week_count else 0.0,
+            'overloaded_weeks': np.flatnonzero(overloaded[index]).tolist()
+        })
+
+    return {
+        'estimate_id': estimate.id,
+        'hours_per_week': HOURS_PER_WEEK,
+        'capacity_fte': capacity,
+        'weeks': week_count,
+        'roles': roles,
+        'fte': np.round(fte, 3).tolist(),
+        'total_fte': np.round(fte.sum(axis=0), 3).tolist(),
+        'overloaded_roles': int(overloaded.any(axis=1).sum())
+    }
+
+def staffing_heatmap(estimate, group='role_level', start_week=0, end_week=None, thresholds=(0.5, 1.0, 1.5)):
+    """Grouped FTE per week over [start_week, end_week) with a level per cell.
+
+    group is 'role' (RoleLevel.name, levels summed) or 'role_level' (name
+    and level). Cell levels index HEATMAP_LEVELS: at most thresholds[0] FTE
+    is low, above thresholds[-1] is overloaded. Weeks are the working weeks
+    of the task schedule; weeks past its end are zero. Raises ValueError for
+    a window longer than both the schedule and HEATMAP_MAX_WEEKS.
+    """
+    role_ids, hours = staffing_hours(estimate)
+    names = _role_names(role_ids)
+    labels = []
+    for role_id in role_ids.tolist():
+        name, level = names.get(role_id, (str(role_id), ''))
+        labels.append(name if group == 'role' else f'{name} ({level})')
+    rows, row_index = np.unique(np.array(labels, dtype=object), return_inverse=True) \
+        if labels else (np.array([], dtype=object), np.array([], dtype=np.int64))
+
+    week_count = hours.shape[1]
+    end_week = week_count if end_week is None else end_week
+    if end_week - start_week > max(week_count, HEATMAP_MAX_WEEKS):
+        raise ValueError(f'The week range may span at most {max(week_count, HEATMAP_MAX_WEEKS)} weeks')
+    window = np.zeros((len(role_ids), max(end_week - start_week, 0)))
+    available = hours[:, start_week:min(end_week, week_count)]
+    window[:, :available.shape[1]] = available
+
+    grouped = np.zeros((len(rows), window.shape[1]))
+    np.add.at(grouped, row_index, window)
+    fte = grouped / HOURS_PER_WEEK
+    levels = np.searchsorted(np.asarray(thresholds, dtype=np.float64), fte - 1e-9, side='left')
+
+    return {
+        'estimate_id': estimate.id,
+        'group': group,
+        'start_week': start_week,
+        'end_week': end_week,
+        'total_weeks': week_count,
+        'thresholds': list(thresholds),
+        'levels': list(HEATMAP_LEVELS),
+        'rows': rows.tolist(),
+        'weeks': list(range(start_week, start_week + window.shape[1])),
+        'fte': np.round(fte, 3).tolist(),
+        'status': levels.tolist(),
+        'peak_fte': np.round(fte.max(axis=1), 3).tolist() if fte.shape[1] else [0.0] * len(rows)
+    }
+
+def heatmap_csv(heatmap):
+    """Yield a heatmap as CSV lines: one row per group, one column per week."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['Role'] + [f'Week {week + 1}' for week in heatmap['weeks']])
+    for label, values in zip(heatmap['rows'], heatmap['fte']):
+        writer.writerow([label] + [f'{value:.2f}' for value in values])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,118 @@
+from functools import lru_cache
+from src.services.snapshots import load_flat_snapshot, CHILD_LEVELS
+
+# Version comparison
+#
+# Both versions are rebuilt in their flattened form, so nodes are matched by
+# id with dict lookups and KPIs are rolled up in one pass per level: the
+# whole diff is linear in the number of nodes. Versions are immutable once
+# created, so results are memoized per (estimate, from, to).
+
+KPI_KEYS = ('hours', 'cost', 'revenue')
+SKIPPED_FIELDS = {'role_level'}
+
+def snapshot_kpis(flat):
+    """{level: {id: {'hours', 'cost', 'revenue'}}} for a flattened snapshot.
+
+    Cost and revenue use the rates captured in the snapshot: assignment
+    override, then the estimate's rate overrides, then the embedded role
+    level defaults. Contingency is applied as in the live KPI engine.
+    """
+    estimate = flat['estimate']
+    contingency = 1 + (estimate.get('contingency_percentage') or 0) / 100
+    overrides = {o['role_level_id']: o for o in estimate.get('rate_overrides') or []}
+
+    kpis = {level: {} for level, _, _ in CHILD_LEVELS}
+    tasks = kpis['tasks']
+    for task_id, task in flat['tasks'].items():
+        tasks[task_id] = {'hours': (task.get('estimated_hours') or 0.0) * contingency, 'cost': 0.0, 'revenue': 0.0}
+
+    for assignment_id, assignment in flat['assignments'].items():
+        role = assignment.get('role_level') or {}
+        override = overrides.get(assignment['role_level_id'], {})
+        bill_rate = assignment.get('bill_rate_override')
+        if bill_rate is None:
+            bill_rate = override.get('bill_rate', role.get('default_bill_rate') or 0.0)
+        cost_rate = assignment.get('cost_rate_override')
+        if cost_rate is None:
+            cost_rate = override.get('cost_rate', role.get('default_cost_rate') or 0.0)
+        hours = (assignment.get('hours') or 0.0) * contingency
+        kpis['assignments'][assignment_id] = {'hours': hours, 'cost': hours * cost_rate, 'revenue': hours * bill_rate}
+        task = tasks.get(str(assignment['task_id']))
+        if task is not None:
+            task['cost'] += hours * cost_rate
+            task['revenue'] += hours * bill_rate
+
+    # Roll tasks up to activities and activities up to phases
+    for parent_level, level, parent_key in (('activities', 'tasks', 'activity_id'), ('phases', 'activities', 'phase_id')):
+        parents = kpis[parent_level]
+        for node_id in flat[parent_level]:
+            parents[node_id] = {key: 0.0 for key in KPI_KEYS}
+        for node_id, node in flat[level].items():
+            parent = parents.get(str(node[parent_key]))
+            if parent is not None:
+                for key in KPI_KEYS:
+                    parent[key] += kpis[level][node_id][key]
+
+    totals = {key: sum(phase[key] for phase in kpis['phases'].values()) for key in KPI_KEYS}
+    return kpis, totals
+
+def _kpi_delta(old, new):
+    zero = dict.fromkeys(KPI_KEYS, 0.0)
+    old = old or zero
+    new = new or zero
+    return {key: new[key] - old[key] for key in KPI_KEYS}
+
+def _field_changes(old, new):
+    return {
+        key: {'from': old.get(key), 'to': value}
+        for key, value in new.items()
+        if key not in SKIPPED_FIELDS and old.get(key) != value
+    }
+
+@lru_cache(maxsize=256)
+def _cached_diff(estimate_id, from_version, to_version):
+    old = load_flat_snapshot(estimate_id, from_version)
+    new = load_flat_snapshot(estimate_id, to_version)
+    if old is None or new is None:
+        # Raising keeps the miss out of the cache; the version may be created later
+        raise LookupError('Version not found')
+
+    old_kpis, old_totals = snapshot_kpis(old)
+    new_kpis, new_totals = snapshot_kpis(new)
+
+    result = {
+        'estimate_id': estimate_id,
+        'from': from_version,
+        'to': to_version,
+        'estimate': {
+            'changes': _field_changes(old['estimate'], new['estimate']),
+            'kpis': {'from': old_totals, 'to': new_totals, 'delta': _kpi_delta(old_totals, new_totals)}
+        }
+    }
+    for level, _, _ in CHILD_LEVELS:
+        old_nodes, new_nodes = old[level], new[level]
+        added, removed, changed = [], [], []
+        for node_id, node in new_nodes.items():
+            delta = _kpi_delta(old_kpis[level].get(node_id), new_kpis[level][node_id])
+            previous = old_nodes.get(node_id)
+            if previous is None:
+                added.append({'id': node['id'], 'name': node.get('name'), 'kpi_delta': delta})
+                continue
+            changes = _field_changes(previous, node)
+            if changes or any(delta.values()):
+                changed.append({'id': node['id'], 'name': node.get('name'), 'changes': changes, 'kpi_delta': delta})
+        for node_id, node in old_nodes.items():
+            if node_id not in new_nodes:
+                delta = _kpi_delta(old_kpis[level][node_id], None)
+                removed.append({'id': node['id'], 'name': node.get('name'), 'kpi_delta': delta})
+        result[level] = {'added': added, 'removed': removed, 'changed': changed}
+    return result
+
+def diff_versions(estimate_id, from_version, to_version):
+    """Added, removed and changed nodes with KPI deltas between two versions.
+
+    Raises LookupError if either version does not exist. The returned dict is
+    shared by the cache and must not be modified.
+    """
+    return _cached_diff(estimate_id, from_version, to_version)
@@ -0,0 +1,161 @@
+import io
+import math
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Minimal streaming XLSX writer
+#
+# The workbook is written as a zip whose entries are produced row by row:
+# the zip goes into a buffer that is drained after every few rows, and
+# strings are stored inline, not in a shared-strings table. Memory therefore
+# stays constant however many rows a sheet has, and the first bytes can be
+# sent before the last row has been read.
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '{sheets}'
+    '</Types>'
+)
+SHEET_CONTENT_TYPE = (
+    '<Override PartName="/xl/worksheets/sheet{index}.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+)
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets>{sheets}</sheets></workbook>'
+)
+WORKBOOK_SHEET = '<sheet name="{name}" sheetId="{index}" r:id="rId{index}"/>'
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '{sheets}'
+    '<Relationship Id="rId{styles}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+WORKBOOK_SHEET_REL = (
+    '<Relationship Id="rId{index}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet{index}.xml"/>'
+)
+# Style 1 is a bold header row
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+    '</styleSheet>'
+)
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_TAIL = '</sheetData></worksheet>'
+
+# Characters that are not allowed in XML 1.0 documents
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+FLUSH_BYTES = 64 * 1024
+
+class _StreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands out what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+def column_letter(index):
+    """0 -> A, 25 -> Z, 26 -> AA."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def _cell(ref, value, style=''):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return f'<c r="{ref}"{style} t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, float) and not math.isfinite(value):
+        # <v> only holds finite numbers: NaN is left empty, infinities are written as text
+        if math.isnan(value):
+            return ''
+        value = 'Infinity' if value > 0 else '-Infinity'
+    elif isinstance(value, (int, float)):
+        # str() rather than repr(), which NumPy scalars render as np.float64(...)
+        return f'<c r="{ref}"{style}><v>{value}</v></c>'
+    text = escape(INVALID_XML_CHARS.sub('', str(value)))
+    return f'<c r="{ref}"{style} t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+def row_xml(row_number, values, header=False):
+    style = ' s="1"' if header else ''
+    cells = ''.join(
+        _cell(f'{column_letter(i)}{row_number}', value, style) for i, value in enumerate(values)
+    )
+    return f'<row r="{row_number}">{cells}</row>'
+
+def stream_workbook(sheets):
+    """Yield the bytes of an XLSX workbook.
+
+    sheets is a list of (name, header, rows) where rows is any iterable of
+    value tuples; it is consumed lazily while the workbook is being sent.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        indexes = range(1, len(sheets) + 1)
+        workbook.writestr('[Content_Types].xml', CONTENT_TYPES.format(
+            sheets=''.join(SHEET_CONTENT_TYPE.format(index=i) for i in indexes)))
+        workbook.writestr('_rels/.rels', ROOT_RELS)
+        workbook.writestr('xl/workbook.xml', WORKBOOK.format(sheets=''.join(
+            WORKBOOK_SHEET.format(name=escape(name[:31]), index=i)
+            for i, (name, _, _) in zip(indexes, sheets))))
+        workbook.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS.format(
+            sheets=''.join(WORKBOOK_SHEET_REL.format(index=i) for i in indexes),
+            styles=len(sheets) + 1))
+        workbook.writestr('xl/styles.xml', STYLES)
+        yield buffer.drain()
+
+        for index, (name, header, rows) in zip(indexes, sheets):
+            # force_zip64: the entry size is unknown until the last row is written
+            with workbook.open(f'xl/worksheets/sheet{index}.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(SHEET_HEAD.encode())
+                sheet.write(row_xml(1, header, header=True).encode())
+                for row_number, values in enumerate(rows, 2):
+                    sheet.write(row_xml(row_number, values).encode())
+                    if buffer.size >= FLUSH_BYTES:
+                        yield buffer.drain()
+                sheet.write(SHEET_TAIL.encode())
+            yield buffer.drain()
+    yield buffer.drain()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Multi-worker concurrency test for the Project Estimator backend.
+
+Serves the API from several pre-forked worker processes that share one
+listening socket (the way gunicorn runs it) against a single database, then
+drives concurrent reads and writes through them and fails on any lock error.
+By default it runs against a temporary copy of backend/src/database/app.db.
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+SEED_DATABASE = os.path.join(BACKEND_DIR, 'src', 'database', 'app.db')
+
+class ConcurrencyTester:
+    def __init__(self, workers, clients, requests_per_client, database_url):
+        self.workers = workers
+        self.clients = clients
+        self.requests_per_client = requests_per_client
+        self.database_url = database_url
+        self.processes = []
+        self.statuses = Counter()
+        self.errors = []
+        self.lock = threading.Lock()
+        self.base_url = None
+
+    def start_workers(self):
+        """Preload the app once, then fork workers that accept on a shared socket"""
+        os.environ['DATABASE_URL'] = self.database_url
+        sys.path.insert(0, BACKEND_DIR)
+        from src.main import app
+        from werkzeug.serving import make_server
+
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(128)
+        port = listener.getsockname()[1]
+        self.base_url = f'http://127.0.0.1:{port}/api'
+
+        def serve(fd):
+            logging.getLogger('werkzeug').setLevel(logging.ERROR)
+            server = make_server('127.0.0.1', port, app, threaded=True, fd=fd)
+            server.serve_forever()
+
+        context = multiprocessing.get_context('fork')
+        for _ in range(self.workers):
+            process = context.Process(target=serve, args=(listener.fileno(),), daemon=True)
+            process.start()
+            self.processes.append(process)
+        listener.close()
+
+    def stop_workers(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join(timeout=5)
+
+    def call(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(
+            f'{self.base_url}{path}', data=data, method=method,
+            headers={'Content-Type': 'application/json'}
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                status, body = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, body = e.code, e.read()
+        with self.lock:
+            self.statuses[status] += 1
+            if status >= 500 or b'locked' in body:
+                self.errors.append(f'{method} {path}: {status} {body[:200]!r}')
+        return status, json.loads(body) if body else None
+
+    def wait_until_ready(self):
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                urllib.request.urlopen(f'{self.base_url}/role-levels', timeout=2).read()
+                return True
+            except OSError:
+                time.sleep(0.2)
+        return False
+
+    def client(self, index, task_ids, estimate_id):
+        """Mix of tree reads, single edits, batch edits and estimate creation"""
+        for i in range(self.requests_per_client):
+            task_id = task_ids[(index * self.requests_per_client + i) % len(task_ids)]
+            step = i % 5
+            if step == 0:
+                self.call('GET', f'/estimates/{estimate_id}')
+            elif step == 1:
+                self.call('PATCH', f'/tasks/{task_id}', {'estimated_hours': float(8 + i % 4)})
+            elif step == 2:
+                batch = [{'id': t, 'story_points': i % 8} for t in task_ids[i % 10::10][:50]]
+                self.call('PATCH', '/tasks', batch)
+            elif step == 3:
+                self.call('GET', '/estimates?view=summary&limit=20')
+            else:
+                self.call('POST', '/estimates', {'name': f'Concurrency {index}-{i}', 'template_id': 1})
+
+    def run(self):
+        print(f"Starting {self.workers} workers against {self.database_url}")
+        self.start_workers()
+        try:
+            if not self.wait_until_ready():
+                print("Workers did not start")
+                return False
+
+            status, template = self.call('GET', '/estimates/1')
+            if status != 200:
+                print(f"Template 1 not available: {status}")
+                return False
+            status, estimate = self.call('POST', '/estimates', {'name': 'Concurrency Test', 'template_id': 1})
+            task_ids = [task['id'] for phase in estimate['phases']
+                        for activity in phase['activities'] for task in activity['tasks']]
+
+            started = time.time()
+            threads = [threading.Thread(target=self.client, args=(i, task_ids, estimate['id']))
+                       for i in range(self.clients)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.time() - started
+        finally:
+            self.stop_workers()
+
+        total = sum(self.statuses.values())
+        print(f"Requests: {total} in {elapsed:.1f}s ({total / elapsed:.0f} req/s)")
+        print(f"Status codes: {dict(self.statuses)}")
+        if self.errors:
+            print(f"\nFAILED: {len(self.errors)} errors")
+            for error in self.errors[:20]:
+                print(f"  - {error}")
+            return False
+        print("No lock errors")
+        return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='requests per client')
+    parser.add_argument('--database-url', help='defaults to a temporary copy of app.db')
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        path = os.path.join(tempfile.mkdtemp(), 'app.db')
+        shutil.copy(SEED_DATABASE, path)
+        database_url = f'sqlite:///{path}'
+
+    tester = ConcurrencyTester(args.workers, args.clients, args.requests, database_url)
+    sys.exit(0 if tester.run() else 1)
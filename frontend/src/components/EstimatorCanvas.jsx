@@ -18,6 +18,8 @@ const EstimatorCanvas = () => {
   const [expandedItems, setExpandedItems] = useState(new Set());
   const [editingTask, setEditingTask] = useState(null);
   const [editValues, setEditValues] = useState({});
+  const [simulation, setSimulation] = useState(null);
+  const [simulating, setSimulating] = useState(false);
 
   useEffect(() => {
     if (id) {
@@ -112,6 +114,27 @@ const EstimatorCanvas = () => {
     }
   };
 
+  const runSimulation = async () => {
+    setSimulating(true);
+    try {
+      const response = await fetch(`${API_BASE_URL}/estimates/${id}/simulate`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ iterations: 10000 }),
+      });
+      
+      if (response.ok) {
+        setSimulation(await response.json());
+      }
+    } catch (error) {
+      console.error('Error running simulation:', error);
+    } finally {
+      setSimulating(false);
+    }
+  };
+
   const calculateTotals = () => {
     if (!estimate) return { totalHours: 0, totalCost: 0, totalRevenue: 0, agm: 0 };
     
@@ -430,6 +453,31 @@ const EstimatorCanvas = () => {
                   <span>0%</span>
                   <span>50%</span>
                 </div>
+                <Button variant="outline" size="sm" className="w-full" onClick={runSimulation} disabled={simulating}>
+                  {simulating ? 'Simulating...' : 'Simulate Risk'}
+                </Button>
+                {simulation && (
+                  <div className="space-y-1 text-sm">
+                    <div className="flex justify-between">
+                      <span className="text-gray-500">P50 / P80 / P95 hours</span>
+                      <span>
+                        {['p50', 'p80', 'p95'].map(key => Math.round(simulation.percentiles[key].hours)).join(' / ')}
+                      </span>
+                    </div>
+                    <div className="flex justify-between">
+                      <span className="text-gray-500">Suggested contingency</span>
+                      <span className="font-medium">{simulation.suggested_contingency_percentage}%</span>
+                    </div>
+                    <Button
+                      variant="ghost"
+                      size="sm"
+                      className="w-full"
+                      onClick={() => updateContingency(Math.min(Math.ceil(simulation.suggested_contingency_percentage), 50))}
+                    >
+                      Apply suggestion
+                    </Button>
+                  </div>
+                )}
               </div>
             </CardContent>
           </Card>
@@ -7,100 +7,85 @@ import { Badge } from '@/components/ui/badge';
 
 
 
+// Working days per week used by the backend scheduler calendar
+const DAYS_PER_WEEK = 5;
+
 const GanttView = () => {
   const { id } = useParams();
   const [estimate, setEstimate] = useState(null);
+  const [schedule, setSchedule] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     if (id) {
-      fetchEstimate(id);
+      fetchSchedule(id);
     } else {
       setLoading(false);
     }
   }, [id]);
 
-  const fetchEstimate = async (estimateId) => {
+  const fetchSchedule = async (estimateId) => {
     try {
-      const response = await fetch(`${API_BASE_URL}/estimates/${estimateId}`);
-      const data = await response.json();
-      setEstimate(data);
+      const [estimateResponse, scheduleResponse] = await Promise.all([
+        fetch(`${API_BASE_URL}/estimates/${estimateId}`),
+        fetch(`${API_BASE_URL}/estimates/${estimateId}/schedule`)
+      ]);
+      setEstimate(await estimateResponse.json());
+      if (scheduleResponse.ok) {
+        setSchedule(await scheduleResponse.json());
+      }
     } catch (error) {
-      console.error('Error fetching estimate:', error);
+      console.error('Error fetching schedule:', error);
     } finally {
       setLoading(false);
     }
   };
 
-  const calculatePhaseDuration = (phase) => {
-    let totalHours = 0;
-    phase.activities?.forEach(activity => {
-      activity.tasks?.forEach(task => {
-        totalHours += task.estimated_hours || 0;
-      });
-    });
-    // Assuming 8 hours per day, 5 days per week
-    return Math.ceil(totalHours / 40);
-  };
+  const toWeeks = (days) => Math.round((days / DAYS_PER_WEEK) * 10) / 10;
 
+  const toGanttItem = (item, type) => ({
+    id: item.id,
+    name: item.name,
+    type: type,
+    critical: item.critical,
+    slack: item.slack,
+    startDay: item.early_start,
+    days: item.early_finish - item.early_start,
+    startWeek: Math.floor(item.early_start / DAYS_PER_WEEK),
+    endWeek: Math.max(Math.ceil(item.early_finish / DAYS_PER_WEEK) - 1, 0),
+    duration: toWeeks(item.early_finish - item.early_start),
+    startDate: item.start_date,
+    finishDate: item.finish_date
+  });
+
+  // Dates, slack and the critical path all come from the backend scheduler
   const generateGanttData = () => {
-    if (!estimate) return [];
-    
-    let currentWeek = 0;
-    const ganttData = [];
+    if (!schedule) return [];
     
-    estimate.phases?.forEach((phase, index) => {
-      const duration = calculatePhaseDuration(phase);
-      ganttData.push({
-        id: phase.id,
-        name: phase.name,
-        type: 'phase',
-        startWeek: currentWeek,
-        duration: duration,
-        endWeek: currentWeek + duration - 1,
-        activities: []
-      });
-      
-      let phaseCurrentWeek = currentWeek;
-      phase.activities?.forEach(activity => {
-        let activityHours = 0;
-        activity.tasks?.forEach(task => {
-          activityHours += task.estimated_hours || 0;
-        });
-        const activityDuration = Math.ceil(activityHours / 40);
-        
-        ganttData[ganttData.length - 1].activities.push({
-          id: activity.id,
-          name: activity.name,
-          startWeek: phaseCurrentWeek,
-          duration: activityDuration,
-          endWeek: phaseCurrentWeek + activityDuration - 1
-        });
-        
-        phaseCurrentWeek += Math.ceil(activityDuration / 2); // Overlap activities
-      });
-      
-      currentWeek += duration;
-    });
-    
-    return ganttData;
+    return schedule.phases.map(phase => ({
+      ...toGanttItem(phase, 'phase'),
+      activities: schedule.activities
+        .filter(activity => activity.phase_id === phase.id)
+        .map(activity => toGanttItem(activity, 'activity'))
+    }));
   };
 
-  const renderGanttBar = (item, maxWeeks) => {
-    const widthPercentage = (item.duration / maxWeeks) * 100;
-    const leftPercentage = (item.startWeek / maxWeeks) * 100;
+  const renderGanttBar = (item, maxDays) => {
+    const widthPercentage = (Math.max(item.days, 0.2) / maxDays) * 100;
+    const leftPercentage = (item.startDay / maxDays) * 100;
+    const color = item.type === 'phase' ? 'bg-blue-500' : 'bg-green-400';
     
     return (
       <div
         className={`absolute h-6 rounded ${
-          item.type === 'phase' ? 'bg-blue-500' : 'bg-green-400'
+          item.critical ? 'bg-red-500' : color
         } opacity-80`}
         style={{
           left: `${leftPercentage}%`,
           width: `${widthPercentage}%`
         }}
       >
-        <div className="text-xs text-white px-2 py-1 truncate">
+        <div className="text-xs text-white px-2 py-1 truncate" title={`${item.startDate} - ${item.finishDate}`}>
           {item.name}
         </div>
       </div>
@@ -125,8 +110,11 @@ const GanttView = () => {
   }
 
   const ganttData = generateGanttData();
-  const maxWeeks = Math.max(...ganttData.map(phase => phase.endWeek)) + 1;
-  const totalDuration = Math.ceil(maxWeeks / 4.33); // Convert weeks to months
+  const maxDays = Math.max(schedule?.duration_days || 0, 1);
+  const maxWeeks = Math.ceil(maxDays / DAYS_PER_WEEK);
+  const totalDuration = maxWeeks / 4.33; // Convert weeks to months
+  const tasksById = Object.fromEntries((schedule?.tasks || []).map(task => [task.id, task]));
+  const criticalTasks = (schedule?.critical_path || []).map(taskId => tasksById[taskId]).filter(Boolean);
 
   return (
     <div className="space-y-6">
@@ -152,14 +140,17 @@ const GanttView = () => {
       <Card>
         <CardHeader>
           <CardTitle className="text-lg">Project Timeline</CardTitle>
-          <CardDescription>Visual representation of project phases and activities</CardDescription>
+          <CardDescription>
+            {schedule ? `${schedule.start_date} to ${schedule.finish_date}, ` : ''}
+            critical phases and activities in red
+          </CardDescription>
         </CardHeader>
         <CardContent>
           <div className="space-y-6">
             {/* Timeline Header */}
             <div className="relative">
               <div className="flex justify-between text-sm text-gray-500 mb-2">
-                {Array.from({ length: Math.ceil(maxWeeks / 4) }, (_, i) => (
+                {Array.from({ length: Math.max(Math.ceil(maxWeeks / 4), 1) }, (_, i) => (
                   <div key={i} className="text-center">
                     Month {i + 1}
                   </div>
@@ -179,7 +170,7 @@ const GanttView = () => {
                         {phase.name}
                       </div>
                       <div className="flex-1 relative h-8 bg-gray-100 rounded">
-                        {renderGanttBar(phase, maxWeeks)}
+                        {renderGanttBar(phase, maxDays)}
                       </div>
                       <div className="w-20 text-right text-sm text-gray-500">
                         {phase.duration}w
@@ -196,7 +187,7 @@ const GanttView = () => {
                             {activity.name}
                           </div>
                           <div className="flex-1 relative h-6 bg-gray-50 rounded">
-                            {renderGanttBar(activity, maxWeeks)}
+                            {renderGanttBar(activity, maxDays)}
                           </div>
                           <div className="w-20 text-right text-xs text-gray-400">
                             {activity.duration}w
@@ -237,22 +228,41 @@ const GanttView = () => {
                   <span className="text-gray-600">End:</span>
                   <span className="font-medium">Week {phase.endWeek + 1}</span>
                 </div>
+                <div className="flex justify-between text-sm">
+                  <span className="text-gray-600">Dates:</span>
+                  <span className="font-medium">{phase.startDate} - {phase.finishDate}</span>
+                </div>
+                <div className="flex justify-between text-sm">
+                  <span className="text-gray-600">Slack:</span>
+                  <span className="font-medium">{phase.slack} days</span>
+                </div>
               </div>
             </CardContent>
           </Card>
         ))}
       </div>
 
-      {/* Critical Path Notice */}
+      {/* Critical Path */}
       <Card className="border-yellow-200 bg-yellow-50">
         <CardContent className="pt-6">
-          <div className="flex items-center space-x-2">
+          <div className="flex items-start space-x-2">
             <ArrowRight className="h-5 w-5 text-yellow-600" />
             <div>
-              <div className="font-medium text-yellow-800">Critical Path Analysis</div>
+              <div className="font-medium text-yellow-800">
+                Critical Path ({criticalTasks.length} tasks)
+              </div>
               <div className="text-sm text-yellow-700">
-                This is a simplified timeline view. In a full implementation, critical path analysis 
-                would highlight dependencies and identify bottlenecks.
+                Any delay to these tasks delays the project finish.
+              </div>
+              <div className="text-sm text-yellow-800 mt-2 space-y-1">
+                {criticalTasks.slice(0, 20).map(task => (
+                  <div key={task.id}>
+                    {task.name} ({task.start_date} - {task.finish_date})
+                  </div>
+                ))}
+                {criticalTasks.length > 20 && (
+                  <div>and {criticalTasks.length - 20} more</div>
+                )}
               </div>
             </div>
           </div>
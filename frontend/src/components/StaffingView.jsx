@@ -12,11 +12,15 @@ const StaffingView = () => {
   const { id } = useParams();
   const [estimate, setEstimate] = useState(null);
   const [roleData, setRoleData] = useState([]);
+  const [staffing, setStaffing] = useState(null);
+  const [heatmap, setHeatmap] = useState(null);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
     if (id) {
       fetchEstimate(id);
+      fetchStaffing(id);
+      fetchHeatmap(id);
     } else {
       setLoading(false);
     }
@@ -35,6 +39,26 @@ const StaffingView = () => {
     }
   };
 
+  const fetchStaffing = async (estimateId) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/estimates/${estimateId}/staffing`);
+      const data = await response.json();
+      setStaffing(data);
+    } catch (error) {
+      console.error('Error fetching staffing:', error);
+    }
+  };
+
+  const fetchHeatmap = async (estimateId) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/estimates/${estimateId}/staffing/heatmap?end_week=20`);
+      const data = await response.json();
+      setHeatmap(data);
+    } catch (error) {
+      console.error('Error fetching staffing heatmap:', error);
+    }
+  };
+
   const fetchRoleData = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/role-levels`);
@@ -46,88 +70,29 @@ const StaffingView = () => {
   };
 
   const calculateStaffingRequirements = () => {
-    if (!estimate) return [];
-
-    const staffingData = [];
-    const totalWeeks = 78; // 18 months * 4.33 weeks/month
-    const weeksPerPhase = Math.ceil(totalWeeks / (estimate.phases?.length || 1));
-
-    // Group role levels by role name
-    const roleGroups = roleData.reduce((acc, role) => {
-      if (!acc[role.name]) {
-        acc[role.name] = [];
-      }
-      acc[role.name].push(role);
-      return acc;
-    }, {});
-
-    Object.entries(roleGroups).forEach(([roleName, roles]) => {
-      let totalHours = 0;
-      
-      // Calculate total hours for this role across all tasks
-      estimate.phases?.forEach(phase => {
-        phase.activities?.forEach(activity => {
-          activity.tasks?.forEach(task => {
-            // Simplified: assume each task needs this role type
-            if (roleName.includes('Functional') && task.complexity !== 'High') {
-              totalHours += task.estimated_hours || 0;
-            } else if (roleName.includes('Technical') && task.complexity === 'High') {
-              totalHours += task.estimated_hours || 0;
-            } else if (roleName.includes('Project Manager')) {
-              totalHours += (task.estimated_hours || 0) * 0.2; // 20% PM overhead
-            } else if (roleName.includes('Solution Architect')) {
-              totalHours += (task.estimated_hours || 0) * 0.1; // 10% architect oversight
-            }
-          });
-        });
-      });
-
-      if (totalHours > 0) {
-        const hoursPerWeek = totalHours / totalWeeks;
-        const fteRequired = hoursPerWeek / 40; // 40 hours per week = 1 FTE
-        
-        staffingData.push({
-          roleName,
-          roles,
-          totalHours,
-          fteRequired,
-          hoursPerWeek,
-          status: fteRequired > 1 ? 'high' : fteRequired > 0.5 ? 'medium' : 'low'
-        });
-      }
-    });
-
-    return staffingData.sort((a, b) => b.fteRequired - a.fteRequired);
+    if (!staffing) return [];
+
+    // Peak weekly FTE per role level, from the backend staffing engine
+    return staffing.roles.map(role => ({
+      roleName: `${role.name} (${role.level})`,
+      totalHours: role.total_hours,
+      fteRequired: role.peak_fte,
+      hoursPerWeek: role.average_fte * staffing.hours_per_week,
+      status: role.peak_fte > 1 ? 'high' : role.peak_fte > 0.5 ? 'medium' : 'low'
+    })).sort((a, b) => b.fteRequired - a.fteRequired);
   };
 
-  const generateWeeklyHeatmap = (staffingData) => {
-    const weeks = Array.from({ length: 20 }, (_, i) => i + 1); // Show first 20 weeks
-    const heatmapData = [];
-
-    staffingData.forEach(role => {
-      const weeklyData = weeks.map(week => {
-        // Simulate varying demand throughout project
-        let demandMultiplier = 1;
-        if (week <= 4) demandMultiplier = 0.5; // Ramp up
-        else if (week <= 12) demandMultiplier = 1.2; // Peak
-        else if (week <= 16) demandMultiplier = 1.0; // Steady
-        else demandMultiplier = 0.7; // Wind down
-
-        const weeklyFTE = role.fteRequired * demandMultiplier;
-        return {
-          week,
-          fte: weeklyFTE,
-          status: weeklyFTE > 1.5 ? 'overloaded' : weeklyFTE > 1 ? 'high' : weeklyFTE > 0.5 ? 'medium' : 'low'
-        };
-      });
-
-      heatmapData.push({
-        ...role,
-        weeklyData
-      });
-    });
-
-    return heatmapData;
+  const generateWeeklyHeatmap = () => {
+    if (!heatmap) return [];
+
+    return heatmap.rows.map((roleName, row) => ({
+      roleName,
+      weeklyData: heatmap.weeks.map((week, column) => ({
+        week: week + 1,
+        fte: heatmap.fte[row][column],
+        status: heatmap.levels[heatmap.status[row][column]]
+      }))
+    }));
   };
 
   const getStatusColor = (status) => {
@@ -151,25 +116,9 @@ const StaffingView = () => {
   };
 
   const exportToCSV = () => {
-    const staffingData = calculateStaffingRequirements();
-    const heatmapData = generateWeeklyHeatmap(staffingData);
-    
-    let csvContent = "Role,Total Hours,FTE Required,Status\n";
-    staffingData.forEach(role => {
-      csvContent += `"${role.roleName}",${role.totalHours},${role.fteRequired.toFixed(2)},${role.status}\n`;
-    });
-    
-    csvContent += "\n\nWeekly Staffing Heatmap\n";
-    csvContent += "Role," + Array.from({ length: 20 }, (_, i) => `Week ${i + 1}`).join(",") + "\n";
-    
-    heatmapData.forEach(role => {
-      csvContent += `"${role.roleName}",` + role.weeklyData.map(w => w.fte.toFixed(2)).join(",") + "\n";
-    });
-
-    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+    // The backend streams the full weekly heatmap as CSV
     const link = document.createElement("a");
-    const url = URL.createObjectURL(blob);
-    link.setAttribute("href", url);
+    link.setAttribute("href", `${API_BASE_URL}/estimates/${id}/staffing/heatmap?format=csv`);
     link.setAttribute("download", `staffing-plan-${estimate?.name || 'estimate'}.csv`);
     link.style.visibility = 'hidden';
     document.body.appendChild(link);
@@ -195,7 +144,7 @@ const StaffingView = () => {
   }
 
   const staffingData = calculateStaffingRequirements();
-  const heatmapData = generateWeeklyHeatmap(staffingData);
+  const heatmapData = generateWeeklyHeatmap();
 
   return (
     <div className="space-y-6">
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of the JSON response encode paths.
+
+Builds a synthetic estimate tree shaped like ProjectEstimate.to_dict() and
+times the previous path (Flask's standard library encoder, no compression)
+against each registered encoder of src.services.serialization, with and
+without gzip (and brotli when it is installed).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+sys.path.insert(0, BACKEND_DIR)
+
+from flask.json.provider import DefaultJSONProvider
+from src.services.serialization import JSON_ENCODERS, available_encodings, compress
+
+ROLE_LEVELS = [{
+    'id': role_id,
+    'name': name,
+    'level': level,
+    'default_bill_rate': rate,
+    'default_cost_rate': rate / 2,
+    'created_at': '2025-06-11T20:59:11.365433'
+} for role_id, (name, level, rate) in enumerate([
+    ('Functional Consultant', 'Junior', 150.0), ('Functional Consultant', 'Mid', 200.0),
+    ('Functional Consultant', 'Senior', 275.0), ('Technical Consultant', 'Junior', 160.0),
+    ('Technical Consultant', 'Mid', 215.0), ('Technical Consultant', 'Senior', 290.0)
+], start=1)]
+
+def synthetic_estimate(task_count, tasks_per_activity=50, activities_per_phase=20):
+    """Nested estimate dict with task_count tasks of two assignments each."""
+    phases = []
+    task_id = assignment_id = activity_id = 0
+    while task_id < task_count:
+        phase_id = len(phases) + 1
+        activities = []
+        for activity_index in range(activities_per_phase):
+            if task_id >= task_count:
+                break
+            activity_id += 1
+            tasks = []
+            for task_index in range(min(tasks_per_activity, task_count - task_id)):
+                task_id += 1
+                assignments = []
+                for role in (ROLE_LEVELS[task_id % 6], ROLE_LEVELS[(task_id + 3) % 6]):
+                    assignment_id += 1
+                    assignments.append({
+                        'id': assignment_id,
+                        'task_id': task_id,
+                        'role_level_id': role['id'],
+                        'hours': float(task_id % 40),
+                        'bill_rate_override': None,
+                        'cost_rate_override': None,
+                        'role_level': role
+                    })
+                tasks.append({
+                    'id': task_id,
+                    'name': f'Task {task_id}',
+                    'description': 'Configure, test and document the module setup',
+                    'order_index': task_index,
+                    'complexity': ('Low', 'Medium', 'High')[task_id % 3],
+                    'story_points': task_id % 13,
+                    'estimated_hours': float(task_id % 80),
+                    'low_hours': None,
+                    'likely_hours': None,
+                    'high_hours': None,
+                    'activity_id': activity_id,
+                    'assignments': assignments
+                })
+            activities.append({
+                'id': activity_id,
+                'name': f'Activity {activity_id}',
+                'description': '',
+                'order_index': activity_index,
+                'phase_id': phase_id,
+                'tasks': tasks
+            })
+        phases.append({
+            'id': phase_id,
+            'name': f'Phase {phase_id}',
+            'description': '',
+            'order_index': phase_id - 1,
+            'project_estimate_id': 1,
+            'activities': activities
+        })
+    return {
+        'id': 1,
+        'name': 'Synthetic estimate',
+        'description': None,
+        'currency': 'USD',
+        'contingency_percentage': 10.0,
+        'status': 'draft',
+        'start_date': '2026-01-05',
+        'created_at': '2026-01-01T00:00:00',
+        'updated_at': '2026-01-01T00:00:00',
+        'revision': 1,
+        'phases': phases
+    }
+
+def previous_path(obj):
+    """What jsonify() did before: the stdlib encoder with Flask's defaults."""
+    provider = DefaultJSONProvider
+    return json.dumps(
+        obj, default=provider.default, ensure_ascii=provider.ensure_ascii,
+        sort_keys=provider.sort_keys, separators=(',', ':')
+    ).encode() + b'\n'
+
+def measure(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    estimate = synthetic_estimate(args.tasks)
+    baseline, body = measure(lambda: previous_path(estimate), args.repeat)
+    print(f"{args.tasks} tasks, {len(body) / 1e6:.1f} MB of JSON, median of {args.repeat} runs\n")
+    print(f"{'path':<24}{'ms':>10}{'bytes':>14}{'speedup':>10}")
+    print(f"{'previous (json)':<24}{baseline * 1000:>10.1f}{len(body):>14}{1.0:>10.2f}")
+
+    for name, encode in JSON_ENCODERS.items():
+        elapsed, encoded = measure(lambda: encode(estimate), args.repeat)
+        if json.loads(encoded) != json.loads(body):
+            sys.exit(f"{name} output differs from the previous path")
+        print(f"{name:<24}{elapsed * 1000:>10.1f}{len(encoded):>14}{baseline / elapsed:>10.2f}")
+        for encoding in available_encodings():
+            elapsed, compressed = measure(lambda: compress(encode(estimate), encoding), args.repeat)
+            label = f'{name} + {encoding}'
+            print(f"{label:<24}{elapsed * 1000:>10.1f}{len(compressed):>14}{baseline / elapsed:>10.2f}")
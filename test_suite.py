@@ -8,11 +8,15 @@ import requests
 import json
 import sys
 import time
+import io
+import zipfile
 from typing import Dict, List, Any
 
 # Configuration
 API_BASE_URL = 'http://localhost:5000/api'
 FRONTEND_URL = 'http://localhost:5173'
+# SQL statements one uncached GET /estimates/<id> may run (X-Query-Count)
+ESTIMATE_QUERY_BUDGET = 7
 
 class ProjectEstimatorTester:
     def __init__(self):
@@ -213,6 +217,51 @@ class ProjectEstimatorTester:
             self.log_test("Estimates List", False, f"Error: {str(e)}")
             return False
     
+    def test_estimates_summary_list(self):
+        """Test the paginated summary listing"""
+        try:
+            response = requests.get(f"{API_BASE_URL}/estimates", params={'view': 'summary', 'limit': 1, 'sort': 'name'})
+            if response.status_code == 200:
+                data = response.json()
+                items = data.get('items', [])
+                if len(items) == 1 and 'phases' not in items[0] and 'total_hours' in items[0]:
+                    self.log_test("Estimates Summary List", True, f"First page has {items[0]['task_count']} tasks, next cursor: {bool(data.get('next_cursor'))}")
+                    return True
+                else:
+                    self.log_test("Estimates Summary List", False, f"Unexpected summary page: {data}")
+                    return False
+            else:
+                self.log_test("Estimates Summary List", False, f"Status code: {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Estimates Summary List", False, f"Error: {str(e)}")
+            return False
+    
+    def test_estimate_kpis(self):
+        """Test the server-side KPI calculation"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Estimate KPIs", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate = self.test_data['test_estimate']
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate['id']}/kpis")
+            if response.status_code == 200:
+                data = response.json()
+                phase_hours = sum(data['phases']['hours'])
+                if abs(phase_hours - data['totals']['hours']) < 0.01:
+                    self.log_test("Estimate KPIs", True, f"Total hours {data['totals']['hours']:.1f}, AGM {data['totals']['agm']:.1f}%")
+                    return True
+                else:
+                    self.log_test("Estimate KPIs", False, f"Phase hours {phase_hours} do not add up to {data['totals']['hours']}")
+                    return False
+            else:
+                self.log_test("Estimate KPIs", False, f"Status code: {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Estimate KPIs", False, f"Error: {str(e)}")
+            return False
+    
     def test_task_update(self):
         """Test updating a task"""
         if 'test_estimate' not in self.test_data:
@@ -249,6 +298,7 @@ class ProjectEstimatorTester:
             
             if response.status_code == 200:
                 self.log_test("Task Update", True, f"Updated task {first_task['id']}")
+                self.test_data['updated_task_id'] = first_task['id']
                 return True
             else:
                 self.log_test("Task Update", False, f"Status code: {response.status_code}")
@@ -258,6 +308,549 @@ class ProjectEstimatorTester:
             self.log_test("Task Update", False, f"Error: {str(e)}")
             return False
     
+    def test_version_diff(self):
+        """Test version snapshots and the version diff"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Version Diff", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            first = requests.post(f"{API_BASE_URL}/versions/{estimate_id}", json={"notes": "Before edit"})
+            if first.status_code != 201:
+                self.log_test("Version Diff", False, f"Create version status code: {first.status_code}")
+                return False
+            # test_task_update has changed a task since the estimate was created
+            requests.patch(f"{API_BASE_URL}/tasks/{self.test_data['updated_task_id']}", json={"estimated_hours": 16.0})
+            second = requests.post(f"{API_BASE_URL}/versions/{estimate_id}", json={"notes": "After edit"})
+            
+            from_version = first.json()['version_number']
+            to_version = second.json()['version_number']
+            response = requests.get(f"{API_BASE_URL}/versions/{estimate_id}/diff",
+                                    params={'from': from_version, 'to': to_version})
+            if response.status_code == 200:
+                changed = response.json()['tasks']['changed']
+                if any(task['id'] == self.test_data['updated_task_id'] for task in changed):
+                    self.log_test("Version Diff", True, f"{len(changed)} changed task(s) between v{from_version} and v{to_version}")
+                    return True
+                else:
+                    self.log_test("Version Diff", False, "Edited task missing from diff")
+                    return False
+            else:
+                self.log_test("Version Diff", False, f"Status code: {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Version Diff", False, f"Error: {str(e)}")
+            return False
+    
+    def test_excel_export(self):
+        """Test the streamed Excel export"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Excel Export", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            response = requests.get(f"{API_BASE_URL}/export/excel/{estimate_id}")
+            if response.status_code == 200:
+                workbook = zipfile.ZipFile(io.BytesIO(response.content))
+                sheets = [name for name in workbook.namelist() if name.startswith('xl/worksheets/')]
+                if workbook.testzip() is None and len(sheets) == 4:
+                    self.log_test("Excel Export", True, f"{len(response.content)} bytes, {len(sheets)} sheets")
+                    return True
+                else:
+                    self.log_test("Excel Export", False, f"Unexpected workbook contents: {workbook.namelist()}")
+                    return False
+            else:
+                self.log_test("Excel Export", False, f"Status code: {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Excel Export", False, f"Error: {str(e)}")
+            return False
+    
+    def test_pdf_export(self):
+        """Test the PDF export and its render cache"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("PDF Export", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            first = requests.get(f"{API_BASE_URL}/export/pdf/{estimate_id}")
+            second = requests.get(f"{API_BASE_URL}/export/pdf/{estimate_id}")
+            if first.status_code == 200 and second.status_code == 200:
+                if first.content.startswith(b'%PDF-') and second.headers.get('X-Render-Cache') == 'hit':
+                    self.log_test("PDF Export", True, f"{len(first.content)} bytes, second download cached")
+                    return True
+                else:
+                    self.log_test("PDF Export", False, "Invalid PDF or second download not cached")
+                    return False
+            else:
+                self.log_test("PDF Export", False, f"Status codes: {first.status_code}, {second.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("PDF Export", False, f"Error: {str(e)}")
+            return False
+    
+    def test_wbs_export(self):
+        """Test the flat WBS export in NDJSON and CSV"""
+        try:
+            response = requests.get(f"{API_BASE_URL}/export/wbs")
+            csv_response = requests.get(f"{API_BASE_URL}/export/wbs", params={'format': 'csv'})
+            if response.status_code == 200 and csv_response.status_code == 200:
+                rows = [json.loads(line) for line in response.text.splitlines()]
+                csv_rows = csv_response.text.splitlines()
+                if rows and len(csv_rows) == len(rows) + 1 and 'revenue' in rows[0]:
+                    self.log_test("WBS Export", True, f"{len(rows)} task rows")
+                    return True
+                else:
+                    self.log_test("WBS Export", False, f"{len(rows)} NDJSON rows, {len(csv_rows)} CSV lines")
+                    return False
+            else:
+                self.log_test("WBS Export", False, f"Status codes: {response.status_code}, {csv_response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("WBS Export", False, f"Error: {str(e)}")
+            return False
+    
+    def test_actuals_variance(self):
+        """Test idempotent actuals loading and the variance report"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Actuals Variance", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            entries = [{"external_id": f"TEST-{i}", "task_id": self.test_data['updated_task_id'],
+                        "role_level_id": 1, "entry_date": f"2026-01-{i + 1:02d}", "hours": 2.0} for i in range(10)]
+            first = requests.post(f"{API_BASE_URL}/actuals/{estimate_id}", json=entries)
+            replay = requests.post(f"{API_BASE_URL}/actuals/{estimate_id}", json=entries)
+            if first.status_code != 200 or replay.status_code != 200:
+                self.log_test("Actuals Variance", False, f"Status codes: {first.status_code}, {replay.status_code}")
+                return False
+            if replay.json()['updated'] != len(entries):
+                self.log_test("Actuals Variance", False, f"Replay was not idempotent: {replay.json()}")
+                return False
+            
+            response = requests.get(f"{API_BASE_URL}/actuals/{estimate_id}/variance",
+                                    params={'level': 'task', 'period': 'week'})
+            if response.status_code == 200:
+                actual_hours = response.json()['totals']['actual_hours']
+                if abs(actual_hours - 20.0) < 0.01:
+                    self.log_test("Actuals Variance", True, f"{actual_hours} actual hours after replay")
+                    return True
+                else:
+                    self.log_test("Actuals Variance", False, f"Expected 20.0 actual hours, got {actual_hours}")
+                    return False
+            else:
+                self.log_test("Actuals Variance", False, f"Status code: {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Actuals Variance", False, f"Error: {str(e)}")
+            return False
+    
+    def test_staffing(self):
+        """Test the role x week staffing matrix"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Staffing", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}/staffing")
+            if response.status_code == 200:
+                staffing = response.json()
+                shape_ok = len(staffing['fte']) == len(staffing['roles']) and \
+                    all(len(row) == staffing['weeks'] for row in staffing['fte'])
+                if shape_ok:
+                    self.log_test("Staffing", True,
+                                  f"{len(staffing['roles'])} roles x {staffing['weeks']} weeks, "
+                                  f"{staffing['overloaded_roles']} overloaded")
+                    return True
+                else:
+                    self.log_test("Staffing", False, "FTE matrix does not match roles and weeks")
+                    return False
+            else:
+                self.log_test("Staffing", False, f"Status code: {response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Staffing", False, f"Error: {str(e)}")
+            return False
+    
+    def test_schedule(self):
+        """Test the critical path schedule and dependency cycle checks"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Schedule", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}/schedule")
+            if response.status_code != 200:
+                self.log_test("Schedule", False, f"Status code: {response.status_code}")
+                return False
+            schedule = response.json()
+            nodes = schedule['phases'] + schedule['activities'] + schedule['tasks']
+            consistent = all(
+                node['slack'] >= 0 and node['early_finish'] <= schedule['duration_days'] for node in nodes
+            )
+            if not consistent:
+                self.log_test("Schedule", False, "Negative slack or work past the project finish")
+                return False
+            
+            activities = schedule['activities']
+            if len(activities) >= 2:
+                link = {'predecessor_type': 'activity', 'predecessor_id': activities[0]['id'],
+                        'successor_type': 'activity', 'successor_id': activities[1]['id']}
+                created = requests.post(f"{API_BASE_URL}/estimates/{estimate_id}/dependencies", json=link)
+                reverse = requests.post(f"{API_BASE_URL}/estimates/{estimate_id}/dependencies", json=dict(
+                    link, predecessor_id=activities[1]['id'], successor_id=activities[0]['id']
+                ))
+                if created.status_code == 201:
+                    requests.delete(f"{API_BASE_URL}/dependencies/{created.json()['id']}")
+                if created.status_code != 201 or reverse.status_code != 400:
+                    self.log_test("Schedule", False, "Dependency cycle was not rejected")
+                    return False
+                if 'changed' not in (created.json().get('schedule') or {}):
+                    self.log_test("Schedule", False, "Dependency did not return the rescheduled nodes")
+                    return False
+            
+            self.log_test("Schedule", True,
+                          f"{schedule['duration_days']} working days, "
+                          f"{len(schedule['critical_path'])} critical tasks")
+            return True
+        except Exception as e:
+            self.log_test("Schedule", False, f"Error: {str(e)}")
+            return False
+    
+    def test_reference_data_etags(self):
+        """Test ETag revalidation of role levels and the complexity matrix"""
+        try:
+            for name, path in (("Role Levels", "role-levels"), ("Complexity Matrix", "complexity-matrix")):
+                response = requests.get(f"{API_BASE_URL}/{path}")
+                etag = response.headers.get('ETag')
+                if response.status_code != 200 or not etag or etag.startswith('W/'):
+                    self.log_test("Reference Data ETags", False, f"{name}: no strong ETag")
+                    return False
+                revalidated = requests.get(f"{API_BASE_URL}/{path}", headers={'If-None-Match': etag})
+                if revalidated.status_code != 304:
+                    self.log_test("Reference Data ETags", False,
+                                  f"{name}: revalidation returned {revalidated.status_code}")
+                    return False
+            
+            self.log_test("Reference Data ETags", True, "Unchanged reference data revalidates with 304")
+            return True
+        except Exception as e:
+            self.log_test("Reference Data ETags", False, f"Error: {str(e)}")
+            return False
+    
+    def test_estimate_revisions(self):
+        """Test conditional GET of an estimate and revision bumps on task edits"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Estimate Revisions", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}")
+            etag = response.headers.get('ETag')
+            if response.status_code != 200 or not etag:
+                self.log_test("Estimate Revisions", False, "No ETag on the estimate")
+                return False
+            revalidated = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}", headers={'If-None-Match': etag})
+            if revalidated.status_code != 304:
+                self.log_test("Estimate Revisions", False, f"Revalidation returned {revalidated.status_code}")
+                return False
+            
+            estimate = response.json()
+            tasks = [
+                task for phase in estimate.get('phases', [])
+                for activity in phase.get('activities', [])
+                for task in activity.get('tasks', [])
+            ]
+            if not tasks:
+                self.log_test("Estimate Revisions", True, "Unchanged estimate revalidates with 304")
+                return True
+            
+            # A task edit must bump the estimate's revision and so its ETag
+            requests.patch(f"{API_BASE_URL}/tasks/{tasks[0]['id']}", json={'description': 'Revision check'})
+            changed = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}", headers={'If-None-Match': etag})
+            if changed.status_code != 200 or changed.json()['revision'] <= estimate['revision']:
+                self.log_test("Estimate Revisions", False, "Task edit did not bump the revision")
+                return False
+            
+            self.log_test("Estimate Revisions", True,
+                          f"Revision {estimate['revision']} -> {changed.json()['revision']} after a task edit")
+            return True
+        except Exception as e:
+            self.log_test("Estimate Revisions", False, f"Error: {str(e)}")
+            return False
+    
+    def test_estimate_query_budget(self):
+        """Test that loading an estimate stays within its SQL query budget"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Estimate Query Budget", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            estimate = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}").json()
+            task_id = estimate['phases'][0]['activities'][0]['tasks'][0]['id']
+            # A new revision is not cached yet, so the whole tree is loaded
+            requests.patch(f"{API_BASE_URL}/tasks/{task_id}", json={'description': 'Query budget check'})
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}")
+            count = int(response.headers.get('X-Query-Count', -1))
+            if response.status_code != 200 or not 0 <= count <= ESTIMATE_QUERY_BUDGET:
+                self.log_test("Estimate Query Budget", False,
+                              f"{count} queries, budget is {ESTIMATE_QUERY_BUDGET}")
+                return False
+            
+            self.log_test("Estimate Query Budget", True, f"{count} of {ESTIMATE_QUERY_BUDGET} queries")
+            return True
+        except Exception as e:
+            self.log_test("Estimate Query Budget", False, f"Error: {str(e)}")
+            return False
+    
+    def test_response_compression(self):
+        """Test gzip negotiation of large JSON responses"""
+        try:
+            compressed = requests.get(f"{API_BASE_URL}/estimates", headers={'Accept-Encoding': 'gzip'})
+            plain = requests.get(f"{API_BASE_URL}/estimates", headers={'Accept-Encoding': 'identity'})
+            if compressed.status_code != 200 or plain.status_code != 200:
+                self.log_test("Response Compression", False, f"Status code: {compressed.status_code}")
+                return False
+            if 'Accept-Encoding' not in compressed.headers.get('Vary', ''):
+                self.log_test("Response Compression", False, "Missing Vary: Accept-Encoding")
+                return False
+            if plain.headers.get('Content-Encoding'):
+                self.log_test("Response Compression", False, "Compressed without being accepted")
+                return False
+            if compressed.json() != plain.json():
+                self.log_test("Response Compression", False, "Compressed and plain bodies differ")
+                return False
+            
+            encoding = compressed.headers.get('Content-Encoding', 'none')
+            self.log_test("Response Compression", True,
+                          f"{len(plain.content)} bytes sent with Content-Encoding: {encoding}")
+            return True
+        except Exception as e:
+            self.log_test("Response Compression", False, f"Error: {str(e)}")
+            return False
+    
+    def test_compressed_etags(self):
+        """Test strong ETags and revalidation of gzip-encoded responses"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Compressed ETags", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            gzip = {'Accept-Encoding': 'gzip'}
+            for name, path in (("Estimate", f"estimates/{estimate_id}"), ("Complexity Matrix", "complexity-matrix")):
+                compressed = requests.get(f"{API_BASE_URL}/{path}", headers=gzip)
+                plain = requests.get(f"{API_BASE_URL}/{path}", headers={'Accept-Encoding': 'identity'})
+                etag = compressed.headers.get('ETag')
+                if compressed.status_code != 200 or not etag or etag.startswith('W/'):
+                    self.log_test("Compressed ETags", False, f"{name}: no strong ETag with gzip")
+                    return False
+                if 'Accept-Encoding' not in compressed.headers.get('Vary', ''):
+                    self.log_test("Compressed ETags", False, f"{name}: missing Vary: Accept-Encoding")
+                    return False
+                if compressed.headers.get('Content-Encoding') == 'gzip' and etag == plain.headers.get('ETag'):
+                    self.log_test("Compressed ETags", False, f"{name}: gzip and identity share an ETag")
+                    return False
+                # Either coding's tag names the same resource
+                for tag in (etag, plain.headers.get('ETag')):
+                    revalidated = requests.get(f"{API_BASE_URL}/{path}", headers={**gzip, 'If-None-Match': tag})
+                    if revalidated.status_code != 304:
+                        self.log_test("Compressed ETags", False,
+                                      f"{name}: revalidating {tag} returned {revalidated.status_code}")
+                        return False
+            
+            self.log_test("Compressed ETags", True, "gzip responses carry strong ETags and revalidate with 304")
+            return True
+        except Exception as e:
+            self.log_test("Compressed ETags", False, f"Error: {str(e)}")
+            return False
+    
+    def test_normalized_estimate(self):
+        """Test the normalized estimate shape against the nested tree"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Normalized Estimate", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            nested = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}").json()
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}?shape=normalized")
+            if response.status_code != 200:
+                self.log_test("Normalized Estimate", False, f"Status code: {response.status_code}")
+                return False
+            normalized = response.json()
+            
+            tasks = [
+                task for phase in nested.get('phases', [])
+                for activity in phase.get('activities', [])
+                for task in activity.get('tasks', [])
+            ]
+            assignments = [assignment for task in tasks for assignment in task.get('assignments', [])]
+            if sorted(task['id'] for task in tasks) != [task['id'] for task in normalized['tasks']]:
+                self.log_test("Normalized Estimate", False, "Task ids differ from the nested tree")
+                return False
+            for assignment in assignments:
+                if normalized['role_levels'].get(str(assignment['role_level_id'])) != assignment['role_level']:
+                    self.log_test("Normalized Estimate", False,
+                                  f"Role level {assignment['role_level_id']} missing from the lookup")
+                    return False
+            
+            invalid = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}?shape=tree")
+            if invalid.status_code != 400:
+                self.log_test("Normalized Estimate", False, f"Unknown shape returned {invalid.status_code}")
+                return False
+            
+            self.log_test("Normalized Estimate", True,
+                          f"{len(normalized['tasks'])} tasks and {len(normalized['assignments'])} assignments, "
+                          f"{len(normalized['role_levels'])} role levels")
+            return True
+        except Exception as e:
+            self.log_test("Normalized Estimate", False, f"Error: {str(e)}")
+            return False
+    
+    def test_re_estimation(self):
+        """Test re-estimating an estimate from story points and the complexity matrix"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Re-estimation", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            response = requests.post(f"{API_BASE_URL}/estimates/{estimate_id}/re-estimate")
+            if response.status_code != 200:
+                self.log_test("Re-estimation", False, f"Status code: {response.status_code}")
+                return False
+            data = response.json()
+            
+            # Stored rollups must agree with the re-derived task hours
+            estimate = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}").json()
+            task_hours = sum(
+                task.get('estimated_hours') or 0
+                for phase in estimate.get('phases', [])
+                for activity in phase.get('activities', [])
+                for task in activity.get('tasks', [])
+            )
+            if abs(task_hours - data['rollups'][0]['hours']) > 0.01:
+                self.log_test("Re-estimation", False,
+                              f"Rollup hours {data['rollups'][0]['hours']} != task hours {task_hours}")
+                return False
+            
+            self.log_test("Re-estimation", True,
+                          f"{data['tasks']} tasks and {data['assignments']} assignments re-estimated")
+            return True
+        except Exception as e:
+            self.log_test("Re-estimation", False, f"Error: {str(e)}")
+            return False
+    
+    def test_simulation(self):
+        """Test the seeded Monte Carlo contingency simulation"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Monte Carlo Simulation", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            body = {'iterations': 5000, 'seed': 42}
+            first = requests.post(f"{API_BASE_URL}/estimates/{estimate_id}/simulate", json=body)
+            second = requests.post(f"{API_BASE_URL}/estimates/{estimate_id}/simulate", json=body)
+            if first.status_code != 200 or second.status_code != 200:
+                self.log_test("Monte Carlo Simulation", False, f"Status code: {first.status_code}")
+                return False
+            result = first.json()
+            if result['percentiles'] != second.json()['percentiles']:
+                self.log_test("Monte Carlo Simulation", False, "Same seed gave different results")
+                return False
+            
+            hours = [result['percentiles'][key]['hours'] for key in ('p50', 'p80', 'p95')]
+            if hours != sorted(hours):
+                self.log_test("Monte Carlo Simulation", False, f"Percentiles out of order: {hours}")
+                return False
+            
+            self.log_test("Monte Carlo Simulation", True,
+                          f"P80 {hours[1]:.0f} hours, suggested contingency "
+                          f"{result['suggested_contingency_percentage']}%")
+            return True
+        except Exception as e:
+            self.log_test("Monte Carlo Simulation", False, f"Error: {str(e)}")
+            return False
+    
+    def test_resource_leveling(self):
+        """Test the background resource leveling job"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Resource Leveling", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            response = requests.post(f"{API_BASE_URL}/estimates/{estimate_id}/leveling", json={'capacity': 1.0})
+            if response.status_code != 202:
+                self.log_test("Resource Leveling", False, f"Status code: {response.status_code}")
+                return False
+            job_id = response.json()['job_id']
+            
+            job = response.json()
+            for _ in range(60):
+                if job['status'] in ('done', 'failed'):
+                    break
+                time.sleep(0.5)
+                job = requests.get(f"{API_BASE_URL}/leveling/{job_id}").json()
+            if job['status'] != 'done':
+                self.log_test("Resource Leveling", False, f"Job {job['status']}: {job.get('error')}")
+                return False
+            
+            result = job['result']
+            schedule = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}/schedule").json()
+            if result['duration_days'] != schedule['duration_days']:
+                self.log_test("Resource Leveling", False, "Leveling moved the project finish")
+                return False
+            if any(task['shift_days'] < 0 for task in result['tasks']):
+                self.log_test("Resource Leveling", False, "A task was moved before its early start")
+                return False
+            
+            self.log_test("Resource Leveling", True,
+                          f"{result['moved_tasks']} tasks moved, peak "
+                          f"{result['peak_fte_before']} -> {result['peak_fte_after']} FTE")
+            return True
+        except Exception as e:
+            self.log_test("Resource Leveling", False, f"Error: {str(e)}")
+            return False
+    
+    def test_staffing_heatmap(self):
+        """Test the grouped staffing heatmap in JSON and CSV"""
+        if 'test_estimate' not in self.test_data:
+            self.log_test("Staffing Heatmap", False, "No test estimate available")
+            return False
+        
+        try:
+            estimate_id = self.test_data['test_estimate']['id']
+            params = {'group': 'role', 'start_week': 0, 'end_week': 20}
+            response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}/staffing/heatmap", params=params)
+            csv_response = requests.get(f"{API_BASE_URL}/estimates/{estimate_id}/staffing/heatmap",
+                                        params=dict(params, format='csv'))
+            if response.status_code == 200 and csv_response.status_code == 200:
+                heatmap = response.json()
+                csv_lines = csv_response.text.splitlines()
+                if len(heatmap['weeks']) == 20 and len(csv_lines) == len(heatmap['rows']) + 1:
+                    self.log_test("Staffing Heatmap", True, f"{len(heatmap['rows'])} roles x 20 weeks")
+                    return True
+                else:
+                    self.log_test("Staffing Heatmap", False, "Heatmap shape does not match the request")
+                    return False
+            else:
+                self.log_test("Staffing Heatmap", False, f"Status codes: {response.status_code}, {csv_response.status_code}")
+                return False
+        except Exception as e:
+            self.log_test("Staffing Heatmap", False, f"Error: {str(e)}")
+            return False
+    
     def test_data_integrity(self):
         """Test data integrity and relationships"""
         try:
@@ -310,9 +903,28 @@ class ProjectEstimatorTester:
         self.test_complexity_matrix_endpoint()
         self.test_templates_endpoint()
         self.test_estimates_list()
+        self.test_estimates_summary_list()
         self.test_create_estimate()
         self.test_estimate_calculations()
+        self.test_estimate_kpis()
+        self.test_staffing()
+        self.test_staffing_heatmap()
+        self.test_schedule()
+        self.test_resource_leveling()
+        self.test_simulation()
+        self.test_re_estimation()
+        self.test_reference_data_etags()
+        self.test_estimate_revisions()
+        self.test_estimate_query_budget()
+        self.test_response_compression()
+        self.test_compressed_etags()
+        self.test_normalized_estimate()
         self.test_task_update()
+        self.test_version_diff()
+        self.test_excel_export()
+        self.test_pdf_export()
+        self.test_wbs_export()
+        self.test_actuals_variance()
         self.test_data_integrity()
         
         # Summary